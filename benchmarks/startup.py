@@ -0,0 +1,184 @@
+"""Startup benchmarks for multiplex.
+
+Generates synthetic configs and subprogram trees shaped like `examples/mnist`, times
+the main entry points of `Multiplexor` and `DotListConfig` across config sizes, and
+records the peak memory of each. Results are written as JSON so that they can be
+compared between commits.
+
+Usage:
+    python benchmarks/startup.py --output bench.json
+    python benchmarks/startup.py --quick
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multiplex import DotListConfig, Multiplexor, ENTRY_POINTS, IMPORTED_MODULES, PARSER_GETTERS  # noqa: E402
+
+LEAVES = [10, 100, 1000, 10000]
+ARGUMENTS = [1, 10, 100]
+DEPTHS = [1, 3, 10]
+
+SUBPROGRAM_SOURCE = '''import argparse
+
+from multiplex import register_parser, register_entrypoint
+
+
+@register_parser
+def get_parser(parents):
+    return argparse.ArgumentParser(description='Synthetic subprogram', parents=parents)
+
+
+@register_entrypoint
+def main(args):
+    return args
+'''
+
+
+def make_defaults(n_leaves, branching=10):
+    """Nested dict with `n_leaves` leaves, each level having at most `branching` children"""
+    def build(prefix, n):
+        if n <= branching:
+            return {f'{prefix}{i}': float(i) for i in range(n)}
+        size = -(-n // branching)
+        return {f'{prefix}{i}': build(f'{prefix}{i}_', min(size, n - i * size))
+                for i in range(branching) if n - i * size > 0}
+    return build('k', n_leaves)
+
+
+def make_arguments(n_args):
+    return [{'name_or_flags': [f'--arg{i}'], 'type': 'int', 'default': i, 'help': f'argument {i}'}
+            for i in range(n_args)]
+
+
+def make_tree(root, n_leaves, n_args, depth):
+    """Write a program tree like `examples/mnist`: a main config with `train` and `test`
+    subprograms, each with its sidecar config, and a nested config group `depth` levels deep."""
+    main = {'argparse': {'parser': {'description': 'Synthetic program'}, 'arguments': make_arguments(n_args)},
+            'subprograms': {'train': 'train.py', 'test': 'test.py'}}
+    main.update(make_defaults(n_leaves))
+    write_yaml(os.path.join(root, 'main.yaml'), main)
+    for name in ('train', 'test'):
+        with open(os.path.join(root, name + '.py'), 'w') as f:
+            f.write(SUBPROGRAM_SOURCE)
+        write_yaml(os.path.join(root, name + '.yaml'), {'argparse': {'arguments': make_arguments(n_args)}})
+
+    group_dir = os.path.join(root, *(f'group{i}' for i in range(depth - 1)))
+    os.makedirs(group_dir, exist_ok=True)
+    write_yaml(os.path.join(group_dir, 'leaf.yaml'), make_defaults(n_leaves))
+    override = {'leaf': {'k0': -1.0}}
+    for i in reversed(range(depth - 1)):
+        override = {f'group{i}': override}
+    return os.path.join(root, 'main.yaml'), override
+
+
+def write_yaml(path, data):
+    with open(path, 'w') as f:
+        yaml.safe_dump(data, f)
+
+
+def measure(fn, repeat, setup=None):
+    """Time `fn` (best and median over `repeat` runs), then measure its peak memory in a separate run"""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'min_s': min(times), 'median_s': statistics.median(times), 'peak_bytes': peak}
+
+
+def clear_registries():
+    PARSER_GETTERS.clear()
+    ENTRY_POINTS.clear()
+    IMPORTED_MODULES.clear()
+
+
+def bench_case(n_leaves, n_args, depth, repeat):
+    with tempfile.TemporaryDirectory() as root:
+        config_path, override = make_tree(root, n_leaves, n_args, depth)
+        first_key = next(iter(override))
+        cwd = os.getcwd()
+        os.chdir(root)
+        try:
+            m = Multiplexor(config_path)
+            lazy = Multiplexor(config_path, lazy=True)
+            fast = Multiplexor(config_path, engine='fast')
+            conf = m.get_conf(args=[])
+            results = {
+                'Multiplexor.__init__': measure(lambda: Multiplexor(config_path), repeat),
+                'parse_args': measure(lambda: m.parse_args(['train']), repeat, setup=clear_registries),
+                'parse_args(lazy)': measure(lambda: lazy.parse_args(['train']), repeat),
+                'get_conf': measure(lambda: m.get_conf(args=[]), repeat),
+                'get_conf(fast)': measure(lambda: fast.get_conf(args=[]), repeat),
+                'add_default_arguments': measure(
+                    lambda: m.add_default_arguments(argparse.ArgumentParser()), repeat),
+                'get_nested_config': measure(
+                    lambda: m.get_nested_config(first_key, override[first_key]), repeat),
+                'DotListConfig.keys': measure(lambda: DotListConfig(conf.data).keys(), repeat),
+                'DotListConfig.items': measure(lambda: list(DotListConfig(conf.data).items()), repeat),
+            }
+        finally:
+            os.chdir(cwd)
+            clear_registries()
+    return {'leaves': n_leaves, 'arguments': n_args, 'depth': depth, 'results': results}
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the startup cost of multiplex')
+    parser.add_argument('-o', '--output', help='write results as JSON to this file (default: stdout)')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='runs per measurement (default: 5)')
+    parser.add_argument('--quick', action='store_true', help='only run the smallest and largest cases')
+    args = parser.parse_args()
+
+    leaves, arguments, depths = LEAVES, ARGUMENTS, DEPTHS
+    if args.quick:
+        leaves, arguments, depths = [LEAVES[0], LEAVES[-1]], [ARGUMENTS[0], ARGUMENTS[-1]], [DEPTHS[0]]
+
+    cases = []
+    for n_leaves in leaves:
+        for n_args in arguments:
+            for depth in depths:
+                print(f'leaves={n_leaves} arguments={n_args} depth={depth}', file=sys.stderr)
+                cases.append(bench_case(n_leaves, n_args, depth, args.repeat))
+
+    report = {'commit': get_commit(), 'python': platform.python_version(),
+              'platform': platform.platform(), 'time': time.time(), 'cases': cases}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,7 @@
 
 from multiplex import Multiplexor, register_entrypoint
 
-app = Multiplexor(__file__)
+app = Multiplexor(__file__, lazy=True)
 
 
 @register_entrypoint
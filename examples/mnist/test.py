@@ -7,7 +7,7 @@ import torch.nn.functional as F
 from torchvision import datasets, transforms
 
 from examples.mnist.utils import init_model
-from multiplex import register_parser, register_entrypoint
+from multiplex import cache_results, register_parser, register_entrypoint
 
 
 def test(model, device, test_loader):
@@ -23,10 +23,7 @@ def test(model, device, test_loader):
             correct += pred.eq(target.view_as(pred)).sum().item()
 
     test_loss /= len(test_loader.dataset)
-
-    print('\nTest set: Average loss: {:.4f}, Accuracy: {}/{} ({:.0f}%)\n'.format(
-        test_loss, correct, len(test_loader.dataset),
-        100. * correct / len(test_loader.dataset)))
+    return test_loss, correct, len(test_loader.dataset)
 
 
 @register_parser
@@ -38,8 +35,9 @@ def get_parser(parents):
     return parser
 
 
-@register_entrypoint
-def main(args):
+# Evaluating the same saved model with the same arguments again returns the cached metrics
+@cache_results(inputs=['model_path'])
+def evaluate(args):
     model, device, use_cuda = init_model(args.seed, args.no_cuda)
 
     if args.model_path:
@@ -54,4 +52,11 @@ def main(args):
             transforms.Normalize((0.1307,), (0.3081,))
         ])),
         batch_size=args.batch_size, shuffle=True, **kwargs)
-    test(model, device, test_loader)
+    return test(model, device, test_loader)
+
+
+@register_entrypoint
+def main(args):
+    test_loss, correct, total = evaluate(args)
+    print('\nTest set: Average loss: {:.4f}, Accuracy: {}/{} ({:.0f}%)\n'.format(
+        test_loss, correct, total, 100. * correct / total))
@@ -1,28 +1,35 @@
 # Inspired from https://github.com/pytorch/examples/blob/master/mnist/main.py
 
+import time
+
 import torch
 import torch.nn.functional as F
 import torch.optim as optim
 from torch.optim.lr_scheduler import StepLR
 from torchvision import datasets, transforms
 
-from examples.mnist.utils import init_model
-from multiplex import register_parser, register_entrypoint, Multiplexor
+from examples.mnist.utils import configure_threads, get_loader_kwargs, get_throughput_settings, init_model, \
+    optimize_model
+from multiplex import register_parser, register_entrypoint, share_config, Multiplexor
 
 app = Multiplexor(__file__)
 
 
-def train(args, model, device, train_loader, optimizer, scheduler):
+def train(args, model, device, train_loader, optimizer, scheduler, memory_format=torch.contiguous_format):
     for epoch in range(1, args.epochs + 1):
         print('Starting Epoch: {}'.format(epoch))
-        train_epoch(args, model, device, train_loader, optimizer, epoch)
+        start = time.perf_counter()
+        samples = train_epoch(args, model, device, train_loader, optimizer, epoch, memory_format)
+        print('Epoch {}: {:.0f} samples/sec'.format(epoch, samples / (time.perf_counter() - start)))
         scheduler.step()
 
 
-def train_epoch(args, model, device, train_loader, optimizer, epoch):
+def train_epoch(args, model, device, train_loader, optimizer, epoch, memory_format=torch.contiguous_format):
     model.train()
+    samples = 0
     for batch_idx, (data, target) in enumerate(train_loader):
-        data, target = data.to(device), target.to(device)
+        data, target = data.to(device, memory_format=memory_format), target.to(device)
+        samples += len(data)
         optimizer.zero_grad()
         output = model(data)
         loss = F.nll_loss(output, target)
@@ -32,6 +39,7 @@ def train_epoch(args, model, device, train_loader, optimizer, epoch):
             print('Train Epoch: {} [{}/{} ({:.0f}%)]\tLoss: {:.6f}'.format(
                 epoch, batch_idx * len(data), len(train_loader.dataset),
                        100. * batch_idx / len(train_loader), loss.item()))
+    return samples
 
 
 @register_parser
@@ -41,8 +49,12 @@ def get_parser(parents):
 
 @register_entrypoint
 def main(args):
+    # Workers (and anything else args is pickled to) only get a handle to the config in shared memory
+    args.conf = share_config(args.conf)
+    throughput = get_throughput_settings(args)
+    configure_threads(throughput)
     model, device, use_cuda = init_model(args.seed, args.no_cuda)
-    kwargs = {'num_workers': 1, 'pin_memory': True} if use_cuda else {}
+    kwargs = get_loader_kwargs(throughput, use_cuda)
     train_loader = torch.utils.data.DataLoader(
         datasets.MNIST('../data', train=True, download=True,
                        transform=transforms.Compose([
@@ -54,7 +66,11 @@ def main(args):
     optimizer = optim.Adadelta(model.parameters(), lr=args.conf.data.get('lr'))
     scheduler = StepLR(optimizer, step_size=1, gamma=args.conf.data.get('gamma'))
 
-    train(args, model, device, train_loader, optimizer, scheduler)
+    # The compiled (or scripted) model shares the parameters of the original one, which is the one saved
+    optimized = optimize_model(model, throughput)
+    channels_last = throughput['enabled'] and throughput['channels_last']
+    train(args, optimized, device, train_loader, optimizer, scheduler,
+          memory_format=torch.channels_last if channels_last else torch.contiguous_format)
 
     if args.save_model:
         torch.save(model.state_dict(), "mnist_cnn.pt")
@@ -9,3 +9,43 @@ def init_model(seed=1, no_cuda=False):
     device = torch.device("cuda" if use_cuda else "cpu")
     model = Net().to(device)
     return model, device, use_cuda
+
+
+def get_throughput_settings(args, key='throughput'):
+    """Collect the `throughput` section of the parsed arguments (i.e: `throughput.num_workers`)"""
+    prefix = key + '.'
+    return {name[len(prefix):]: value for name, value in vars(args).items() if name.startswith(prefix)}
+
+
+def configure_threads(settings):
+    """Set torch's thread pools, before any parallel work (the inter-op pool can only be set once)"""
+    if not settings.get('enabled'):
+        return
+    if settings['num_threads'] > 0:
+        torch.set_num_threads(settings['num_threads'])
+    if settings['interop_threads'] > 0:
+        torch.set_num_interop_threads(settings['interop_threads'])
+
+
+def get_loader_kwargs(settings, use_cuda):
+    """DataLoader arguments of the throughput mode, or the defaults of the example if it is disabled"""
+    if not settings.get('enabled'):
+        return {'num_workers': 1, 'pin_memory': True} if use_cuda else {}
+    kwargs = {'num_workers': settings['num_workers'], 'pin_memory': settings['pin_memory']}
+    # Only valid with worker processes
+    if settings['num_workers'] > 0:
+        kwargs.update(persistent_workers=settings['persistent_workers'], prefetch_factor=settings['prefetch_factor'])
+    return kwargs
+
+
+def optimize_model(model, settings):
+    """Convert the model to the memory format of the throughput mode, then compile or script it"""
+    if not settings.get('enabled'):
+        return model
+    if settings['channels_last']:
+        model = model.to(memory_format=torch.channels_last)
+    if settings['compile'] == 'compile':
+        model = torch.compile(model)
+    elif settings['compile'] == 'script':
+        model = torch.jit.script(model)
+    return model
@@ -1,4 +1,45 @@
+import importlib
+
+from .cache import *
+from .coercion import *
 from .config import *
+from .dispatch import *
 from .engines import *
+from .groups import *
+from .indexed import *
+from .interpolation import *
+from .lazy import *
+from .loaders import *
 from .parser import *
+from .profiling import *
+from .shared import *
+from .structs import *
+from .usage import *
 from .utils import *
+
+# Modules only imported once one of their names is accessed (i.e: `from multiplex import cache_results`),
+# so that importing multiplex doesn't load sqlite3, sockets, multiprocessing or inotify. Kept in sync
+# with their `__all__`.
+_LAZY_EXPORTS = {
+    'completion': ('COMPLETION_VERSION', 'SHELLS', 'collect_completions', 'completion_hash', 'default_completion_path',
+                   'find_config_groups', 'generate_completion', 'write_completion'),
+    'daemon': ('LauncherServer', 'default_socket_path', 'run_client', 'serve'),
+    'jobs': ('DEFAULT_LEASE', 'DEFAULT_MAX_ATTEMPTS', 'Job', 'JobQueue', 'Worker', 'run_workers'),
+    'results': ('DEFAULT_MAX_SIZE', 'RESULTS_VERSION', 'ResultCache', 'cache_results', 'canonical_hash'),
+    'sweep': ('expand_sweep', 'expand_sweep_args', 'get_run_name', 'run_sweep'),
+    'watch': ('DEBOUNCE_DELAY', 'MISSING', 'ConfigWatcher', 'diff_configs'),
+}
+_LAZY_NAMES = {name: module for module, names in _LAZY_EXPORTS.items() for name in names}
+
+
+def __getattr__(name):
+    module = _LAZY_NAMES.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_NAMES))
@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import sys
+
+from .completion import SHELLS, generate_completion, write_completion
+from .daemon import run_client, serve
+from .jobs import DEFAULT_LEASE, JobQueue, run_workers
+from .loaders import compile_config
+from .parser import Multiplexor, ParserError
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(prog='multiplex', description='Multiplex command line tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help="serve a program's subprograms from a warm process")
+    serve_parser.add_argument('config', help="path to the program's config")
+    serve_parser.add_argument('-s', '--socket', dest='socket_path', help='path of the unix socket to listen on')
+    serve_parser.add_argument('--no-preload', dest='preload', action='store_false',
+                              help="don't import the subprograms on startup")
+
+    client_parser = subparsers.add_parser('client', help='run a program through a launcher server')
+    client_parser.add_argument('-s', '--socket', dest='socket_path', help="path of the server's unix socket")
+    client_parser.add_argument('argv', nargs=argparse.REMAINDER, help="the program's arguments")
+
+    compile_parser = subparsers.add_parser('compile', help='compile config files to a binary format that loads faster')
+    compile_parser.add_argument('configs', nargs='+', help='paths to the config files')
+    compile_parser.add_argument('-o', '--output', help='path of the compiled config, only valid with a single config')
+    compile_parser.add_argument('--indexed', action='store_true',
+                                help='compile to a memory-mapped format whose keys are only decoded when accessed')
+
+    completion_parser = subparsers.add_parser('completion', help='generate a static shell completion script')
+    completion_parser.add_argument('config', help="path to the program's config")
+    completion_parser.add_argument('-s', '--shell', choices=SHELLS, default='bash', help='shell to complete in')
+    completion_parser.add_argument('-o', '--output', help='write the script to this path, only if the configs changed')
+    completion_parser.add_argument('--prog', help="name of the program's command, defaults to <config name>.py")
+
+    submit_parser = subparsers.add_parser('submit', help='resolve a command line and add it to a job queue')
+    submit_parser.add_argument('queue', help="path of the queue's SQLite file")
+    submit_parser.add_argument('config', help="path to the program's config")
+    submit_parser.add_argument('argv', nargs=argparse.REMAINDER, help="the program's arguments")
+
+    worker_parser = subparsers.add_parser('worker', help='run the jobs of a job queue')
+    worker_parser.add_argument('queue', help="path of the queue's SQLite file")
+    worker_parser.add_argument('-n', '--workers', type=int, help='number of worker processes, defaults to the CPUs')
+    worker_parser.add_argument('--lease', type=float, default=DEFAULT_LEASE,
+                               help='seconds after which the job of an unresponsive worker is run again')
+    worker_parser.add_argument('--drain', action='store_true', help='stop once the queue is empty')
+    worker_parser.add_argument('--poll-interval', type=float, default=1.0,
+                               help='seconds between claims when the queue is empty')
+
+    jobs_parser = subparsers.add_parser('jobs', help='list the jobs of a job queue')
+    jobs_parser.add_argument('queue', help="path of the queue's SQLite file")
+    jobs_parser.add_argument('--status', help='only list the jobs with this status')
+    return parser
+
+
+def _get_prog(config):
+    """Name of the program of a config, i.e: `mnist.py` for `mnist.yaml`"""
+    return os.path.splitext(os.path.basename(config))[0] + '.py'
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    if args.command == 'serve':
+        serve(Multiplexor(args.config), socket_path=args.socket_path, preload=args.preload, prog=_get_prog(args.config))
+    elif args.command == 'client':
+        argv = args.argv[1:] if args.argv[:1] == ['--'] else args.argv
+        return run_client(argv, socket_path=args.socket_path)
+    elif args.command == 'compile':
+        if args.output is not None and len(args.configs) > 1:
+            get_parser().error('--output can only be used with a single config')
+        for config in args.configs:
+            print(compile_config(config, output=args.output, indexed=args.indexed))
+    elif args.command == 'completion':
+        multiplexor = Multiplexor(args.config, lazy=True)
+        if args.output is None:
+            sys.stdout.write(generate_completion(multiplexor, shell=args.shell, prog=args.prog))
+        else:
+            path, regenerated = write_completion(multiplexor, shell=args.shell, output=args.output, prog=args.prog)
+            print(path if regenerated else f'{path} is up to date')
+    elif args.command == 'submit':
+        argv = args.argv[1:] if args.argv[:1] == ['--'] else args.argv
+        # The program's parsers are named after it rather than after this module
+        sys.argv[0] = _get_prog(args.config)
+        try:
+            job_ids = JobQueue(args.queue).submit(Multiplexor(args.config, lazy=True), [argv])
+        except ParserError as e:
+            get_parser().error(f'{e.prog}: {e.message}')
+        for job_id in job_ids:
+            print(job_id)
+    elif args.command == 'worker':
+        run_workers(args.queue, workers=args.workers, lease=args.lease, drain=args.drain,
+                    poll_interval=args.poll_interval)
+    elif args.command == 'jobs':
+        for job in JobQueue(args.queue).jobs(status=args.status):
+            duration = '' if job.duration is None else f'{job.duration:.2f}s'
+            error = (job.error or '').strip().splitlines()[-1:]
+            print(job.id, job.status, job.attempts, job.worker or '', duration, ' '.join(json.loads(job.argv)),
+                  *error, sep='\t')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
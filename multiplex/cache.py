@@ -0,0 +1,70 @@
+import hashlib
+import os
+import pickle
+
+__all__ = ['CACHE_VERSION', 'ParserCache', 'default_cache_dir']
+
+CACHE_VERSION = 3
+
+
+def default_cache_dir():
+    """Returns the default cache directory, `$XDG_CACHE_HOME/multiplex` or `~/.cache/multiplex`"""
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'multiplex')
+
+
+class ParserCache:
+    """On-disk cache of parsed and validated configs.
+
+    Each entry is keyed on the content hash and modification time of a config file,
+    along with the options it was compiled with, and holds whatever the caller stores
+    for it, typically the raw config data along with the normalized argparse specs (see
+    `ArgparseEngine.compile_specs`). A warm start can then skip both the YAML parsing
+    and the argparse validation.
+
+    Entries are pickled, written atomically and silently ignored if they can't be read,
+    so a corrupted or stale cache only ever costs a cold start.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = default_cache_dir() if cache_dir is None else os.path.expanduser(cache_dir)
+
+    @staticmethod
+    def key(path, options=()):
+        """Compute the cache key of a config file from its content and mtime, and the options
+        it is compiled with (i.e: the keys of its sections), which must have a stable `repr`"""
+        stat = os.stat(path)
+        with open(path, 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha256(content)
+        digest.update(f'{CACHE_VERSION}:{stat.st_mtime_ns}:{options!r}'.encode())
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, key + '.pickle')
+
+    def load(self, key):
+        """Load a cached entry, returns None on a cache miss"""
+        try:
+            with open(self.entry_path(key), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+
+    def store(self, key, entry):
+        """Store an entry, failing silently if it can't be serialized or written"""
+        import tempfile
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.entry_path(key))
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
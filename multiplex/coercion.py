@@ -0,0 +1,244 @@
+import os
+import sys
+
+from .config import DotListConfig
+from .indexed import LazyMapping
+from .loaders import get_yaml_loader
+
+__all__ = ['FALSE_STRINGS', 'SCALAR_CONVERTERS', 'SEQUENCE_TYPES', 'TRUE_STRINGS', 'TYPE_NAMES', 'BoolConverter',
+           'CoercionError', 'Converter', 'EnumConverter', 'LazyConverters', 'LiteralConverter', 'PathConverter',
+           'ScalarConverter', 'SequenceConverter', 'compile_converters', 'get_converter', 'infer_converter']
+
+TRUE_STRINGS = frozenset({'true', 'yes', 'y', 'on', '1'})
+FALSE_STRINGS = frozenset({'false', 'no', 'n', 'off', '0'})
+
+
+class CoercionError(ValueError):
+    """Raised when some overrides can't be converted, with every error at once"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('invalid overrides:\n' + '\n'.join(f'  {key}: {error}' for key, error in errors.items()))
+
+    def __reduce__(self):
+        # Pickled with its errors rather than its message, i.e: when raised in a worker process
+        return type(self), (self.errors,)
+
+
+class Converter:
+    """Converts a value given on the command line (a string) to its type.
+
+    Converters are plain picklable objects, so that they can be cached along with the
+    parser (see `ParserCache`), and have a `__name__` like the types argparse expects.
+    """
+    __name__ = 'value'
+
+    def __call__(self, text):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.__name__})'
+
+
+class LiteralConverter(Converter):
+    """Parses the value as a yaml scalar, i.e: `3` -> 3, `0.1` -> 0.1, `true` -> True and `abc` -> 'abc'.
+    Interpolations (see `Template`) are kept as is, they are resolved once the config is."""
+    __name__ = 'literal'
+
+    def __call__(self, text):
+        if not isinstance(text, str) or '${' in text:
+            return text
+        import yaml
+        try:
+            return yaml.load(text, Loader=get_yaml_loader())
+        except yaml.YAMLError:
+            return text
+
+
+class ScalarConverter(Converter):
+    def __init__(self, type_):
+        self.type = type_
+        self.__name__ = type_.__name__
+
+    def __call__(self, text):
+        try:
+            return self.type(text)
+        except (TypeError, ValueError):
+            raise ValueError(f'invalid {self.__name__} value: {text!r}') from None
+
+
+class BoolConverter(Converter):
+    __name__ = 'bool'
+
+    def __call__(self, text):
+        if isinstance(text, bool):
+            return text
+        lowered = text.strip().lower()
+        if lowered in TRUE_STRINGS:
+            return True
+        if lowered in FALSE_STRINGS:
+            return False
+        raise ValueError(f'invalid bool value: {text!r}')
+
+
+class PathConverter(Converter):
+    __name__ = 'path'
+
+    def __call__(self, text):
+        import pathlib
+        return pathlib.Path(os.path.expanduser(text))
+
+
+class SequenceConverter(Converter):
+    """Parses comma separated values, optionally in brackets, i.e: `1,2,3` or `[1, 2, 3]`"""
+
+    def __init__(self, item_converter, container=list):
+        self.item_converter = item_converter
+        self.container = container
+        self.__name__ = f'{container.__name__}[{item_converter.__name__}]'
+
+    def __call__(self, text):
+        if not isinstance(text, str):
+            return self.container(self.item_converter(item) for item in text)
+        text = text.strip()
+        if text[:1] + text[-1:] in ('[]', '()'):
+            text = text[1:-1]
+        items = [item.strip() for item in text.split(',')] if text.strip() else []
+        return self.container(self.item_converter(item) for item in items)
+
+
+class EnumConverter(Converter):
+    """Only accepts one of `choices`, which may be of any scalar type"""
+    __name__ = 'enum'
+
+    def __init__(self, choices):
+        self.choices = list(choices)
+
+    def __call__(self, text):
+        for choice in self.choices:
+            if text == choice or str(choice) == text:
+                return choice
+        raise ValueError(f'invalid choice: {text!r} (choose from {", ".join(map(str, self.choices))})')
+
+
+SCALAR_CONVERTERS = {
+    'int': ScalarConverter(int),
+    'float': ScalarConverter(float),
+    'str': ScalarConverter(str),
+    'bool': BoolConverter(),
+    'path': PathConverter(),
+    'literal': LiteralConverter(),
+}
+SEQUENCE_TYPES = {'list': list, 'tuple': tuple}
+TYPE_NAMES = frozenset(SCALAR_CONVERTERS) | frozenset(SEQUENCE_TYPES)
+
+
+def get_converter(spec):
+    """Get the converter of a type, as written in a config's schema.
+
+    Args:
+        spec: Either the name of a type (`int`, `float`, `str`, `bool`, `path` or `literal`),
+              of a sequence of them (i.e: `list`, `list[int]` or `tuple[float]`), or a list of
+              the values allowed for an enum
+
+    Returns:
+        The converter
+    """
+    if isinstance(spec, (list, tuple)):
+        return EnumConverter(spec)
+    if not isinstance(spec, str):
+        raise ValueError(f'Invalid type in schema: {spec!r}')
+    name, _, item_name = spec.strip().partition('[')
+    if name in SEQUENCE_TYPES:
+        item_converter = get_converter(item_name.rstrip(']') or 'literal')
+        return SequenceConverter(item_converter, SEQUENCE_TYPES[name])
+    if item_name or name not in SCALAR_CONVERTERS:
+        raise ValueError(f'Unknown type in schema: {spec!r}, use one of {sorted(TYPE_NAMES)} or a list of choices')
+    return SCALAR_CONVERTERS[name]
+
+
+def infer_converter(value):
+    """Infer the converter of a key from its default value, None if it can't be inferred"""
+    # The type of an interpolation is only known once resolved
+    if isinstance(value, str) and '${' in value:
+        return SCALAR_CONVERTERS['literal']
+    # bool is checked first since it is a subclass of int
+    for type_ in (bool, int, float, str):
+        if isinstance(value, type_):
+            return SCALAR_CONVERTERS[type_.__name__]
+    if value is None:
+        return SCALAR_CONVERTERS['literal']
+    # Paths can only be given by programs that imported pathlib, which is slow to import
+    pathlib = sys.modules.get('pathlib')
+    if pathlib is not None and isinstance(value, pathlib.PurePath):
+        return SCALAR_CONVERTERS['path']
+    if isinstance(value, (list, tuple)):
+        item_converter = infer_converter(value[0]) if value else None
+        if item_converter is None or isinstance(value[0], (list, tuple)):
+            item_converter = SCALAR_CONVERTERS['literal']
+        return SequenceConverter(item_converter, list if isinstance(value, list) else tuple)
+    return None
+
+
+class LazyConverters:
+    """The converters of a lazy config's keys (see `LazyMapping`), each compiled the first
+    time it is looked up, so that only the values of the overridden keys are decoded.
+
+    Supports the lookups of the dict returned by `compile_converters`, `get` and `[]`.
+    """
+
+    def __init__(self, defaults, schema=None, dotlist_sep='.'):
+        self.defaults = defaults
+        self.schema = DotListConfig(schema or {}, dotlist_sep=dotlist_sep)
+        self._converters = {}
+
+    def _compile(self, key):
+        spec = self.schema.get(key)
+        if spec is not None and not isinstance(spec.data, dict):
+            return get_converter(spec.data)
+        value = self.defaults.get(key)
+        return None if value is None else infer_converter(value.data)
+
+    def get(self, key, default=None):
+        if key not in self._converters:
+            self._converters[key] = self._compile(key)
+        converter = self._converters[key]
+        return default if converter is None else converter
+
+    def __getitem__(self, key):
+        converter = self.get(key)
+        if converter is None:
+            raise KeyError(key)
+        return converter
+
+
+def compile_converters(defaults, schema=None, dotlist_sep='.'):
+    """Compile the converter of every key of a config.
+
+    The converters of a lazy config (see `LazyMapping`) are only compiled as they are
+    looked up instead, see `LazyConverters`.
+
+    Args:
+        defaults:    The config whose leaves' converters are inferred from their values
+        schema:      Optional mapping of (nested or dotted) keys to their type, see `get_converter`,
+                     which takes precedence over the inferred types
+        dotlist_sep: Separator used for nested keys
+
+    Returns:
+        dict mapping dotted keys to their converter, keys whose type can't be inferred are omitted
+    """
+    defaults = defaults if isinstance(defaults, DotListConfig) else DotListConfig(defaults, dotlist_sep=dotlist_sep)
+    if isinstance(defaults.data, LazyMapping):
+        return LazyConverters(defaults, schema=schema, dotlist_sep=dotlist_sep)
+    converters = {}
+    if isinstance(defaults.data, dict):
+        for key, value in defaults.items():
+            converter = infer_converter(value.data)
+            if converter is not None:
+                converters[key] = converter
+    if schema:
+        schema = DotListConfig(schema, dotlist_sep=dotlist_sep)
+        for key, spec in schema.items():
+            converters[key] = get_converter(spec.data)
+    return converters
+
@@ -0,0 +1,320 @@
+import hashlib
+import json
+import os
+import re
+import shlex
+import tempfile
+
+from .cache import default_cache_dir
+from .groups import load_config_file
+from .indexed import LazyMapping
+from .lazy import LazySubprogram, find_sidecar_config
+from .loaders import _file_hash
+
+__all__ = ['COMPLETION_VERSION', 'SHELLS', 'collect_completions', 'completion_hash', 'default_completion_path',
+           'find_config_groups', 'generate_completion', 'write_completion']
+
+COMPLETION_VERSION = 1
+SHELLS = ('bash', 'zsh', 'fish')
+_HASH_PREFIX = '# multiplex-hash: '
+# Candidates are baked into shell code, so only plain option names are kept
+_SAFE_CANDIDATE = re.compile(r'^-[\w.:+/-]*=?$')
+_SAFE_NAME = re.compile(r'^[\w.+-]+$')
+
+
+def _option_strings(parser):
+    return [option for action in parser._actions for option in action.option_strings]
+
+
+def _safe(candidates):
+    return [candidate for candidate in dict.fromkeys(candidates) if _SAFE_CANDIDATE.match(candidate)]
+
+
+def _get_root(multiplexor, root=None):
+    if root is not None:
+        return os.path.abspath(root)
+    if multiplexor.config_path is not None:
+        return os.path.dirname(multiplexor.config_path)
+    return os.getcwd()
+
+
+def _get_subprogram_paths(multiplexor, root):
+    """dict mapping the (space separated) commands of the subprograms to their paths"""
+    if not multiplexor.subprogram_conf.data:
+        return {}
+    return {' '.join(command): os.path.join(root, path)
+            for command, path in multiplexor.dispatch_trie.leaves().items()}
+
+
+def find_config_groups(root, exclude=(), ext='yaml'):
+    """Find the nested config files under a directory, as the dotted key they are overridden with.
+
+    Returns:
+        dict mapping keys (i.e: `learn.lr` for `learn/lr.yaml`) to the path of the config file
+    """
+    exclude = {os.path.abspath(path) for path in exclude}
+    groups = {}
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories[:] = sorted(d for d in subdirectories if not d.startswith(('.', '__')))
+        for file_name in sorted(files):
+            path = os.path.join(directory, file_name)
+            base_path, file_ext = os.path.splitext(os.path.relpath(path, root))
+            if file_ext == os.path.extsep + ext and path not in exclude:
+                groups['.'.join(base_path.split(os.sep))] = path
+    return groups
+
+
+def _get_source_files(multiplexor, root):
+    """The files the completion is generated from, that is, every file it must be regenerated for"""
+    subprograms = _get_subprogram_paths(multiplexor, root)
+    sidecars = [find_sidecar_config(path) for path in subprograms.values()]
+    sidecars = [path for path in sidecars if path is not None]
+    exclude = [multiplexor.config_path] + sidecars if multiplexor.config_path else sidecars
+    groups = find_config_groups(root, exclude=exclude) if subprograms else {}
+    files = ([multiplexor.config_path] if multiplexor.config_path else []) + list(subprograms.values())
+    return files + sidecars + list(groups.values()), groups
+
+
+def completion_hash(multiplexor, shell='bash', prog=None, root=None):
+    """Hash of the content of all the files a completion script is generated from"""
+    root = _get_root(multiplexor, root)
+    files, _ = _get_source_files(multiplexor, root)
+    digest = hashlib.sha256(f'{COMPLETION_VERSION}:{shell}:{prog}:{root}'.encode())
+    if multiplexor.config_path is None:
+        digest.update(json.dumps(multiplexor.full_config.data, sort_keys=True, default=str).encode())
+    for path in files:
+        digest.update(f'{path}:{_file_hash(path) if os.path.isfile(path) else None}'.encode())
+    return digest.hexdigest()
+
+
+def collect_completions(multiplexor, root=None):
+    """Collect the completion candidates of a program, without importing its subprograms
+    where possible (see `LazySubprogram`).
+
+    Returns:
+        (tuple): tuple containing:
+            - the options of the main program
+            - dict mapping each command (space separated, i.e: `model train`) to its candidates,
+              the options and config overrides of subprograms or the nested commands of groups
+    """
+    root = _get_root(multiplexor, root)
+    subprograms = _get_subprogram_paths(multiplexor, root)
+    if not subprograms:
+        return _safe(_option_strings(multiplexor._get_main_parser())), {}
+
+    # The help option is always available, whether the argparse config declares it or not
+    main_options = ['-h', '--help']
+    if multiplexor.argparse_conf.data:
+        argparse_engine = multiplexor._get_argparse_engine()
+        main_parser = argparse_engine.add_argparse_arguments(argparse_engine.get_emtpy_parser(add_help=False))
+        main_options += _option_strings(main_parser)
+
+    sep = multiplexor.dotlist_sep
+    sections = (multiplexor.argparse_key, multiplexor.subprogram_key, multiplexor.schema_key)
+    overrides = [f'--{key}=' for key in multiplexor.default_conf.keys()] \
+        if isinstance(multiplexor.default_conf.data, (dict, LazyMapping)) else []
+    _, groups = _get_source_files(multiplexor, root)
+    for group, path in groups.items():
+        config = load_config_file(path)
+        if isinstance(config.data, dict):
+            overrides += [f'--{group.replace(".", sep)}{sep}{key}=' for key in config.keys()
+                          if key.split(sep)[0] not in sections]
+    commands = {}
+    for command in multiplexor.dispatch_trie.iter_commands():
+        name = ' '.join(command)
+        if not all(_SAFE_NAME.match(part) for part in command):
+            continue
+        node = multiplexor.dispatch_trie.get(command)
+        if node.is_leaf:
+            subprogram = LazySubprogram(subprograms[name], registry=multiplexor.registry,
+                                        options=multiplexor._subprogram_options())
+            options = _option_strings(subprogram.get_parser(parents=[]))
+            commands[name] = _safe(options + main_options + overrides)
+        else:
+            commands[name] = [child for child in node.children if _SAFE_NAME.match(child)]
+    return _safe(main_options), commands
+
+
+def _quote_words(words):
+    return shlex.quote(' '.join(words))
+
+
+def _top_level(commands):
+    return [command for command in commands if ' ' not in command]
+
+
+def _bash_script(prog, function, main_options, commands):
+    lines = [f'_{function}() {{',
+             '    local cur="${COMP_WORDS[COMP_CWORD]}" command="" candidates i']
+    if commands:
+        # The command is extended by each word naming one of its nested commands
+        lines += ['    for ((i = 1; i < COMP_CWORD; i++)); do',
+                  '        case "$command${command:+ }${COMP_WORDS[i]}" in',
+                  f'            {"|".join(map(shlex.quote, commands))}) '
+                  'command="$command${command:+ }${COMP_WORDS[i]}";;',
+                  '        esac',
+                  '    done']
+    lines += ['    case "$command" in']
+    for command, candidates in commands.items():
+        lines += [f'        {shlex.quote(command)}) candidates={_quote_words(candidates)};;']
+    lines += ['        *) if [[ "$cur" == -* ]]; then',
+              f'               candidates={_quote_words(main_options)}',
+              '           else',
+              f'               candidates={_quote_words(_top_level(commands))}',
+              '           fi;;',
+              '    esac',
+              '    COMPREPLY=($(compgen -W "$candidates" -- "$cur"))',
+              '    if [[ ${#COMPREPLY[@]} -eq 1 && "${COMPREPLY[0]}" == *= ]]; then',
+              '        compopt -o nospace 2>/dev/null',
+              '    fi',
+              '}',
+              f'complete -o default -F _{function} {prog} ./{prog}']
+    return lines
+
+
+def _zsh_script(prog, function, main_options, commands):
+    lines = [f'#compdef {prog} ./{prog}',
+             f'_{function}() {{',
+             '    local command="" word',
+             '    local -a candidates']
+    if commands:
+        lines += ['    for word in ${words[2,CURRENT-1]}; do',
+                  '        case "$command${command:+ }$word" in',
+                  f'            ({"|".join(map(shlex.quote, commands))}) command="$command${{command:+ }}$word";;',
+                  '        esac',
+                  '    done']
+    lines += ['    case "$command" in']
+    for command, candidates in commands.items():
+        lines += [f'        ({shlex.quote(command)}) candidates=({" ".join(candidates)});;']
+    lines += ['        (*) if [[ $PREFIX == -* ]]; then',
+              f'                candidates=({" ".join(main_options)})',
+              '            else',
+              f'                candidates=({" ".join(_top_level(commands))})',
+              '            fi;;',
+              '    esac',
+              '    if (( ! ${#candidates} )); then',
+              '        _files',
+              '        return',
+              '    fi',
+              "    compadd -S '' -- ${(M)candidates:#*=}",
+              '    compadd -- ${candidates:#*=}',
+              '}',
+              f'compdef _{function} {prog} ./{prog}']
+    return lines
+
+
+def _fish_option(command, condition, option):
+    name = option.rstrip('=')
+    if name.startswith('--'):
+        flag = f'-l {shlex.quote(name[2:])}'
+    elif len(name) == 2:
+        flag = f'-s {shlex.quote(name[1:])}'
+    else:
+        flag = f'-o {shlex.quote(name[1:])}'
+    required = ' -r' if option.endswith('=') else ''
+    return f'complete -c {command} -n {shlex.quote(condition)} {flag}{required}'
+
+
+def _fish_script(prog, function, main_options, commands):
+    # `__<function>_at COMMAND` tells whether COMMAND is the one on the command line
+    at = f'__{function}_at'
+    lines = [f'function {at}',
+             f'    set -l commands {" ".join(map(shlex.quote, commands))}',
+             '    set -l words (commandline -opc)',
+             '    set -e words[1]',
+             '    set -l command',
+             '    for word in $words',
+             '        if contains -- (string join \' \' $command $word) $commands',
+             '            set -a command $word',
+             '        end',
+             '    end',
+             '    test "$command" = "$argv"',
+             'end']
+    for program in (prog, f'./{prog}'):
+        if commands:
+            lines.append(f'complete -c {program} -n {at} -f -a {_quote_words(_top_level(commands))}')
+        lines += [_fish_option(program, at, option) for option in main_options]
+        for command, candidates in commands.items():
+            condition = f'{at} {shlex.quote(command)}'
+            if candidates and not candidates[0].startswith('-'):
+                lines.append(f'complete -c {program} -n {shlex.quote(condition)} -f -a {_quote_words(candidates)}')
+            else:
+                lines += [_fish_option(program, condition, option) for option in candidates]
+    return lines
+
+
+_SCRIPTS = {'bash': _bash_script, 'zsh': _zsh_script, 'fish': _fish_script}
+
+
+def generate_completion(multiplexor, shell='bash', prog=None, root=None):
+    """Generate a static completion script for a program.
+
+    All the candidates are baked into the script: the options of the main program, its
+    subprograms and their options, and the overrides of every key of the nested config
+    files under the program's directory. Completing never starts python.
+
+    Args:
+        multiplexor: The program's `Multiplexor`
+        shell:       One of `bash`, `zsh` or `fish`
+        prog:        Name of the program's command, defaults to the config's name with a `.py` extension
+        root:        Directory of the subprograms and nested configs, defaults to the config's directory
+
+    Returns:
+        The script, whose header holds a hash of the files it was generated from (see `completion_hash`)
+    """
+    if shell not in SHELLS:
+        raise ValueError(f'Unknown shell {shell}, use one of {SHELLS}')
+    if prog is None:
+        config_name = multiplexor.config_path or 'program'
+        prog = os.path.splitext(os.path.basename(config_name))[0] + '.py'
+    function = 'multiplex_' + re.sub(r'\W', '_', prog)
+    main_options, commands = collect_completions(multiplexor, root=root)
+    script = _SCRIPTS[shell](shlex.quote(prog), function, main_options, commands)
+    # zsh only autoloads a completion function if its file starts with `#compdef`
+    lines = [script.pop(0)] if shell == 'zsh' else []
+    lines += [f'# {shell} completion of {prog}, generated by `python -m multiplex completion`',
+              _HASH_PREFIX + completion_hash(multiplexor, shell=shell, prog=prog, root=root)]
+    lines += script
+    return '\n'.join(lines) + '\n'
+
+
+def default_completion_path(prog, shell):
+    return os.path.join(default_cache_dir(), 'completion', f'{prog}.{shell}')
+
+
+def write_completion(multiplexor, shell='bash', output=None, prog=None, root=None):
+    """Write the completion script of a program, only regenerating it if the files it
+    is generated from changed since it was last written.
+
+    Args:
+        output: Path of the script, defaults to `<cache dir>/completion/<prog>.<shell>`
+        See `generate_completion` for the other arguments.
+
+    Returns:
+        (tuple): tuple containing:
+            - the path of the script
+            - whether the script was regenerated
+    """
+    if prog is None:
+        prog = os.path.splitext(os.path.basename(multiplexor.config_path or 'program'))[0] + '.py'
+    output = default_completion_path(prog, shell) if output is None else output
+    expected = _HASH_PREFIX + completion_hash(multiplexor, shell=shell, prog=prog, root=root)
+    try:
+        with open(output) as f:
+            if any(f.readline().rstrip('\n') == expected for _ in range(3)):
+                return output, False
+    except OSError:
+        pass
+
+    script = generate_completion(multiplexor, shell=shell, prog=prog, root=root)
+    directory = os.path.dirname(os.path.abspath(output))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(script)
+        os.replace(tmp_path, output)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return output, True
@@ -1,23 +1,132 @@
+from copy import deepcopy
+
 from configurator import Config
 from configurator.node import ConfigNode
 
+from .indexed import LazyMapping
+
+__all__ = ['DotListConfig', 'LayeredConfig']
+
+_MAPPINGS = (dict, LazyMapping)
+_MERGEABLE = (dict, LazyMapping, list)
+
+
+def _merge_type(value):
+    """Type of a value when merging configs, lazy mappings are merged as dicts"""
+    return dict if isinstance(value, LazyMapping) else type(value)
+
 
 class DotListConfig(Config):
+    """A config whose nested values can be accessed with dotted keys, i.e: `conf['a.b.c']`.
+
+    Lookups go through a flat index mapping every dotted key (leaves and subtrees alike)
+    to its value. The index is built on first use and invalidated whenever the config is
+    modified, by setting a dotted key (i.e: `conf['a.b'] = 1`) or reassigning `data`, as is
+    done by `merge`, `push` and `pop`. If the underlying data is modified in place instead
+    (i.e: `conf.data['a']['b'] = 1`), `invalidate` needs to be called explicitly.
+
+    Child configs returned by item or attribute access are views on the same data,
+    and are cached so that repeated accesses don't allocate new wrappers. Modifying a
+    child also invalidates the config it was taken from, and its other children.
+
+    The data can also be a `LazyMapping` (i.e: an indexed config, see `compile_config`), in
+    which case no index is built: dotted keys are walked down the mapping, decoding only
+    the values along their path.
+    """
+    __slots__ = ('dotlist_sep', '_index', '_leaves', '_children', '_parent')
+
     def __init__(self, data=None, dotlist_sep='.'):
-        if type(data) is ConfigNode or type(data) is DotListConfig:
-            super().__init__(data=data.data)
-        else:
-            super().__init__(data=data)
+        if isinstance(data, ConfigNode):
+            data = data.data
+        object.__setattr__(self, '_parent', None)
+        super().__init__(data=data)
         self.dotlist_sep = dotlist_sep
 
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name == 'data':
+            object.__setattr__(self, '_children', {})
+            self.invalidate()
+
+    def __setitem__(self, item, value):
+        if isinstance(self.data, LazyMapping):
+            raise TypeError(f'{type(self).__name__} of an indexed config is read-only')
+        parts = item.split(self.dotlist_sep)
+        data = self.data
+        for part in parts[:-1]:
+            data = data.setdefault(part, {})
+            if not isinstance(data, dict):
+                raise TypeError(f'Cannot set {item}, {part} is not a mapping')
+        data[parts[-1]] = value
+        self.invalidate()
+
+    def invalidate(self):
+        """Drop the key index and the cached child configs, as well as those of the config this
+        one was taken from (see `_child`) and of its other children, which share the same data"""
+        root = self
+        while root._parent is not None:
+            root = root._parent
+        root._drop_index()
+        if root is not self:
+            # In case it is no longer one of the cached children
+            self._drop_index()
+
+    def _drop_index(self):
+        object.__setattr__(self, '_index', None)
+        object.__setattr__(self, '_leaves', None)
+        for child in self._children.values():
+            child._drop_index()
+
+    def __getstate__(self):
+        # The index and the child configs are rebuilt from the data, and children are pickled on their own
+        return {'data': self.data, 'dotlist_sep': self.dotlist_sep, '_previous': self._previous}
+
+    def __setstate__(self, state):
+        object.__setattr__(self, '_parent', None)
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def _build_index(self):
+        index, leaves = {}, []
+        self._find_keys(self.data, '', leaves, index)
+        object.__setattr__(self, '_index', index)
+        object.__setattr__(self, '_leaves', leaves)
+
+    def _child(self, key, value):
+        child = self._children.get(key)
+        if child is None or child.data is not value:
+            child = DotListConfig(value, dotlist_sep=self.dotlist_sep)
+            object.__setattr__(child, '_parent', self)
+            self._children[key] = child
+        return child
+
     def __getitem__(self, item):
-        value = super()
-        for part in item.split(self.dotlist_sep):
-            value = value.__getitem__(part)
-        return DotListConfig(value)
+        if isinstance(self.data, LazyMapping):
+            child = self._children.get(item)
+            if child is not None:
+                return child
+            try:
+                return self._child(item, self.data.lookup(item.split(self.dotlist_sep)))
+            except (KeyError, AttributeError):
+                raise KeyError(item)
+        if self._index is None:
+            self._build_index()
+        try:
+            value = self._index[item]
+        except (KeyError, TypeError):
+            raise KeyError(item)
+        return self._child(item, value)
 
     def __getattr__(self, name):
-        return DotListConfig(super().__getattr__(name))
+        # Never resolve private attributes or unset slots through the data, this
+        # would otherwise recurse while copying or unpickling.
+        if name.startswith('__') or name in _RESERVED_ATTRIBUTES:
+            raise AttributeError(name)
+        try:
+            value = self.data[name]
+        except (KeyError, TypeError, IndexError):
+            raise AttributeError(name)
+        return self._child(name, value)
 
     def __add__(self, other):
         other = DotListConfig(other.data)
@@ -25,15 +134,23 @@ class DotListConfig(Config):
         return DotListConfig(new_conf.data)
 
     def keys(self):
-        return self._find_keys(self.data, '', [])
+        if self._leaves is None:
+            if isinstance(self.data, LazyMapping):
+                object.__setattr__(self, '_leaves', list(self.data.leaf_keys(self.dotlist_sep)))
+            else:
+                self._build_index()
+        return list(self._leaves)
 
     def items(self):
         return ((k, self[k]) for k in self.keys())
 
-    def _find_keys(self, d, key, keys):
-        if isinstance(d, dict):
+    def _find_keys(self, d, key, keys, index=None):
+        if isinstance(d, _MAPPINGS):
             for k in d:
-                self._find_keys(d[k], key + self.dotlist_sep + k if key else k, keys)
+                sub_key = key + self.dotlist_sep + k if key else k
+                if index is not None:
+                    index[sub_key] = d[k]
+                self._find_keys(d[k], sub_key, keys, index)
         else:
             keys.append(key)
         return keys
@@ -43,3 +160,170 @@ class DotListConfig(Config):
             return self[item]
         except KeyError:
             return default
+
+
+class LayeredConfig(DotListConfig):
+    """A copy-on-write config made of a stack of layers, later layers taking precedence.
+
+    Adding configs together (i.e: defaults, files, nested configs and CLI arguments)
+    only stacks their data as new layers, nothing is copied. Lookups resolve through
+    the layers following the same rules as merging configs: dicts are merged, lists
+    are concatenated and anything else is overwritten.
+
+    The merged tree is only materialized when `data` is accessed, at which point it
+    becomes the single layer of the config. The layers are never modified: setting a key
+    (or merging) first copies them into a layer of the config's own. Child configs are
+    layered views too, and setting a key through them sets it in the config they were
+    taken from.
+    """
+    __slots__ = ('layers', '_owned', '_key')
+
+    def __init__(self, layers=None, dotlist_sep='.'):
+        layers = self._flatten(layers)
+        super().__init__(layers[0], dotlist_sep=dotlist_sep)
+        self.layers = layers
+        # Whether the single layer is a copy made by this config, which it can modify
+        object.__setattr__(self, '_owned', False)
+        # Key of this config in the one it was taken from, see `_child`
+        object.__setattr__(self, '_key', None)
+
+    @staticmethod
+    def _flatten(layers):
+        flat = []
+        for layer in layers or [{}]:
+            if isinstance(layer, LayeredConfig):
+                flat.extend(layer.layers)
+            else:
+                flat.append(layer.data if isinstance(layer, ConfigNode) else layer)
+        for layer in flat[1:]:
+            if _merge_type(layer) is not _merge_type(flat[0]) or not isinstance(layer, _MERGEABLE):
+                raise TypeError(f'Cannot merge {type(layer)} with {type(flat[0])}')
+        return flat
+
+    @property
+    def data(self):
+        if len(self.layers) > 1:
+            self._own()
+        return self.layers[0]
+
+    @data.setter
+    def data(self, value):
+        object.__setattr__(self, 'layers', [value])
+        object.__setattr__(self, '_owned', False)
+
+    def _own(self):
+        """Copy the layers into a single layer owned by this config, which can then be modified"""
+        if not self._owned:
+            object.__setattr__(self, 'layers', [self._materialize(self.layers)])
+            object.__setattr__(self, '_owned', True)
+        return self.layers[0]
+
+    def __setitem__(self, item, value):
+        parent = self._parent
+        if isinstance(parent, LayeredConfig) and self._key is not None:
+            # Set in the config this one is a view of, then view its (now owned) data
+            parent[self._key + self.dotlist_sep + item] = value
+            data = parent.layers[0]
+            for part in self._key.split(self.dotlist_sep):
+                data = data[part]
+            object.__setattr__(self, 'layers', [data])
+            object.__setattr__(self, '_owned', True)
+            self._drop_index()
+            return
+        self._own()
+        super().__setitem__(item, value)
+
+    def merge(self, source, mapping=None, mergers=None):
+        self._own()
+        super().merge(source, mapping=mapping, mergers=mergers)
+
+    @staticmethod
+    def _fold(values):
+        """Only keep the values that are merged together, that is, the last ones of the same type"""
+        group = []
+        for value in values:
+            if group and _merge_type(value) is _merge_type(group[0]) and isinstance(value, _MERGEABLE):
+                group.append(value)
+            else:
+                group = [value]
+        return group
+
+    @classmethod
+    def _materialize(cls, group):
+        if isinstance(group[0], _MAPPINGS):
+            keys = dict.fromkeys(k for layer in group for k in layer)
+            return {k: cls._materialize(cls._fold([layer[k] for layer in group if k in layer])) for k in keys}
+        if isinstance(group[0], list):
+            return deepcopy([item for layer in group for item in layer])
+        return deepcopy(group[0])
+
+    def _lookup(self, parts):
+        group = self.layers
+        for part in parts:
+            if not isinstance(group[0], _MAPPINGS):
+                raise KeyError(part)
+            group = self._fold([layer[part] for layer in group if part in layer])
+            if not group:
+                raise KeyError(part)
+        if len(group) == 1 and not isinstance(group[0], _MAPPINGS):
+            return group[0]
+        if isinstance(group[0], list):
+            return [item for layer in group for item in layer]
+        return LayeredConfig(group, dotlist_sep=self.dotlist_sep)
+
+    def _drop_index(self):
+        super()._drop_index()
+        # Children are views on the layers, which are replaced by the merged data once it is modified
+        object.__setattr__(self, '_children', {})
+
+    def _child(self, key, value):
+        if isinstance(value, LayeredConfig):
+            object.__setattr__(value, '_parent', self)
+            object.__setattr__(value, '_key', key)
+            self._children[key] = value
+            return value
+        return super()._child(key, value)
+
+    def __getitem__(self, item):
+        child = self._children.get(item)
+        if child is not None:
+            return child
+        try:
+            value = self._lookup(item.split(self.dotlist_sep))
+        except (KeyError, TypeError, AttributeError):
+            raise KeyError(item)
+        return self._child(item, value)
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name in _RESERVED_ATTRIBUTES:
+            raise AttributeError(name)
+        child = self._children.get(name)
+        if child is not None:
+            return child
+        try:
+            value = self._lookup([name])
+        except KeyError:
+            raise AttributeError(name)
+        return self._child(name, value)
+
+    def __add__(self, other):
+        return LayeredConfig(self.layers + [other], dotlist_sep=self.dotlist_sep)
+
+    def keys(self):
+        if self._leaves is None:
+            leaves = []
+            self._find_layered_keys(self.layers, '', leaves)
+            object.__setattr__(self, '_leaves', leaves)
+        return list(self._leaves)
+
+    def _find_layered_keys(self, group, key, keys):
+        if isinstance(group[0], _MAPPINGS):
+            for k in dict.fromkeys(k for layer in group for k in layer):
+                sub_key = key + self.dotlist_sep + k if key else k
+                self._find_layered_keys(self._fold([layer[k] for layer in group if k in layer]), sub_key, keys)
+        else:
+            keys.append(key)
+        return keys
+
+
+_RESERVED_ATTRIBUTES = frozenset(Config.__slots__ + DotListConfig.__slots__ + LayeredConfig.__slots__)
@@ -0,0 +1,211 @@
+import json
+import os
+import signal
+import socket
+import stat
+import struct
+import sys
+import tempfile
+import traceback
+
+from .utils import import_from_full_path
+
+__all__ = ['LauncherServer', 'default_socket_path', 'run_client', 'serve']
+
+_HEADER = struct.Struct('!I')
+_EXIT_CODE = struct.Struct('!i')
+# pid, uid and gid of the peer of a Unix socket
+_CREDENTIALS = struct.Struct('3i')
+STD_FDS = (0, 1, 2)
+
+
+def _private_directory(path):
+    """Create a directory only the user can access, or check that the existing one is"""
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    # lstat, so that a symbolic link planted by another user isn't followed
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(f'{path} must be a directory owned by uid {os.getuid()} and only accessible by it')
+    return path
+
+
+def default_socket_path():
+    """The path of the socket in a directory private to the user, which is created if needed"""
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(_private_directory(os.path.join(runtime_dir, f'multiplex-{os.getuid()}')), 'launcher.sock')
+
+
+def _peer_uid(sock):
+    """The uid of the process at the other end of a Unix socket, None if the platform can't tell"""
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return None
+    return _CREDENTIALS.unpack(sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, _CREDENTIALS.size))[1]
+
+
+def _check_peer(sock, socket_path):
+    """Make sure the peer of a connection runs as the same user, before anything is sent or received"""
+    uid = _peer_uid(sock)
+    if uid is None:
+        # Only the socket's owner can connect to it (see `LauncherServer.serve_forever`)
+        uid = os.stat(socket_path).st_uid
+    if uid != os.getuid():
+        raise ConnectionRefusedError(f'The peer of {socket_path} runs as uid {uid}, not {os.getuid()}')
+
+
+def _recv_exactly(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('Connection closed before the message was received')
+        data += chunk
+    return data
+
+
+def _get_exit_code(code):
+    """Convert a `SystemExit` code into a process exit code, the same way the interpreter does"""
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+def _terminate(signum, frame):
+    # Exit through SystemExit, so that the socket is removed
+    sys.exit(0)
+
+
+class LauncherServer:
+    """A long-lived process that runs a program's subprograms on behalf of thin clients.
+
+    On startup, every subprogram of the `Multiplexor` is imported, along with all of their
+    dependencies (i.e: torch). Each request is then handled by a child forked from this
+    warm process, so that it runs the entry point without paying for the interpreter
+    startup, imports or config loading.
+
+    Clients connect over a Unix socket and send their arguments, working directory and
+    environment along with their standard file descriptors, which the child uses as its
+    own. The output of the program is therefore written directly to the client's terminal,
+    and only the exit code is sent back over the socket.
+
+    The socket is only accessible by the user (by default, in a directory private to them,
+    see `default_socket_path`) and both ends check that the other runs as the same user
+    before sending or accepting anything.
+    """
+
+    def __init__(self, multiplexor, socket_path=None, preload=True, prog=None):
+        self.multiplexor = multiplexor
+        self.socket_path = default_socket_path() if socket_path is None else socket_path
+        self.prog = sys.argv[0] if prog is None else prog
+        if preload:
+            self.preload()
+
+    def preload(self):
+        """Import all the subprograms, so that forked children inherit them"""
+        for program_path in self.multiplexor.dispatch_trie.leaves().values():
+            import_from_full_path(os.path.abspath(program_path), registry=self.multiplexor.registry)
+
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Created with the right permissions, rather than changing them once other users could connect
+        previous_umask = os.umask(0o077)
+        try:
+            server.bind(self.socket_path)
+        finally:
+            os.umask(previous_umask)
+        server.listen()
+
+        # Children are reaped automatically
+        previous_sigchld = signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+        previous_sigterm = signal.signal(signal.SIGTERM, _terminate)
+        try:
+            while True:
+                connection, _ = server.accept()
+                with connection:
+                    try:
+                        self.handle(connection)
+                    except (ConnectionError, ValueError) as e:
+                        print(f'Invalid request: {e}', file=sys.stderr)
+        finally:
+            signal.signal(signal.SIGCHLD, previous_sigchld)
+            signal.signal(signal.SIGTERM, previous_sigterm)
+            server.close()
+            os.remove(self.socket_path)
+
+    def handle(self, connection):
+        _check_peer(connection, self.socket_path)
+        header, fds, _, _ = socket.recv_fds(connection, _HEADER.size, len(STD_FDS))
+        if len(header) < _HEADER.size:
+            header += _recv_exactly(connection, _HEADER.size - len(header))
+        try:
+            if len(fds) != len(STD_FDS):
+                raise ValueError('the client must send its stdin, stdout and stderr')
+            request = json.loads(_recv_exactly(connection, _HEADER.unpack(header)[0]))
+
+            sys.stdout.flush()
+            sys.stderr.flush()
+            if os.fork() == 0:
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                for fd, std_fd in zip(fds, STD_FDS):
+                    os.dup2(fd, std_fd)
+                code = self.run(request)
+                try:
+                    connection.sendall(_EXIT_CODE.pack(code))
+                finally:
+                    os._exit(0)
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+    def run(self, request):
+        """Run the program with the client's arguments, in the forked child. Returns the exit code."""
+        code = 0
+        try:
+            os.chdir(request['cwd'])
+            os.environ.clear()
+            os.environ.update(request['env'])
+            sys.argv = [self.prog] + request['argv']
+            self.multiplexor.execute()
+        except SystemExit as e:
+            code = _get_exit_code(e.code)
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        return code
+
+
+def serve(multiplexor, socket_path=None, preload=True, prog=None):
+    """Serve a program's subprograms, see `LauncherServer`"""
+    LauncherServer(multiplexor, socket_path=socket_path, preload=preload, prog=prog).serve_forever()
+
+
+def run_client(argv=None, socket_path=None):
+    """Run a program through a `LauncherServer`.
+
+    Args:
+        argv:        The program's arguments, defaults to `sys.argv[1:]`
+        socket_path: Path to the server's socket
+
+    Returns:
+        The program's exit code
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    socket_path = default_socket_path() if socket_path is None else socket_path
+    request = json.dumps({'argv': argv, 'cwd': os.getcwd(), 'env': dict(os.environ)}).encode()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        _check_peer(client, socket_path)
+        socket.send_fds(client, [_HEADER.pack(len(request))], list(STD_FDS))
+        client.sendall(request)
+        return _EXIT_CODE.unpack(_recv_exactly(client, _EXIT_CODE.size))[0]
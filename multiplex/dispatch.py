@@ -0,0 +1,120 @@
+import argparse
+
+__all__ = ['DispatchNode', 'DispatchTrie']
+
+
+class DispatchNode:
+    """A command of a `DispatchTrie`, either a leaf (a subprogram's path) or a group of commands"""
+    __slots__ = ('command', 'path', 'children')
+
+    def __init__(self, command, path=None, children=None):
+        self.command = command
+        self.path = path
+        self.children = children
+
+    @property
+    def is_leaf(self):
+        return self.children is None
+
+    def __repr__(self):
+        return f'{type(self).__name__}({" ".join(self.command)!r}, ' \
+               f'{self.path if self.is_leaf else list(self.children)!r})'
+
+
+class DispatchTrie:
+    """Tree of the commands of a program, compiled from its (nested) `subprograms` section.
+
+    A subprogram is either the path to its module, or a section of subprograms itself, i.e:
+
+        subprograms:
+          test: test.py
+          model:
+            train:
+              local: model/train.py
+              distributed: model/distributed.py
+
+    gives the commands `test`, `model train local` and `model train distributed`. Commands are
+    selected by walking the tokens of the command line (see `Multiplexor.parse_args`), so only
+    the parsers of the groups along the selected path are built and only its leaf is imported.
+
+    Args:
+        subprograms: The `subprograms` section, mapping names to paths or nested sections
+    """
+
+    def __init__(self, subprograms):
+        self.root = self._compile((), subprograms)
+
+    def _compile(self, command, value):
+        if isinstance(value, str):
+            return DispatchNode(command, path=value)
+        if not isinstance(value, dict) or not value:
+            raise ValueError(f'Invalid subprogram {" ".join(command)}: expected a path or a '
+                             f'section of subprograms, got {value!r}')
+        return DispatchNode(command, children={str(name): self._compile(command + (str(name),), child)
+                                               for name, child in value.items()})
+
+    def get(self, command):
+        """Get the node of a command (a sequence of names), raises KeyError if it doesn't exist"""
+        node = self.root
+        for name in command:
+            if node.is_leaf:
+                raise KeyError(' '.join(command))
+            node = node.children[name]
+        return node
+
+    def leaves(self):
+        """dict mapping each leaf command (as a tuple of names) to its subprogram's path"""
+        leaves, stack = {}, [self.root]
+        while stack:
+            node = stack.pop()
+            if node.is_leaf:
+                leaves[node.command] = node.path
+            else:
+                stack.extend(reversed(list(node.children.values())))
+        return leaves
+
+    def iter_commands(self):
+        """Every command, groups included, in depth first order"""
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.command:
+                yield node.command
+            if not node.is_leaf:
+                stack.extend(reversed(list(node.children.values())))
+
+    @staticmethod
+    def get_group_parser(node, prog):
+        """Parser of a group's single positional argument, the command selected within it"""
+        parser = argparse.ArgumentParser(prog=f'{prog} {" ".join(node.command)}',
+                                         usage=f'%(prog)s {{{",".join(node.children)}}} ...')
+        parser.add_argument('command', choices=list(node.children), help='the command to run')
+        return parser
+
+    def walk(self, name, args, prog, parsers=None):
+        """Walk the command line from a top level command down to a leaf.
+
+        The names of the nested commands must directly follow their group's, i.e:
+        `model train local --epochs 3`.
+
+        Args:
+            name:    The selected top level command
+            args:    The rest of the command line
+            prog:    Name of the program, used in the usage of the groups' parsers
+            parsers: Optional dict in which the groups' parsers are kept, to parse many command lines
+
+        Returns:
+            (tuple): tuple containing:
+                - the leaf's node
+                - the rest of the command line, after the leaf's name
+        """
+        parsers = {} if parsers is None else parsers
+        node = self.root.children[name]
+        while not node.is_leaf:
+            key = 'group ' + ' '.join(node.command)
+            if key not in parsers:
+                parsers[key] = self.get_group_parser(node, prog)
+            # Only the next token is parsed, so that `-h` after a leaf is the leaf's help
+            name = parsers[key].parse_args(args[:1]).command
+            node, args = node.children[name], args[1:]
+        return node, args
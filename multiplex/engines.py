@@ -1,10 +1,16 @@
 import argparse
 import builtins
+import os
+import re
+import sys
 
+from .coercion import TYPE_NAMES, get_converter
 from .config import DotListConfig
 
+__all__ = ['ENGINES', 'ArgparseEngine', 'FastEngine', 'FastParser', 'get_engine']
 
-# Note: Currently only argparse is supported, other CLI engines could be added here.
+# Note: Engines generate CLI parsers from the `argparse` section of a config. `FastEngine`
+# generates parsers with the same interface as argparse's, see `FastParser`.
 
 
 class ArgparseEngine:
@@ -14,7 +20,13 @@ class ArgparseEngine:
     It does this in a two step approach:
         1) Create the parser object based on metadata indicated by the `parser_key`
         2) Add arguments to this parser based on metadata under the `args_key`
+
+    Both steps consume the validated and normalized specs returned by `compile_specs`,
+    which are plain python objects and can therefore be cached (see `ParserCache`)
+    and handed back to the engine through the `specs` argument.
     """
+    parser_class = argparse.ArgumentParser
+
     allowed_keys = {
         "ArgumentParser": {'prog', 'usage', 'description', 'epilog', 'parents',
                            'formatter_class', 'prefix_chars', 'fromfile_prefix_chars',
@@ -32,14 +44,19 @@ class ArgparseEngine:
         "add_argument": set()
     }
 
-    def __init__(self, argparse_conf, parser_key='parser', args_key='arguments'):
+    def __init__(self, argparse_conf, parser_key='parser', args_key='arguments', specs=None):
         self.argparse_conf = argparse_conf
         self.parser_key, self.args_key = parser_key, args_key
         self.parser_conf = DotListConfig(self.argparse_conf.get(self.parser_key))
         self.args_conf = DotListConfig(self.argparse_conf.get(self.args_key))
+        self._specs = specs
 
     @staticmethod
     def get_type_from_str(type_name):
+        # Types of schemas (see `get_converter`), except for the builtins argparse handles fine.
+        # Notably, `bool` is a schema type since argparse would convert `false` to True.
+        if type_name not in ('int', 'float', 'str') and type_name.partition('[')[0] in TYPE_NAMES:
+            return get_converter(type_name)
         # TODO: Not safe, this can execute eval
         return getattr(builtins, type_name)
 
@@ -56,6 +73,53 @@ class ArgparseEngine:
         if disallowed_keys:
             raise NotImplementedError(f'Some argparse keyword arguments not implemented yet: {disallowed_keys}')
 
+    @property
+    def specs(self):
+        """The validated and normalized specs, compiled on first access."""
+        if self._specs is None:
+            self._specs = self.compile_specs()
+        return self._specs
+
+    def compile_specs(self, args_conf=None):
+        """Validate the argparse config and normalize it into plain specs.
+
+        The config itself is never modified, every spec is a fresh copy.
+
+        Args:
+            args_conf: List of argument definitions, defaults to the ones under `args_key`
+
+        Returns:
+            (dict): dictionary containing:
+                - parser: the ArgumentParser keyword arguments, or None if not specified
+                - arguments: list of dicts with the `names`, whether the argument
+                  `is_positional` and the remaining add_argument `kwargs`. The `type`
+                  is kept as a string and only resolved when the parser is built.
+        """
+        parser_spec = None
+        if self.parser_key in self.argparse_conf:
+            # Validate fields of argparse ArgumentParser
+            self.validate_fields(self.parser_conf, 'ArgumentParser')
+            parser_spec = dict(self.parser_conf.data)
+
+        arg_specs = []
+        if args_conf is None:
+            args_conf = self.args_conf.data
+        for arg_def in args_conf:
+            # Validate fields of argparse add_argument
+            self.validate_fields(arg_def, 'add_argument')
+            kwargs = dict(arg_def)
+
+            # Find names arguments, single if positional, multiple if optional
+            name_or_flags = kwargs.pop('name_or_flags')
+            if issubclass(type(name_or_flags), (tuple, list)):
+                names = list(name_or_flags)
+                is_positional = len(name_or_flags) == 1
+            else:
+                names = [name_or_flags]
+                is_positional = True
+            arg_specs.append({'names': names, 'is_positional': is_positional, 'kwargs': kwargs})
+        return {'parser': parser_spec, 'arguments': arg_specs}
+
     def get_parser(self, parents=None, add_help=True):
         parser = self.get_emtpy_parser(parents=parents, add_help=add_help)
         parser = self.add_argparse_arguments(parser, add_help=add_help)
@@ -64,18 +128,17 @@ class ArgparseEngine:
     def get_emtpy_parser(self, parents=None, add_help=True):
         """Perform step 1 from above, that is, create the emtpy parser object"""
         parents = [] if parents is None else parents
+        parser_spec = self.specs['parser']
 
-        if self.parser_key not in self.argparse_conf:
-            return argparse.ArgumentParser(parents=parents, add_help=add_help)
-
-        # Validate fields of argparse ArgumentParser
-        self.validate_fields(self.parser_conf, 'ArgumentParser')
+        if parser_spec is None:
+            return self.parser_class(parents=parents, add_help=add_help)
 
         # Force remove help
+        parser_spec = dict(parser_spec)
         if not add_help:
-            self.parser_conf.data.update({'add_help': False})
+            parser_spec.update({'add_help': False})
 
-        return argparse.ArgumentParser(**self.parser_conf.data, parents=parents)
+        return self.parser_class(**parser_spec, parents=parents)
 
     def add_argparse_arguments(self, parser, args_conf=None, add_help=True):
         """Performs step 2, add arguments to the created parser.
@@ -85,19 +148,12 @@ class ArgparseEngine:
 
         help_arg_defs = []
         if args_conf is None:
-            args_conf = self.args_conf.data
-        for arg_def in args_conf:
-            # Validate fields of argparse add_argument
-            self.validate_fields(arg_def, 'add_argument')
-
-            # Find names arguments, single if positional, multiple if optional
-            name_or_flags = arg_def.pop('name_or_flags')
-            if issubclass(type(name_or_flags), (tuple, list)):
-                names = list(name_or_flags)
-                is_positional = len(name_or_flags) == 1
-            else:
-                names = [name_or_flags]
-                is_positional = True
+            arg_specs = self.specs['arguments']
+        else:
+            arg_specs = self.compile_specs(args_conf)['arguments']
+        for arg_spec in arg_specs:
+            names, is_positional = arg_spec['names'], arg_spec['is_positional']
+            arg_def = dict(arg_spec['kwargs'])
 
             # Transform any other parameters like type
             if 'type' in arg_def:
@@ -111,3 +167,251 @@ class ArgparseEngine:
         if not add_help:
             return parser, help_arg_defs
         return parser
+
+
+_NEGATIVE_NUMBER = re.compile(r'^-\d+$|^-\d*\.\d+$')
+
+
+class _FastArgumentGroup:
+    """Argument group of a `FastParser`, its arguments are added to the parser's table"""
+
+    def __init__(self, parser, index):
+        self._parser, self._index = parser, index
+
+    def add_argument(self, *args, **kwargs):
+        return self._parser._add_argument(self._index, args, kwargs)
+
+
+class FastParser:
+    """A CLI parser for configs with thousands of options, with the same interface as
+    `argparse.ArgumentParser`.
+
+    Options are compiled into a table mapping each flag (i.e: `--a.b.c`) to its action,
+    so each token is parsed with a single lookup, whereas argparse scans all the options
+    for the ones a token could be an abbreviation of. Adding an option is also much
+    cheaper, as no help formatter is involved.
+
+    Only optional arguments storing a single value (or a constant, i.e: `store_true`)
+    are parsed this way. Every other call is recorded, and replayed on an actual
+    argparse parser whenever a feature isn't covered:
+        - help, usage and errors, i.e: `-h`, an unknown option or an invalid value
+        - positional arguments, `nargs`, other actions and mutually exclusive groups
+        - parents and most `ArgumentParser` keyword arguments
+        - any attribute of argparse's parsers not implemented here
+    The fallback parses the same arguments, so the results are always those of argparse.
+    """
+    supported_kwargs = {'prog', 'usage', 'description', 'epilog', 'add_help', 'allow_abbrev'}
+    supported_actions = {'store': None, 'store_true': True, 'store_false': False, 'store_const': None}
+
+    def __init__(self, parents=None, **kwargs):
+        kwargs['parents'] = [] if parents is None else parents
+        self._parser_kwargs = kwargs
+        self._calls = []
+        self._options = {}
+        self._actions = []
+        self._defaults = {}
+        self._argparse = self._namespace_defaults = None
+        self._required = set()
+        self._supported = not kwargs['parents'] and not set(kwargs) - self.supported_kwargs - {'parents'}
+        self._has_negative_number_options = False
+        if kwargs.get('add_help', True):
+            # Added by argparse itself, so it isn't recorded
+            self._options['-h'] = self._options['--help'] = {'action': 'help'}
+
+    @property
+    def prog(self):
+        if self._argparse is not None:
+            return self._argparse.prog
+        return self._parser_kwargs.get('prog') or os.path.basename(sys.argv[0])
+
+    @prog.setter
+    def prog(self, prog):
+        self._parser_kwargs['prog'] = prog
+        if self._argparse is not None:
+            self._argparse.prog = prog
+
+    @property
+    def add_help(self):
+        return self._parser_kwargs.get('add_help', True)
+
+    def add_argument(self, *args, **kwargs):
+        return self._add_argument(None, args, kwargs)
+
+    def add_argument_group(self, *args, **kwargs):
+        self._calls.append(('add_argument_group', args, kwargs))
+        self._argparse = None
+        return _FastArgumentGroup(self, len(self._calls) - 1)
+
+    def add_mutually_exclusive_group(self, *args, **kwargs):
+        self._supported = False
+        self._calls.append(('add_mutually_exclusive_group', args, kwargs))
+        self._argparse = None
+        return _FastArgumentGroup(self, len(self._calls) - 1)
+
+    def set_defaults(self, **kwargs):
+        self._calls.append(('set_defaults', (), kwargs))
+        self._argparse = self._namespace_defaults = None
+        self._defaults.update(kwargs)
+        for spec in self._actions:
+            if spec['dest'] in kwargs:
+                spec['default'] = kwargs[spec['dest']]
+
+    def _add_argument(self, group, args, kwargs):
+        self._calls.append(('add_argument', group, args, kwargs))
+        self._argparse = self._namespace_defaults = None
+        action = kwargs.get('action', 'store')
+        if not args or 'nargs' in kwargs or (action != 'help' and action not in self.supported_actions):
+            self._supported = False
+            return
+        dest = kwargs.get('dest')
+        for option in args:
+            if option[:1] != '-':
+                self._supported = False
+                return
+            if option in self._options:
+                raise argparse.ArgumentError(None, f'argument {"/".join(args)}: conflicting option string: {option}')
+            if option[1:2].isdigit() and _NEGATIVE_NUMBER.match(option):
+                self._has_negative_number_options = True
+            if dest is None and option[:2] == '--':
+                dest = option[2:].replace('-', '_')
+        if action == 'help':
+            spec = {'action': 'help'}
+        else:
+            if dest is None:
+                dest = args[0].lstrip('-').replace('-', '_')
+            spec = {'action': action, 'dest': dest, 'type': kwargs.get('type'), 'choices': kwargs.get('choices'),
+                    'required': kwargs.get('required', False)}
+            constant = self.supported_actions[action]
+            if constant is None:
+                spec['const'] = kwargs.get('const')
+                spec['default'] = kwargs.get('default')
+            else:
+                spec['const'] = constant
+                spec['default'] = kwargs.get('default', not constant)
+            spec['default'] = self._defaults.get(dest, spec['default'])
+            self._actions.append(spec)
+        for option in args:
+            self._options[option] = spec
+
+    def to_argparse(self):
+        """The equivalent argparse parser, built by replaying the recorded calls"""
+        if self._argparse is None:
+            parser = argparse.ArgumentParser(**self._parser_kwargs)
+            groups = {}
+            for index, call in enumerate(self._calls):
+                if call[0] == 'add_argument':
+                    _, group, args, kwargs = call
+                    (parser if group is None else groups[group]).add_argument(*args, **kwargs)
+                elif call[0] == 'set_defaults':
+                    parser.set_defaults(**call[2])
+                else:
+                    groups[index] = getattr(parser, call[0])(*call[1], **call[2])
+            self._argparse = parser
+        return self._argparse
+
+    def __getattr__(self, item):
+        # Anything else (i.e: print_help, error or _actions when used as a parent) is argparse's
+        if item.startswith('__') or '_calls' not in self.__dict__:
+            raise AttributeError(item)
+        return getattr(self.to_argparse(), item)
+
+    @staticmethod
+    def _convert(spec, value):
+        if spec['type'] is not None:
+            value = spec['type'](value)
+        if spec['choices'] is not None and value not in spec['choices']:
+            raise ValueError(f'invalid choice: {value!r}')
+        return value
+
+    def _get_namespace_defaults(self):
+        """The default value of every destination, computed once and then shared by all parses"""
+        if self._namespace_defaults is None:
+            defaults = {}
+            for spec in self._actions:
+                default = spec['default']
+                if isinstance(default, str) and spec['type'] is not None:
+                    # As argparse does, string defaults are converted like the values given on the command line
+                    default = spec['type'](default)
+                defaults.setdefault(spec['dest'], default)
+            for dest, default in self._defaults.items():
+                defaults.setdefault(dest, default)
+            self._required = {spec['dest'] for spec in self._actions if spec['required']}
+            self._namespace_defaults = defaults
+        return self._namespace_defaults
+
+    def _fast_parse(self, args, namespace):
+        """Parse the arguments without argparse, returns None if they require it"""
+        values = {}
+        i = 0
+        try:
+            defaults = self._get_namespace_defaults()
+            while i < len(args):
+                option, has_value, value = args[i].partition('=')
+                spec = self._options.get(option)
+                if spec is None or spec['action'] == 'help':
+                    return None
+                if spec['action'] == 'store':
+                    if not has_value:
+                        i += 1
+                        if i == len(args):
+                            return None
+                        value = args[i]
+                        if value[:1] == '-' and (self._has_negative_number_options
+                                                 or not _NEGATIVE_NUMBER.match(value)):
+                            return None
+                    values[spec['dest']] = self._convert(spec, value)
+                elif has_value:
+                    return None
+                else:
+                    values[spec['dest']] = spec['const']
+                i += 1
+        except (TypeError, ValueError, argparse.ArgumentTypeError):
+            return None
+        if not self._required <= values.keys():
+            return None
+
+        if namespace is None:
+            # Much faster than passing the defaults as keyword arguments, which are set one by one
+            namespace = argparse.Namespace()
+            namespace.__dict__.update(defaults)
+        else:
+            for dest, default in defaults.items():
+                if not hasattr(namespace, dest):
+                    setattr(namespace, dest, default)
+        for dest, value in values.items():
+            setattr(namespace, dest, value)
+        return namespace
+
+    def parse_known_args(self, args=None, namespace=None):
+        args = sys.argv[1:] if args is None else list(args)
+        if self._supported:
+            parsed = self._fast_parse(args, namespace)
+            if parsed is not None:
+                return parsed, []
+        return self.to_argparse().parse_known_args(args, namespace)
+
+    def parse_args(self, args=None, namespace=None):
+        args = sys.argv[1:] if args is None else list(args)
+        if self._supported:
+            parsed = self._fast_parse(args, namespace)
+            if parsed is not None:
+                return parsed
+        return self.to_argparse().parse_args(args, namespace)
+
+
+class FastEngine(ArgparseEngine):
+    """An `ArgparseEngine` generating `FastParser`s, for programs with a large number of options"""
+    parser_class = FastParser
+
+
+ENGINES = {'argparse': ArgparseEngine, 'fast': FastEngine}
+
+
+def get_engine(engine):
+    """Get an engine class from its name (see `ENGINES`), engine classes are returned as is"""
+    if isinstance(engine, str):
+        try:
+            return ENGINES[engine]
+        except KeyError:
+            raise ValueError(f'Unknown engine {engine}, use one of {list(ENGINES)}') from None
+    return engine
@@ -0,0 +1,114 @@
+import functools
+import os
+
+from .coercion import compile_converters
+from .config import DotListConfig, LayeredConfig
+from .interpolation import Interpolator
+from .loaders import load_config
+from .utils import without_keys
+
+__all__ = ['CONFIG_CACHE_SIZE', 'find_config_group', 'load_config_converters', 'load_config_file',
+           'load_config_interpolator', 'resolve_config_group']
+
+CONFIG_CACHE_SIZE = 512
+
+
+@functools.lru_cache(maxsize=CONFIG_CACHE_SIZE)
+def _load_config_file(path, mtime_ns):
+    return DotListConfig(load_config(path))
+
+
+def load_config_file(path):
+    """Load a config file, memoized on its path and modification time.
+
+    The returned config is shared between callers and must not be modified,
+    it can however be layered under other configs (see `LayeredConfig`). This is safe to call concurrently from multiple threads.
+    """
+    path = os.path.abspath(path)
+    return _load_config_file(path, os.stat(path).st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=CONFIG_CACHE_SIZE)
+def _load_config_converters(path, mtime_ns):
+    return compile_converters(_load_config_file(path, mtime_ns))
+
+
+def load_config_converters(path):
+    """Compile the converters of a config file's keys (see `compile_converters`),
+    memoized like `load_config_file`."""
+    path = os.path.abspath(path)
+    return _load_config_converters(path, os.stat(path).st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=CONFIG_CACHE_SIZE)
+def _load_config_interpolator(path, mtime_ns):
+    return Interpolator.from_config(_load_config_file(path, mtime_ns))
+
+
+def load_config_interpolator(path):
+    """Compile the interpolations of a config file (see `Interpolator`), memoized like
+    `load_config_file`, so that their defaults are only resolved once."""
+    path = os.path.abspath(path)
+    return _load_config_interpolator(path, os.stat(path).st_mtime_ns)
+
+
+def find_config_group(parts, root=None, ext='yaml'):
+    """Find the config file of an override's key, see `resolve_config_group`.
+
+    Args:
+        parts: The parts of the (dotted) key
+        root:  Directory the key is relative to, defaults to the current working directory
+        ext:   Extension of the config files
+
+    Returns:
+        The path of the config file, and the number of parts naming it. The remaining
+        parts are the key within the config file.
+    """
+    path = os.getcwd() if root is None else root
+    for depth, part in enumerate(parts, 1):
+        path = os.path.join(path, part)
+        file_name = path + os.path.extsep + ext
+        if os.path.isfile(file_name):
+            return file_name, depth
+        if not os.path.isdir(path):
+            break
+    raise ValueError(f'Invalid argument {part}')
+
+
+def resolve_config_group(key, value, root=None, ext='yaml'):
+    """Resolve a nested config override against a tree of config files.
+
+    The key is first looked up as a file (`<root>/<key>.yaml`), and if it isn't one, as a
+    directory in which the (single) key of `value` is looked up in turn. For instance,
+    with `loss={'mse': {'alpha': 5}}` this resolves `loss.yaml` if it exists, otherwise
+    `loss/mse.yaml` and so on, and merges the overriding value into the file's config.
+    Lists in the overriding value replace the file's lists. The file's interpolations are
+    resolved, only the ones downstream of the overriding value being recomputed.
+
+    The tree is walked by path, the working directory is never changed.
+
+    Args:
+        key:   Name of the config file or directory
+        value: The overriding value, nested under the names of the directories to walk
+        root:  Directory the key is relative to, defaults to the current working directory
+        ext:   Extension of the config files
+
+    Returns:
+        The resolved config, as a `LayeredConfig` of the file's config and the overriding value
+    """
+    parts, nested = [key], value
+    while isinstance(nested, dict) and nested:
+        key = next(iter(nested))
+        parts.append(key)
+        nested = nested[key]
+    file_name, depth = find_config_group(parts, root=root, ext=ext)
+    for part in parts[1:depth]:
+        value = value[part]
+    conf = load_config_file(file_name)
+    if isinstance(value, dict):
+        # Overriding lists replace the file's lists rather than being concatenated to them
+        lists = [k for k, v in DotListConfig(value).items() if isinstance(v.data, list)]
+        if lists:
+            conf = without_keys(conf.data, lists)
+    overrides = value if isinstance(value, dict) else {}
+    return load_config_interpolator(file_name).interpolate(LayeredConfig([conf, value]), overrides=overrides)
@@ -0,0 +1,301 @@
+import mmap
+import os
+import pickle
+import struct
+import weakref
+from collections.abc import Mapping
+
+__all__ = ['INDEXED_EXT', 'INDEXED_VERSION', 'OPENERS', 'LazyMapping', 'decode', 'load_indexed_file', 'map_file',
+           'materialize', 'read_header', 'write_indexed']
+
+INDEXED_EXT = 'mpxi'
+INDEXED_VERSION = 1
+_MAGIC = b'MPXI'
+# magic, version, token identifying the file's content, offset and length of the metadata
+_HEADER = struct.Struct('<4sI16sQQ')
+_COUNT = struct.Struct('<I')
+# offset and length of the key, offset and length of the value, kind of the value
+_ENTRY = struct.Struct('<QIQQB')
+_POSITION = struct.Struct('<I')
+MAPPING, VALUE = 0, 1
+_MISSING = object()
+
+
+def _is_indexable(value):
+    return isinstance(value, LazyMapping) or isinstance(value, dict) and all(isinstance(key, str) for key in value)
+
+
+def _write_value(f, value, path, templates):
+    if _is_indexable(value):
+        return (MAPPING,) + _write_mapping(f, value, path, templates)
+    if isinstance(value, str) and '${' in value:
+        # See `has_interpolation`
+        templates.append(path)
+    offset = f.tell()
+    f.write(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    return VALUE, offset, f.tell() - offset
+
+
+def _write_mapping(f, mapping, path, templates):
+    entries, keys = [], []
+    for key, value in mapping.items():
+        encoded = key.encode()
+        key_offset = f.tell()
+        f.write(encoded)
+        kind, offset, length = _write_value(f, value, path + (key,), templates)
+        entries.append(_ENTRY.pack(key_offset, len(encoded), offset, length, kind))
+        keys.append(encoded)
+    # The table follows its values, so that they are all written by the time it is
+    offset = f.tell()
+    f.write(_COUNT.pack(len(entries)))
+    f.write(b''.join(entries))
+    # Positions of the entries sorted by key, for lookups by binary search
+    f.write(b''.join(_POSITION.pack(i) for i in sorted(range(len(keys)), key=keys.__getitem__)))
+    return offset, f.tell() - offset
+
+
+def write_indexed(data, f, meta=None):
+    """Write config data in the indexed format read by `LazyMapping`.
+
+    Each mapping (with string keys) is written as a table of its keys, sorted for lookups,
+    pointing to its values. Mappings are nested tables while any other value, lists
+    included, is pickled on its own, so it is only decoded when it is looked up. The keys
+    of the values with interpolations are recorded in the metadata, so that they can be found
+    without decoding every value (see `LazyMapping.template_keys`).
+
+    Args:
+        data: The config's data
+        f:    A binary file open for writing, at its start
+        meta: Optional picklable dict stored with the data, i.e: the source of a compiled config
+    """
+    f.write(b'\0' * _HEADER.size)
+    templates = []
+    root = _write_value(f, data, (), templates)
+    meta_offset = f.tell()
+    f.write(pickle.dumps({**(meta or {}), 'root': root, 'templates': templates}, protocol=pickle.HIGHEST_PROTOCOL))
+    end = f.tell()
+    f.seek(0)
+    f.write(_HEADER.pack(_MAGIC, INDEXED_VERSION, os.urandom(16), meta_offset, end - meta_offset))
+    f.seek(end)
+
+
+def read_header(buffer, name='buffer'):
+    """Read the header of an indexed config, returns its token and metadata"""
+    if len(buffer) < _HEADER.size:
+        raise ValueError(f'{name} is not an indexed config')
+    magic, version, token, meta_offset, meta_length = _HEADER.unpack_from(buffer)
+    if magic != _MAGIC or version != INDEXED_VERSION:
+        raise ValueError(f'{name} is not an indexed config, or was written by another version of multiplex')
+    return token, pickle.loads(buffer[meta_offset:meta_offset + meta_length])
+
+
+# Maps in use by path and identity of the file. Only the configs reading a map keep it alive, so
+# it is unmapped once they are garbage collected (i.e: a released shared config, or a replaced file).
+_MAPS = weakref.WeakValueDictionary()
+
+
+def map_file(path):
+    """Memory-map a file read-only, the map is shared until the file is replaced or no longer used"""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = (path, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    buffer = _MAPS.get(key)
+    if buffer is None:
+        with open(path, 'rb') as f:
+            buffer = _MAPS[key] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return buffer
+
+
+def _open_file(path, token):
+    buffer = map_file(path)
+    if read_header(buffer, path)[0] != token:
+        raise ValueError(f'{path} changed since its config was opened')
+    return buffer
+
+
+# Openers of the buffers of `LazyMapping`s by kind of source, used to unpickle them
+OPENERS = {'file': _open_file}
+
+
+def _reopen(source, offset, exclude, templates):
+    kind, *args = source
+    return LazyMapping(OPENERS[kind](*args), offset, source=source, exclude=exclude, templates=templates)
+
+
+def decode(buffer, kind, offset, length, source=None):
+    """Decode a value of an indexed config, mappings are decoded as `LazyMapping`s"""
+    if kind == MAPPING:
+        return LazyMapping(buffer, offset, source=source)
+    return pickle.loads(buffer[offset:offset + length])
+
+
+class LazyMapping(Mapping):
+    """A read-only mapping over a table of an indexed config (see `write_indexed`).
+
+    Nothing is decoded upfront: keys are looked up by binary search in the table and
+    each value is only decoded when it is first accessed, then kept. Nested mappings are
+    `LazyMapping`s themselves, so the memory used is proportional to what is read rather
+    than to the size of the config. `DotListConfig` and `LayeredConfig` walk dotted keys
+    down `LazyMapping`s without building their index.
+
+    They are pickled as a reference to their source (i.e: the file's path) and reopened
+    when unpickled, as long as the source is unchanged.
+
+    Args:
+        buffer:  The indexed config's buffer, i.e: a memory-mapped file (see `load_indexed`)
+        offset:  Offset of the mapping's table in the buffer
+        source:  Optional tuple of the kind of source (a key of `OPENERS`) and its arguments,
+                 only needed to pickle the mapping
+        exclude:   Keys hidden from the mapping
+        templates: Optional key paths (tuples of parts) of the values with interpolations, see
+                   `template_keys`
+    """
+    __slots__ = ('_buffer', '_offset', '_count', '_source', '_exclude', '_values', '_templates')
+
+    def __init__(self, buffer, offset, source=None, exclude=frozenset(), templates=None):
+        self._buffer = buffer
+        self._offset = offset
+        self._count = _COUNT.unpack_from(buffer, offset)[0]
+        self._source = source
+        self._exclude = frozenset(exclude)
+        self._values = {}
+        self._templates = templates
+
+    def _entry(self, index):
+        return _ENTRY.unpack_from(self._buffer, self._offset + _COUNT.size + index * _ENTRY.size)
+
+    def _key(self, entry):
+        return self._buffer[entry[0]:entry[0] + entry[1]]
+
+    def _search(self, key):
+        """Binary search of a key's entry in the table, None if it isn't in it"""
+        if not isinstance(key, str):
+            return None
+        encoded = key.encode()
+        positions = self._offset + _COUNT.size + self._count * _ENTRY.size
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            entry = self._entry(_POSITION.unpack_from(self._buffer, positions + middle * _POSITION.size)[0])
+            current = self._key(entry)
+            if current == encoded:
+                return entry
+            if current < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def _find(self, key):
+        return None if key in self._exclude else self._search(key)
+
+    def __getitem__(self, key):
+        # Views (see `without`) share the decoded values, so the excluded keys are checked first
+        value = _MISSING if key in self._exclude else self._values.get(key, _MISSING)
+        if value is _MISSING:
+            entry = self._find(key)
+            if entry is None:
+                raise KeyError(key)
+            # setdefault, so that concurrent lookups all get the same value
+            value = self._values.setdefault(key, decode(self._buffer, entry[4], entry[2], entry[3], source=self._source))
+        return value
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def _iter_entries(self):
+        for index in range(self._count):
+            entry = self._entry(index)
+            key = self._key(entry).decode()
+            if key not in self._exclude:
+                yield key, entry
+
+    def __iter__(self):
+        return (key for key, _ in self._iter_entries())
+
+    def __len__(self):
+        return self._count - sum(1 for key in self._exclude if self._search(key) is not None)
+
+    def without(self, keys):
+        """A view of the mapping without some of its keys, sharing its decoded values"""
+        exclude = self._exclude | set(keys)
+        templates = self._templates
+        if templates is not None:
+            templates = [path for path in templates if path[0] not in exclude]
+        view = LazyMapping(self._buffer, self._offset, source=self._source, exclude=exclude, templates=templates)
+        view._values = self._values
+        return view
+
+    def lookup(self, parts):
+        """Get a nested value from the parts of its key, raises KeyError if it doesn't exist"""
+        value = self
+        for part in parts:
+            if not isinstance(value, (dict, LazyMapping)):
+                raise KeyError(part)
+            value = value[part]
+        return value
+
+    def leaf_keys(self, sep='.', prefix=''):
+        """The dotted keys of the leaves, only the nested tables are decoded and not the values"""
+        for key, entry in self._iter_entries():
+            sub_key = prefix + sep + key if prefix else key
+            if entry[4] == MAPPING:
+                yield from self[key].leaf_keys(sep, sub_key)
+            else:
+                yield sub_key
+
+    def template_keys(self, sep='.'):
+        """The dotted keys of the values with interpolations, as recorded when the config was
+        written (see `write_indexed`) so that no value is decoded, None if they weren't"""
+        if self._templates is None:
+            return None
+        return [sep.join(path) for path in self._templates]
+
+    def to_dict(self):
+        """Decode the whole mapping, as nested dicts"""
+        return {key: value.to_dict() if isinstance(value, LazyMapping) else value for key, value in self.items()}
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        # Read-only, so copies can be shared
+        return self
+
+    def __reduce__(self):
+        if self._source is None:
+            raise TypeError('Cannot pickle a LazyMapping without a source')
+        return _reopen, (self._source, self._offset, self._exclude, self._templates)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({list(self)!r})'
+
+
+def materialize(value):
+    """Decode a value of an indexed config entirely, `LazyMapping`s become dicts"""
+    return value.to_dict() if isinstance(value, LazyMapping) else value
+
+
+def load_indexed_file(path, token=None):
+    """Open an indexed config file, memory-mapped.
+
+    Args:
+        path:  Path of the file
+        token: Optional token of the file's content (see `write_indexed`), to make sure it
+               wasn't replaced since it was written
+
+    Returns:
+        (tuple): tuple containing:
+            - its metadata (see `write_indexed`), along with the `token` of its content
+            - its data, a `LazyMapping` unless the config isn't a mapping
+    """
+    path = os.path.abspath(path)
+    buffer = map_file(path)
+    file_token, meta = read_header(buffer, path)
+    if token is not None and file_token != token:
+        raise ValueError(f'{path} changed since its config was opened')
+    meta = {**meta, 'token': file_token}
+    data = decode(buffer, *meta['root'], source=('file', path, file_token))
+    if isinstance(data, LazyMapping):
+        data._templates = meta.get('templates')
+    return meta, data
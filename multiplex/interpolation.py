@@ -0,0 +1,387 @@
+import ast
+import functools
+import io
+import re
+import tokenize
+from collections import defaultdict
+
+from .config import DotListConfig, LayeredConfig
+from .indexed import LazyMapping
+from .utils import to_nested_dict
+
+__all__ = ['FUNCTIONS', 'Expression', 'InterpolationError', 'Interpolator', 'Template', 'compile_template',
+           'has_interpolation', 'interpolate']
+
+# `${...}` is an interpolation and `$${...}` escapes it, i.e: is the literal text `${...}`
+_INTERPOLATION = re.compile(r'\$(\$?)\{([^{}]*)\}')
+# Plain references may contain dashes, i.e: `${batch-size}`, subtractions need spaces: `${epochs - 1}`
+_REFERENCE = re.compile(r'^(?![\d-])[\w-]+(?:\.[\w-]+)*$')
+
+FUNCTIONS = {f.__name__: f for f in (abs, bool, float, int, len, max, min, round, str, sum)}
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp, ast.Constant, ast.Name,
+    ast.Load, ast.List, ast.Tuple, ast.Subscript, ast.Slice, ast.Call,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.USub, ast.UAdd, ast.Not,
+    ast.And, ast.Or, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.In, ast.NotIn, ast.Is, ast.IsNot,
+)
+
+
+class InterpolationError(ValueError):
+    """Raised when a config's interpolations can't be resolved, with every error at once"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('invalid interpolations:\n' + '\n'.join(f'  {key}: {error}' for key, error in errors.items()))
+
+    def __reduce__(self):
+        return type(self), (self.errors,)
+
+
+def has_interpolation(value):
+    return isinstance(value, str) and '${' in value
+
+
+def _replace_keys(source):
+    """Replace the dotted keys of an expression by placeholder names, since their parts may be
+    Python keywords, i.e: `fc1.in`. Returns the new source and the parts of each placeholder."""
+    tokens = list(tokenize.generate_tokens(io.StringIO(source).readline))
+    replaced, keys, i = [], {}, 0
+    while i < len(tokens):
+        j = i
+        while tokens[i].type == tokenize.NAME and j + 2 < len(tokens) and tokens[j + 1].string == '.' \
+                and tokens[j + 2].type == tokenize.NAME:
+            j += 2
+        if j > i and not (replaced and replaced[-1][1] == '.'):
+            placeholder = f'__key{len(keys)}__'
+            keys[placeholder] = [token.string for token in tokens[i:j + 1:2]]
+            replaced.append((tokenize.NAME, placeholder))
+            i = j + 1
+        else:
+            replaced.append((tokens[i].type, tokens[i].string))
+            i += 1
+    return tokenize.untokenize(replaced), keys
+
+
+class _References(ast.NodeTransformer):
+    """Replaces the names of an expression (see `_replace_keys`) by lookups of the keys they reference"""
+
+    def __init__(self, keys, dotlist_sep):
+        self.keys = keys
+        self.dotlist_sep = dotlist_sep
+        self.refs = set()
+
+    def generic_visit(self, node):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f'unsupported syntax: {type(node).__name__}')
+        return super().generic_visit(node)
+
+    def visit_Name(self, node):
+        key = self.dotlist_sep.join(self.keys.get(node.id, [node.id]))
+        self.refs.add(key)
+        return ast.copy_location(ast.Subscript(value=ast.Name(id='__refs__', ctx=ast.Load()),
+                                               slice=ast.Constant(value=key), ctx=ast.Load()), node)
+
+    def visit_Attribute(self, node):
+        raise ValueError('attributes can only be used in keys, i.e: `model.depth`')
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords:
+            raise ValueError(f'only calls to {", ".join(FUNCTIONS)} are supported, with positional arguments')
+        node.args = [self.visit(arg) for arg in node.args]
+        return node
+
+
+class Expression:
+    """The compiled expression of an interpolation, either a reference to a key or a Python
+    expression whose names are keys (see `Template`)"""
+    __slots__ = ('source', 'refs', 'code')
+
+    def __init__(self, source, dotlist_sep='.'):
+        self.source = source.strip()
+        if _REFERENCE.match(self.source.replace(dotlist_sep, '.')):
+            self.refs, self.code = (self.source,), None
+            return
+        try:
+            source, keys = _replace_keys(self.source)
+            tree = ast.parse(source.strip(), mode='eval')
+        except (SyntaxError, tokenize.TokenError) as e:
+            raise ValueError(f'invalid expression ${{{self.source}}}: {e.args[0]}') from None
+        references = _References(keys, dotlist_sep)
+        try:
+            tree = references.visit(tree)
+        except ValueError as e:
+            raise ValueError(f'invalid expression ${{{self.source}}}: {e}') from None
+        self.refs = tuple(sorted(references.refs))
+        self.code = compile(ast.fix_missing_locations(tree), f'${{{self.source}}}', 'eval')
+
+    def evaluate(self, lookup):
+        values = {ref: lookup(ref) for ref in self.refs}
+        if self.code is None:
+            return values[self.source]
+        return eval(self.code, {'__builtins__': {}, '__refs__': values, **FUNCTIONS})
+
+
+class Template:
+    """A string value with interpolations, i.e: `${root}/${run}` or `${conv2.out * 144}`.
+
+    A value made of a single interpolation evaluates to the interpolation's value (i.e: an
+    int), otherwise the interpolations are formatted in the string. Interpolations are
+    either references to (dotted) keys, or expressions of keys with arithmetic, comparison
+    and boolean operators, conditionals, indexing and calls to `FUNCTIONS`.
+    """
+    __slots__ = ('text', 'dotlist_sep', 'parts', 'refs')
+
+    def __init__(self, text, dotlist_sep='.'):
+        self.text = text
+        self.dotlist_sep = dotlist_sep
+        self.parts, position = [], 0
+        for match in _INTERPOLATION.finditer(text):
+            if match.start() > position:
+                self.parts.append(text[position:match.start()])
+            if match.group(1):
+                self.parts.append(match.group(0)[1:])
+            else:
+                self.parts.append(Expression(match.group(2), dotlist_sep))
+            position = match.end()
+        if position < len(text):
+            self.parts.append(text[position:])
+        self.refs = frozenset(ref for part in self.parts if isinstance(part, Expression) for ref in part.refs)
+
+    def evaluate(self, lookup):
+        if len(self.parts) == 1 and isinstance(self.parts[0], Expression):
+            return self.parts[0].evaluate(lookup)
+        return ''.join(str(part.evaluate(lookup)) if isinstance(part, Expression) else part for part in self.parts)
+
+    def __reduce__(self):
+        # Compiled code can't be pickled, the template is compiled again
+        return compile_template, (self.text, self.dotlist_sep)
+
+
+@functools.lru_cache(maxsize=4096)
+def compile_template(text, dotlist_sep='.'):
+    """Compile a string with interpolations, memoized since configs (and sweeps) repeat them"""
+    return Template(text, dotlist_sep)
+
+
+def _prefixes(key, sep):
+    parts = key.split(sep)
+    return [sep.join(parts[:i]) for i in range(1, len(parts))]
+
+
+class Interpolator:
+    """Resolves the interpolations of a config (see `Template`), following their dependencies.
+
+    The dependency graph of the templates is built, and checked for cycles, once. The
+    templates are then resolved in topological order, a reference to a subtree depending on
+    every template under it. Resolving the defaults is also done once: resolving a config that
+    overrides some keys (see `interpolate`) only recomputes the templates downstream of them.
+
+    Args:
+        templates:   dict mapping the dotted keys of the templates to their text
+        defaults:    Optional config the templates come from, whose resolution is reused
+        dotlist_sep: Separator used for nested keys
+
+    Raises:
+        InterpolationError: if templates are invalid or depend on each other in a cycle
+
+    The graph is pickled without the defaults (i.e: by the parser cache, which already holds
+    the config), set `defaults` again once unpickled.
+    """
+
+    def __init__(self, templates, defaults=None, dotlist_sep='.'):
+        self.dotlist_sep = dotlist_sep
+        self.defaults = defaults
+        self._base = None
+        self.templates, errors = {}, {}
+        for key, text in templates.items():
+            try:
+                self.templates[key] = compile_template(text, dotlist_sep)
+            except ValueError as e:
+                errors[key] = str(e)
+        if errors:
+            raise InterpolationError(errors)
+
+        # Templates at or under each key, and templates reading a reference at or under each key
+        self._under, self._readers_under, self._readers = defaultdict(set), defaultdict(set), defaultdict(set)
+        for key, template in self.templates.items():
+            for prefix in _prefixes(key, dotlist_sep) + [key]:
+                self._under[prefix].add(key)
+            for ref in template.refs:
+                self._readers[ref].add(key)
+                for prefix in _prefixes(ref, dotlist_sep) + [ref]:
+                    self._readers_under[prefix].add(key)
+        self.dependencies = {key: self._related(template.refs, self._under, self.templates)
+                             for key, template in self.templates.items()}
+        self.order = self._sort()
+
+    def __getstate__(self):
+        return {**self.__dict__, 'defaults': None, '_base': None}
+
+    @classmethod
+    def from_config(cls, conf, dotlist_sep=None):
+        """Find the templates of a config's values, whose resolution is reused (see `interpolate`)"""
+        conf = conf if isinstance(conf, DotListConfig) else DotListConfig(conf, dotlist_sep=dotlist_sep or '.')
+        keys = None
+        if not isinstance(conf, LayeredConfig) and isinstance(conf.data, LazyMapping):
+            # Only the values recorded as templates are decoded, rather than every value
+            keys = conf.data.template_keys(conf.dotlist_sep)
+        templates = {}
+        for key in conf.keys() if keys is None else keys:
+            value = conf[key].data
+            if has_interpolation(value):
+                templates[key] = value
+        return cls(templates, defaults=conf, dotlist_sep=dotlist_sep or conf.dotlist_sep)
+
+    def _related(self, keys, under, exact):
+        """Keys of `under`/`exact` at, under or above any of `keys`"""
+        related = set()
+        for key in keys:
+            related |= under.get(key, set())
+            related.update(prefix for prefix in _prefixes(key, self.dotlist_sep) if prefix in exact)
+        return related
+
+    def _sort(self):
+        order, state = [], {}
+        for start in self.templates:
+            if start in state:
+                continue
+            # Iterative depth first search, the path is kept to report cycles
+            path, stack = [start], [iter(sorted(self.dependencies[start]))]
+            state[start] = 'visiting'
+            while stack:
+                dependency = next(stack[-1], None)
+                if dependency is None:
+                    stack.pop()
+                    key = path.pop()
+                    state[key] = 'done'
+                    order.append(key)
+                elif state.get(dependency) == 'visiting':
+                    cycle = path[path.index(dependency):] + [dependency]
+                    raise InterpolationError({cycle[0]: 'cycle: ' + ' -> '.join(cycle)})
+                elif dependency not in state:
+                    state[dependency] = 'visiting'
+                    path.append(dependency)
+                    stack.append(iter(sorted(self.dependencies[dependency])))
+        return order
+
+    def _lookup(self, conf, values, ref):
+        """Get the value of a reference, from the resolved templates or else the config"""
+        sep = self.dotlist_sep
+        if ref in values:
+            return values[ref]
+        for prefix in _prefixes(ref, sep):
+            if prefix in values:
+                value = values[prefix]
+                for part in ref[len(prefix) + 1:].split(sep):
+                    value = value[part]
+                return value
+        value = conf[ref].data
+        resolved = {key[len(ref) + 1:]: values[key] for key in self._under.get(ref, ()) if key in values}
+        if resolved:
+            # A subtree with templates, with their resolved values
+            value = LayeredConfig([value, to_nested_dict(resolved, sep)], dotlist_sep=sep).data
+        return value
+
+    def _resolve(self, conf, keys, values):
+        """Resolve templates (in topological order) into `values`, returns the errors"""
+        errors = {}
+        for key in keys:
+            failed = [ref for ref in self.dependencies[key] if ref in errors]
+            if failed:
+                errors[key] = f'depends on {", ".join(sorted(failed))}, which failed'
+                continue
+            try:
+                values[key] = self.templates[key].evaluate(lambda ref: self._lookup(conf, values, ref))
+            except KeyError as e:
+                errors[key] = f'missing reference {e.args[0]!r} in {self.templates[key].text!r}'
+            except Exception as e:
+                errors[key] = f'{self.templates[key].text!r}: {type(e).__name__}: {e}'
+        return errors
+
+    @property
+    def base(self):
+        """The resolved templates of the defaults and the errors, resolved once"""
+        if self._base is None:
+            values = {}
+            errors = self._resolve(self.defaults, self.order, values) if self.defaults is not None else None
+            self._base = values, errors
+        return self._base
+
+    def resolve(self, conf, changed=None):
+        """Resolve the templates of a config.
+
+        Args:
+            conf:    The config, i.e: the defaults layered with overrides
+            changed: The (dotted) keys the config overrides in the defaults. If given, only the
+                     templates downstream of them (and the ones that failed with the defaults)
+                     are recomputed, the others keep their resolved default value.
+
+        Returns:
+            dict mapping the keys of the templates to their value, the overridden ones excluded
+
+        Raises:
+            InterpolationError: with all the templates that can't be resolved
+        """
+        conf = conf if isinstance(conf, DotListConfig) else DotListConfig(conf, dotlist_sep=self.dotlist_sep)
+        changed = set(changed) if changed is not None else None
+        overridden = self._related(changed, self._under, self.templates) if changed else set()
+        if changed is None or self.defaults is None:
+            keys = [key for key in self.order if key not in overridden]
+            values = {}
+        else:
+            base_values, base_errors = self.base
+            affected = self._related(changed, self._readers_under, self._readers) | set(base_errors)
+            # Everything downstream of the changed keys
+            stack = list(affected)
+            while stack:
+                for reader in self._related([stack.pop()], self._readers_under, self._readers):
+                    if reader not in affected:
+                        affected.add(reader)
+                        stack.append(reader)
+            keys = [key for key in self.order if key in affected and key not in overridden]
+            values = {key: value for key, value in base_values.items() if key not in affected and key not in overridden}
+        errors = self._resolve(conf, keys, values)
+        if errors:
+            raise InterpolationError(errors)
+        return values
+
+    def interpolate(self, conf, overrides=None):
+        """Resolve the templates of a config, as a layer over it.
+
+        Args:
+            conf:      The config, i.e: the defaults layered with overrides
+            overrides: Optional config (or nested dict) of the overrides layered over the defaults.
+                       Only the templates downstream of the keys whose values differ from the
+                       defaults' are recomputed. Overrides can themselves be templates.
+
+        Returns:
+            The config, layered with the resolved templates if there are any
+        """
+        sep = self.dotlist_sep
+        changed, templates = None, {}
+        if overrides is not None and self.defaults is not None:
+            overrides = overrides if isinstance(overrides, DotListConfig) else DotListConfig(overrides,
+                                                                                          dotlist_sep=sep)
+            changed = []
+            for key, value in overrides.items():
+                default = self.defaults.get(key)
+                if default is None or default.data != value.data or type(default.data) is not type(value.data):
+                    changed.append(key)
+                    if has_interpolation(value.data):
+                        templates[key] = value.data
+        if templates:
+            # Templates given as overrides change the graph, which is built again for them
+            overridden = self._related(changed, self._under, self.templates)
+            templates = {**{key: t.text for key, t in self.templates.items() if key not in overridden}, **templates}
+            return Interpolator(templates, dotlist_sep=sep).interpolate(conf)
+        if not self.templates:
+            return conf
+        values = self.resolve(conf, changed=changed)
+        if not values:
+            return conf
+        return LayeredConfig([conf, to_nested_dict(values, sep)], dotlist_sep=sep)
+
+
+def interpolate(conf, dotlist_sep=None):
+    """Resolve the interpolations of a config, see `Interpolator`"""
+    return Interpolator.from_config(conf, dotlist_sep=dotlist_sep).interpolate(conf)
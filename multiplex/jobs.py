@@ -0,0 +1,310 @@
+import contextlib
+import json
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+
+from .lazy import LazySubprogram
+from .sweep import _get_mp_context
+from .utils import Registry, get_entrypoint_from_module, import_from_full_path
+
+__all__ = ['DEFAULT_LEASE', 'DEFAULT_MAX_ATTEMPTS', 'Job', 'JobQueue', 'Worker', 'run_workers']
+
+PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+DEFAULT_LEASE = 60.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    program TEXT NOT NULL,
+    argv TEXT NOT NULL,
+    args BLOB NOT NULL,
+    cwd TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    worker TEXT,
+    lease_expires REAL,
+    submitted REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    result BLOB,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+
+
+class Job:
+    """A row of the queue, see `JobQueue`"""
+
+    def __init__(self, row):
+        for key in row.keys():
+            setattr(self, key, row[key])
+
+    @property
+    def duration(self):
+        return None if self.started is None or self.finished is None else self.finished - self.started
+
+    def get_result(self):
+        return None if self.result is None else pickle.loads(self.result)
+
+    def __repr__(self):
+        return f'Job({self.id}, {self.status}, {self.program!r}, {json.loads(self.argv)})'
+
+
+class JobQueue:
+    """A queue of subprogram runs in a SQLite file, drained by any number of worker processes.
+
+    Each job holds the subprogram's path and its arguments, resolved (and therefore validated)
+    when submitted, see `submit`. Workers (see `Worker`) claim jobs in a transaction, so each
+    job is only claimed once, and hold them for a lease they keep renewing while the job runs.
+    If a worker dies, its job is claimed again once the lease expires, up to `max_attempts` times.
+
+    The file can be shared between hosts over a network filesystem, as long as it supports
+    locking, since SQLite's default rollback journal is used rather than its write-ahead log.
+
+    Args:
+        path:    Path of the SQLite file, created if needed
+        lease:   Seconds a claimed job is held for without being renewed
+        timeout: Seconds to wait for the lock of the file when it is busy
+    """
+
+    def __init__(self, path, lease=DEFAULT_LEASE, timeout=30.0):
+        self.path = os.path.abspath(path)
+        self.lease = lease
+        self.timeout = timeout
+        self._local = threading.local()
+        self.connection.executescript(_SCHEMA)
+
+    @property
+    def connection(self):
+        """A connection per thread (and per process, connections aren't inherited across forks)"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        connection = self.connection
+        # Taking the write lock upfront, so that concurrent claims can't both read the same job
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def submit(self, multiplexor, argvs, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """Resolve command lines and enqueue them.
+
+        Every command line is resolved before any is enqueued (see `Multiplexor.parse_many`), so an
+        invalid one raises (a `ParserError`) without submitting the others.
+
+        Args:
+            multiplexor:  The program's `Multiplexor`
+            argvs:        List of argument lists, each selecting a subprogram (or not, to run the main program)
+            max_attempts: Number of times a job is claimed before it is failed, if its workers keep dying
+
+        Returns:
+            The ids of the jobs
+        """
+        argvs = [[str(arg) for arg in argv] for argv in argvs]
+        rows, now = [], time.time()
+        for argv, parsed in zip(argvs, multiplexor.parse_many(argvs)):
+            if isinstance(parsed, BaseException):
+                raise parsed
+            namespace, subprogram = parsed
+            rows.append((_get_program_path(multiplexor, subprogram), json.dumps(argv),
+                         pickle.dumps(namespace, protocol=pickle.HIGHEST_PROTOCOL),
+                         os.getcwd(), PENDING, max_attempts, now))
+        with self._transaction() as connection:
+            ids = []
+            for row in rows:
+                cursor = connection.execute('INSERT INTO jobs (program, argv, args, cwd, status, max_attempts, '
+                                            'submitted) VALUES (?, ?, ?, ?, ?, ?, ?)', row)
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def claim(self, worker):
+        """Claim the next pending job, or one whose lease expired.
+
+        Returns:
+            The job, or None if there is none to run
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            # Jobs whose workers died too many times are failed instead of being claimed again
+            connection.execute("UPDATE jobs SET status = ?, finished = ?, error = 'worker lost ' || attempts || "
+                               "' times' WHERE status = ? AND lease_expires < ? AND attempts >= max_attempts",
+                               (FAILED, now, RUNNING, now))
+            row = connection.execute('SELECT id FROM jobs WHERE status = ? OR (status = ? AND lease_expires < ?) '
+                                     'ORDER BY id LIMIT 1', (PENDING, RUNNING, now)).fetchone()
+            if row is None:
+                return None
+            connection.execute('UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, lease_expires = ?, '
+                               'started = ?, finished = NULL, error = NULL WHERE id = ?',
+                               (RUNNING, worker, now + self.lease, now, row['id']))
+            return Job(connection.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],)).fetchone())
+
+    def renew(self, job_id, worker):
+        """Extend the lease of a running job, returns False if the job isn't held by `worker` anymore"""
+        cursor = self.connection.execute('UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker = ? AND status = ?',
+                                         (time.time() + self.lease, job_id, worker, RUNNING))
+        return cursor.rowcount == 1
+
+    def finish(self, job_id, worker, result=None, error=None):
+        """Record the outcome of a job, ignored if the job isn't held by `worker` anymore"""
+        try:
+            result = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            result = pickle.dumps(repr(result))
+        cursor = self.connection.execute('UPDATE jobs SET status = ?, finished = ?, result = ?, error = ? '
+                                         'WHERE id = ? AND worker = ? AND status = ?',
+                                         (FAILED if error is not None else DONE, time.time(), result, error,
+                                          job_id, worker, RUNNING))
+        return cursor.rowcount == 1
+
+    def get(self, job_id):
+        row = self.connection.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return None if row is None else Job(row)
+
+    def jobs(self, status=None):
+        if status is None:
+            rows = self.connection.execute('SELECT * FROM jobs ORDER BY id')
+        else:
+            rows = self.connection.execute('SELECT * FROM jobs WHERE status = ? ORDER BY id', (status,))
+        return [Job(row) for row in rows]
+
+    def counts(self):
+        """Number of jobs per status"""
+        rows = self.connection.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status')
+        return {status: count for status, count in rows}
+
+
+def _get_program_path(multiplexor, subprogram):
+    """Path of the module whose entry point runs a job, the subprogram's or else the main program's"""
+    if isinstance(subprogram, LazySubprogram):
+        return subprogram.path
+    if subprogram is not None:
+        return os.path.abspath(subprogram.__file__)
+    if multiplexor.config_path is not None:
+        program_path = os.path.splitext(multiplexor.config_path)[0] + '.py'
+        if os.path.isfile(program_path):
+            return program_path
+    import __main__
+    if getattr(__main__, '__file__', None) is None:
+        raise ValueError('The main program can only be queued from a file')
+    return os.path.abspath(__main__.__file__)
+
+
+class Worker:
+    """Runs the jobs of a `JobQueue`, one at a time.
+
+    Subprograms are imported once per worker, in the worker's own `Registry`, and their
+    entry points are called with the arguments resolved at submission, in the directory
+    the job was submitted from (when it exists on this host).
+
+    Args:
+        queue:         The queue, or the path of its file
+        name:          Name of the worker recorded with its jobs, defaults to `<host>:<pid>`
+        poll_interval: Seconds to wait before claiming again when the queue is empty
+    """
+
+    def __init__(self, queue, name=None, poll_interval=1.0):
+        self.queue = queue if isinstance(queue, JobQueue) else JobQueue(queue)
+        self.name = f'{socket.gethostname()}:{os.getpid()}' if name is None else name
+        self.poll_interval = poll_interval
+        self.registry = Registry()
+
+    def run_job(self, job):
+        """Run a claimed job and record its outcome"""
+        stop_renewing = threading.Event()
+        renewer = threading.Thread(target=self._renew, args=(job.id, stop_renewing), daemon=True)
+        renewer.start()
+        cwd = os.getcwd()
+        result, error = None, None
+        try:
+            if job.cwd and os.path.isdir(job.cwd):
+                os.chdir(job.cwd)
+            module = import_from_full_path(job.program, registry=self.registry)
+            entry_point = get_entrypoint_from_module(module, registry=self.registry)
+            result = entry_point(pickle.loads(job.args))
+        except SystemExit as e:
+            if e.code not in (None, 0):
+                error = f'exited with {e.code}'
+        except Exception:
+            error = traceback.format_exc()
+        finally:
+            os.chdir(cwd)
+            stop_renewing.set()
+            renewer.join()
+        self.queue.finish(job.id, self.name, result=result, error=error)
+        return result, error
+
+    def _renew(self, job_id, stopped):
+        # A fresh connection, since sqlite3 connections can't be shared between threads
+        queue = JobQueue(self.queue.path, lease=self.queue.lease, timeout=self.queue.timeout)
+        while not stopped.wait(self.queue.lease / 3):
+            try:
+                queue.renew(job_id, self.name)
+            except sqlite3.Error:
+                pass
+
+    def run(self, drain=False, max_jobs=None):
+        """Claim and run jobs until `max_jobs` ran or, if `drain`, until the queue is empty.
+
+        Returns:
+            The number of jobs run
+        """
+        count = 0
+        while max_jobs is None or count < max_jobs:
+            job = self.queue.claim(self.name)
+            if job is None:
+                if drain:
+                    break
+                time.sleep(self.poll_interval)
+                continue
+            self.run_job(job)
+            count += 1
+        return count
+
+
+def _run_worker(path, lease, drain, poll_interval):
+    Worker(JobQueue(path, lease=lease), poll_interval=poll_interval).run(drain=drain)
+
+
+def run_workers(path, workers=None, lease=DEFAULT_LEASE, drain=False, poll_interval=1.0):
+    """Run worker processes on a queue until they are stopped or, if `drain`, until it is empty.
+
+    Args:
+        path:          Path of the queue's file
+        workers:       Number of worker processes, defaults to the number of CPUs
+        lease:         Seconds a claimed job is held for without being renewed, see `JobQueue`
+        drain:         Whether to stop once the queue is empty
+        poll_interval: Seconds to wait before claiming again when the queue is empty
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return _run_worker(path, lease, drain, poll_interval)
+    context = _get_mp_context()
+    processes = [context.Process(target=_run_worker, args=(path, lease, drain, poll_interval))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
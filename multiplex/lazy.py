@@ -0,0 +1,210 @@
+import ast
+import builtins
+import functools
+import os
+import sys
+from copy import copy
+
+from .loaders import find_config
+from .utils import get_parser_from_module, get_registry, import_from_full_path
+
+__all__ = ['DISCOVERY_CACHE_SIZE', 'ENTRYPOINT_DECORATOR', 'LIGHT_MODULES', 'PARSER_DECORATOR', 'LazySubprogram',
+           'discover_module', 'extract_parser_getter', 'find_registered_functions', 'find_sidecar_config']
+
+PARSER_DECORATOR = 'register_parser'
+ENTRYPOINT_DECORATOR = 'register_entrypoint'
+DISCOVERY_CACHE_SIZE = 256
+
+# Modules that are cheap enough to import when extracting a parser statically
+LIGHT_MODULES = set(getattr(sys, 'stdlib_module_names', {'argparse', 'os', 'sys'})) | {'multiplex'}
+
+
+def _decorator_name(node):
+    if isinstance(node, ast.Call):
+        node = node.func
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    if isinstance(node, ast.Name):
+        return node.id
+    return None
+
+
+def find_registered_functions(path):
+    """Statically find the functions registered with `@register_parser` and
+    `@register_entrypoint` in a module, without importing it.
+
+    Args:
+        path: Path to the module's source file
+
+    Returns:
+        (tuple): tuple containing:
+            - the module's ast
+            - dict mapping `parser` and `entrypoint` to their function nodes (or None)
+    """
+    with open(path, 'rb') as f:
+        tree = ast.parse(f.read(), filename=path)
+    registered = {'parser': None, 'entrypoint': None}
+    for node in tree.body:
+        if not isinstance(node, ast.FunctionDef):
+            continue
+        decorators = {_decorator_name(d) for d in node.decorator_list}
+        if PARSER_DECORATOR in decorators:
+            registered['parser'] = node
+        if ENTRYPOINT_DECORATOR in decorators:
+            registered['entrypoint'] = node
+    return tree, registered
+
+
+@functools.lru_cache(maxsize=DISCOVERY_CACHE_SIZE)
+def _discover_module(path, mtime_ns):
+    try:
+        return find_registered_functions(path)
+    except (OSError, SyntaxError, ValueError):
+        return None, None
+
+
+def discover_module(path):
+    """Same as `find_registered_functions`, the module being scanned once per modification.
+
+    Returns:
+        The module's ast and registered functions, both None if the module can't be read or parsed
+    """
+    path = os.path.abspath(path)
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return None, None
+    return _discover_module(path, mtime_ns)
+
+
+def _free_names(fn_node):
+    """Names a function reads that are neither its parameters, locals nor builtins.
+    Decorators are ignored since they are stripped when the function is extracted."""
+    loaded, bound = set(), set()
+    fn_node = copy(fn_node)
+    fn_node.decorator_list = []
+    for node in ast.walk(fn_node):
+        if isinstance(node, ast.Name):
+            (loaded if isinstance(node.ctx, ast.Load) else bound).add(node.id)
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and node is not fn_node:
+            bound.add(node.name)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            bound.update((alias.asname or alias.name).split('.')[0] for alias in node.names)
+    return loaded - bound - set(dir(builtins))
+
+
+def _light_imports(tree, names):
+    """Find the module level imports binding `names`, or None if any of them
+    is not bound by the import of a light module"""
+    imports, missing = [], set(names)
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules = {alias.name: (alias.asname or alias.name).split('.')[0] for alias in node.names}
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules = {node.module: alias.asname or alias.name for alias in node.names}
+        else:
+            continue
+        if not missing & set(modules.values()):
+            continue
+        if any(module.split('.')[0] not in LIGHT_MODULES for module in modules):
+            return None
+        imports.append(node)
+        missing -= set(modules.values())
+    return None if missing else imports
+
+
+def extract_parser_getter(path, module_name=None):
+    """Compile a module's registered parser getter on its own, without executing the module.
+
+    This only works if the getter is self-contained, that is, it only refers to its
+    arguments, builtins, and names imported from the standard library or multiplex.
+
+    Args:
+        path:        Path to the module's source file
+        module_name: Name given to the compiled function's module
+
+    Returns:
+        The parser getter, or None if it can't be extracted.
+    """
+    tree, registered = discover_module(path)
+    if registered is None:
+        return None
+    fn_node = registered['parser']
+    if fn_node is None:
+        return None
+    imports = _light_imports(tree, _free_names(fn_node))
+    if imports is None:
+        return None
+
+    fn_node = copy(fn_node)
+    fn_node.decorator_list = []
+    module = ast.fix_missing_locations(ast.Module(body=imports + [fn_node], type_ignores=[]))
+    if module_name is None:
+        module_name, _ = os.path.splitext(os.path.basename(path))
+    namespace = {'__name__': module_name, '__file__': path}
+    exec(compile(module, path, 'exec'), namespace)
+    return namespace[fn_node.name]
+
+
+def find_sidecar_config(path):
+    """Find the config file next to a module with the same name (i.e: train.yaml for train.py)"""
+    return find_config(path)
+
+
+class LazySubprogram:
+    """A subprogram whose module is only imported when actually needed.
+
+    Its parser is obtained, in order of preference, by:
+        1) Statically extracting the module's `@register_parser` function (see `extract_parser_getter`)
+        2) Generating it from a sidecar config next to the module (see `find_sidecar_config`), only
+           if the module registers no parser (see `discover_module`)
+        3) Importing the module, as is done for regular subprograms
+
+    Any other attribute access imports the module and is forwarded to it.
+
+    Args:
+        path:        Path to the module's source file
+        module_name: Name of the module, defaults to the file's name
+        registry:    Registry of the module's functions, defaults to the global one
+        options:     Keyword arguments of the `Multiplexor` generating a parser from the sidecar
+                     config, i.e: the parent program's cache, engine and `dotlist_sep`
+    """
+
+    def __init__(self, path, module_name=None, registry=None, options=None):
+        self.path = os.path.abspath(path)
+        if module_name is None:
+            module_name, _ = os.path.splitext(os.path.basename(self.path))
+        self.__name__ = module_name
+        self.registry = get_registry() if registry is None else registry
+        self.options = {} if options is None else options
+        self.module = None
+
+    def load(self):
+        """Import the subprogram's module (only once) and return it"""
+        if self.module is None:
+            self.module = import_from_full_path(self.path, module_name=self.__name__, registry=self.registry)
+        return self.module
+
+    def get_parser(self, *args, parents=None, **kwargs):
+        parents = [] if parents is None else parents
+        if self.module is None:
+            parser_getter = extract_parser_getter(self.path, module_name=self.__name__)
+            if parser_getter is not None:
+                return parser_getter(*args, parents=parents, **kwargs)
+
+            _, registered = discover_module(self.path)
+            sidecar_path = find_sidecar_config(self.path) if registered and registered['parser'] is None else None
+            if sidecar_path is not None:
+                from .parser import Multiplexor
+                return Multiplexor(sidecar_path, **self.options).get_parser(parents=parents)
+        return get_parser_from_module(self.load(), *args, parents=parents, registry=self.registry, **kwargs)
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name in ('path', 'module', 'registry', 'options'):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.path!r})'
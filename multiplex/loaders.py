@@ -0,0 +1,201 @@
+import functools
+import hashlib
+import json
+import os
+import pickle
+import warnings
+
+from .config import DotListConfig
+from .indexed import INDEXED_EXT, load_indexed_file, write_indexed
+from .profiling import profile_phase
+
+__all__ = ['COMPILED_EXT', 'COMPILED_VERSION', 'LOADERS', 'SEARCH_EXTENSIONS', 'compile_config', 'find_config',
+           'get_yaml_loader', 'load_compiled', 'load_config', 'load_indexed', 'load_json', 'load_yaml']
+
+COMPILED_EXT = 'mpx'
+COMPILED_VERSION = 1
+# Extensions looked up, in order, when a program is given by its path (i.e: `__file__`)
+SEARCH_EXTENSIONS = (COMPILED_EXT, INDEXED_EXT, 'yaml', 'json')
+
+
+@functools.lru_cache(maxsize=None)
+def get_yaml_loader():
+    """Get the yaml loader, libyaml's when available as it is an order of magnitude faster than the
+    pure python one. yaml is only imported once needed, compiled and cached configs don't need it."""
+    import yaml
+    return getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+def load_yaml(path):
+    import yaml
+    with open(path, 'rb') as f:
+        return yaml.load(f, Loader=get_yaml_loader())
+
+
+def load_json(path):
+    with open(path, 'rb') as f:
+        return json.load(f)
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+_MISSING = object()
+
+
+def _recompile_outdated(path, compiled):
+    """Compile a compiled config again if its source changed since it was compiled.
+
+    The source is considered changed if its size or modification time differ from the ones
+    recorded at compile time, and a compiled config whose source is gone is never outdated.
+    The outdated config is rewritten, so that the source is only loaded once rather than on
+    every start, or left as is with a warning if it can't be (i.e: a read-only directory).
+
+    Returns:
+        The source's data if the config is outdated, `_MISSING` otherwise
+    """
+    source = compiled['source']
+    try:
+        stat = os.stat(source)
+    except OSError:
+        return _MISSING
+    if (stat.st_size, stat.st_mtime_ns) == (compiled['source_size'], compiled['source_mtime_ns']):
+        return _MISSING
+    indexed = path.endswith(os.path.extsep + INDEXED_EXT)
+    try:
+        return _compile(source, path, indexed)
+    except OSError as e:
+        warnings.warn(f'{path} is out of date and could not be recompiled ({e}), loading {source} instead. '
+                      f'Recompile it with `python -m multiplex compile{" --indexed" if indexed else ""} {source}`')
+        return load_config(source)
+
+
+def load_compiled(path):
+    """Load a compiled config (see `compile_config`).
+
+    If its source file still exists and has changed since it was compiled, the source
+    is loaded instead and compiled again.
+    """
+    with open(path, 'rb') as f:
+        compiled = pickle.load(f)
+    if not isinstance(compiled, dict) or compiled.get('version') != COMPILED_VERSION:
+        raise ValueError(f'{path} is not a compiled config, or was compiled by another version of multiplex')
+    data = _recompile_outdated(path, compiled)
+    return compiled['data'] if data is _MISSING else data
+
+
+def load_indexed(path):
+    """Load an indexed config (see `compile_config`) as a `LazyMapping` over the memory-mapped
+    file, nothing but the top level table is read. Outdated configs are handled like in
+    `load_compiled`."""
+    meta, data = load_indexed_file(path)
+    if meta.get('version') != COMPILED_VERSION:
+        raise ValueError(f'{path} was compiled by another version of multiplex')
+    source_data = _recompile_outdated(path, meta)
+    return data if source_data is _MISSING else source_data
+
+
+LOADERS = {
+    'yaml': load_yaml,
+    'yml': load_yaml,
+    'json': load_json,
+    COMPILED_EXT: load_compiled,
+    INDEXED_EXT: load_indexed,
+}
+
+
+def load_config(path):
+    """Load the raw data of a config file, with the loader matching its extension.
+
+    Formats not handled here (i.e: toml) go through configurator's parsers.
+    """
+    loader = LOADERS.get(os.path.splitext(path)[1][1:])
+    if loader is None:
+        return DotListConfig.from_path(path).data
+    return loader(path)
+
+
+def find_config(path):
+    """Find the config file of a path.
+
+    A path with a config extension is returned as is if the file exists, so that yaml
+    text ending with one (i.e: `file: conf.yaml`) isn't taken for a path. Otherwise, the
+    path is that of a program (i.e: `__file__`) and its config is looked up next to it,
+    the first of `SEARCH_EXTENSIONS` found (a compiled config first). The directory is
+    listed once rather than probing each extension.
+
+    Returns:
+        The path to the config file, or None if there is none
+    """
+    if '\n' in path:
+        return None
+    base_path, ext = os.path.splitext(path)
+    if ext[1:] in LOADERS:
+        return path if os.path.isfile(path) else None
+    directory, base_name = os.path.split(base_path)
+    priorities = {base_name + os.path.extsep + ext: i for i, ext in enumerate(SEARCH_EXTENSIONS)}
+    found = None
+    try:
+        with os.scandir(directory or os.curdir) as entries:
+            for entry in entries:
+                priority = priorities.get(entry.name)
+                if priority is not None and (found is None or priority < found) and entry.is_file():
+                    found = priority
+    except OSError:
+        return None
+    return None if found is None else base_path + os.path.extsep + SEARCH_EXTENSIONS[found]
+
+
+def compile_config(path, output=None, indexed=False):
+    """Compile a config file into a binary format that is much faster to load.
+
+    The compiled config records the size and modification time of its source, so it is
+    only used while the source is unchanged, and compiled again once it changes (see
+    `load_compiled`).
+
+    Indexed configs are memory-mapped and only decoded as their keys are accessed (see
+    `LazyMapping`), for configs embedding large tables, i.e: vocabularies, of which
+    programs only read parts.
+
+    Args:
+        path:    Path to the config file
+        output:  Path of the compiled config, defaults to the same path with a `.mpx` extension,
+                 or `.mpxi` if indexed
+        indexed: Whether to compile to the indexed format rather than as a single pickle
+
+    Returns:
+        The path of the compiled config
+    """
+    path = os.path.abspath(path)
+    if output is None:
+        output = os.path.splitext(path)[0] + os.path.extsep + (INDEXED_EXT if indexed else COMPILED_EXT)
+    _compile(path, output, indexed)
+    return output
+
+
+def _compile(path, output, indexed):
+    """Compile a config file into `output` (see `compile_config`), returns the source's data"""
+    stat = os.stat(path)
+    with profile_phase(f'compile {os.path.basename(path)}'):
+        data = load_config(path)
+    compiled = {'version': COMPILED_VERSION, 'source': path,
+                'source_size': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns}
+
+    import tempfile
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if indexed:
+                write_indexed(data, f, meta=compiled)
+            else:
+                pickle.dump({**compiled, 'data': data}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, output)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return data
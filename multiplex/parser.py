@@ -1,55 +1,261 @@
 import argparse
-from copy import deepcopy
+import hashlib
+import math
+import os
+import sys
 
-from .config import DotListConfig
-from .engines import ArgparseEngine
+from .cache import ParserCache
+from .coercion import SCALAR_CONVERTERS, CoercionError, compile_converters
+from .config import DotListConfig, LayeredConfig
+from .dispatch import DispatchTrie
+from .engines import ArgparseEngine, FastParser, get_engine
+from .groups import find_config_group, load_config_converters, resolve_config_group
+from .indexed import INDEXED_EXT, LazyMapping, materialize
+from .interpolation import InterpolationError, Interpolator
+from .lazy import LazySubprogram
+from .loaders import SEARCH_EXTENSIONS, find_config, load_config
+from .profiling import configure_profiling, profile_phase
+from .structs import to_struct
+from .usage import find_help_request, get_help_request
 from .utils import *
 
+__all__ = ['Multiplexor', 'ParserError']
+
+# Multiplexor and parsers of the batch being resolved, set before the worker processes are forked
+_BATCH = None
+
+
+class ParserError(ValueError):
+    """Raised instead of printing the usage and exiting when an argv is invalid, see `Multiplexor.resolve_many`
+
+    Args:
+        prog:    Name of the program whose parser failed
+        message: The parser's error message
+    """
+
+    def __init__(self, prog, message):
+        super().__init__(f'{prog}: error: {message}')
+        self.prog, self.message = prog, message
+
+    def __reduce__(self):
+        return type(self), (self.prog, self.message)
+
+
+def _raise_errors(parser):
+    """Make a parser raise `ParserError` on invalid arguments instead of exiting"""
+    target = parser.to_argparse() if isinstance(parser, FastParser) else parser
+
+    def error(message):
+        raise ParserError(target.prog, message)
+
+    target.error = error
+    return parser
+
+
+class _BatchParsers(dict):
+    """Parsers built by `Multiplexor._parse_args` while resolving a batch, which raise on errors"""
+
+    def __setitem__(self, key, parsers):
+        for parser in parsers if isinstance(parsers, tuple) else (parsers,):
+            if isinstance(parser, (argparse.ArgumentParser, FastParser)):
+                _raise_errors(parser)
+        super().__setitem__(key, parsers)
+
+
+def _resolve_chunk(argvs):
+    multiplexor, parsers = _BATCH
+    return multiplexor._resolve_batch(argvs, parsers)
+
 
 class Multiplexor:
-    def __init__(self, config_or_path, argparse_key='argparse', subprogram_key='subprograms', dotlist_sep='.'):
+    def __init__(self, config_or_path, argparse_key='argparse', subprogram_key='subprograms', dotlist_sep='.',
+                 cache=None, lazy=False, engine='argparse', schema_key='schema'):
+        """
+        Args:
+            config_or_path: A path to a config file (yaml, json or compiled, see `compile_config`) or to the
+                            program it configures, a dictionary, a DotListConfig or a yaml string
+            argparse_key:   Key of the section describing the argparse parser
+            subprogram_key: Key of the section mapping subprogram names to their paths
+            dotlist_sep:    Separator used for nested keys
+            cache:          Opt-in on-disk cache of the parsed config and argparse specs, only used
+                            when loading from a file. Either True (use the default cache directory),
+                            a cache directory or a `ParserCache`. Defaults to the directory given by
+                            the `MULTIPLEX_CACHE_DIR` environment variable, if set.
+            lazy:           If true, subprograms are only imported when their entry point runs,
+                            see `LazySubprogram`.
+            engine:         The engine generating the program's parser, either `argparse` or `fast`
+                            for programs with thousands of options (see `FastParser`), or an engine class.
+            schema_key:     Key of the optional section mapping (dotted) keys to their type, for the
+                            ones that can't be inferred from their default value (see `get_converter`)
+        """
+        configure_profiling()
+        self.dotlist_sep = dotlist_sep
+        self.argparse_key, self.subprogram_key, self.schema_key = argparse_key, subprogram_key, schema_key
+        self.parser_cache = self._get_parser_cache(cache)
+        self.lazy = lazy
+        self.engine = get_engine(engine)
+        self.registry = Registry()
+        self._argparse_specs = None
+        self._converters = None
+        self._dispatch_trie = None
+        self._interpolator = None
+        self.config_path = None
+
         if issubclass(type(config_or_path), DotListConfig):
             self.full_config = config_or_path
         elif issubclass(type(config_or_path), dict):
             self.full_config = DotListConfig(config_or_path)
         elif issubclass(type(config_or_path), str):
-            for ext in ('yaml', 'json'):
-                base_path, _ = os.path.splitext(config_or_path)
-                augmented_path = base_path + os.path.extsep + ext
-                if os.path.isfile(augmented_path):
-                    self.full_config = DotListConfig.from_path(augmented_path)
-                    break
+            config_path = find_config(config_or_path)
+            if config_path is not None:
+                self.config_path = os.path.abspath(config_path)
+                with profile_phase(f'load {os.path.basename(config_path)}'):
+                    self.full_config = self._load_path(config_path)
+            elif os.path.isfile(config_or_path):
+                raise FileNotFoundError(f'No config found for {config_or_path}, expected one of '
+                                        f'{", ".join(SEARCH_EXTENSIONS)} next to it')
             else:
                 self.full_config = DotListConfig.from_text(config_or_path, 'yaml')
+                if not isinstance(self.full_config.data, dict):
+                    # Not yaml text, most likely the path of a missing file
+                    raise FileNotFoundError(f'No config found for {config_or_path!r}, it is neither an existing '
+                                            f'file nor a yaml mapping')
         else:
             raise ValueError("Config needs to be either: a path to a valid config,"
                              "a dictionary or DotListConfig object, or a string.")
 
-        self.dotlist_sep = dotlist_sep
-        self.argparse_key, self.subprogram_key = argparse_key, subprogram_key
-        self.default_conf, self.argparse_conf, self.subprogram_conf = self._split_conf()
+        self.default_conf, self.argparse_conf, self.subprogram_conf, self.schema_conf = self._split_conf()
+        self._load_interpolator()
+
+    def reload(self):
+        """Load the config file again, if the config was loaded from one"""
+        if self.config_path is None:
+            return
+        self._argparse_specs = self._converters = self._dispatch_trie = self._interpolator = None
+        with profile_phase(f'load {os.path.basename(self.config_path)}'):
+            self.full_config = self._load_path(self.config_path)
+        self.default_conf, self.argparse_conf, self.subprogram_conf, self.schema_conf = self._split_conf()
+        self._load_interpolator()
+
+    @staticmethod
+    def _get_parser_cache(cache):
+        if cache is None:
+            cache = os.environ.get('MULTIPLEX_CACHE_DIR') or False
+        if cache is False or isinstance(cache, ParserCache):
+            return cache or None
+        return ParserCache(None if cache is True else cache)
+
+    def _load_path(self, path):
+        """Load a config file, going through the parser cache if enabled.
 
-    def _split_conf(self):
+        On a warm start the file parsing, the validation of the argparse specs, the
+        compilation of the converters and of the interpolations' graph are all skipped. Indexed configs
+        aren't cached, they are already read lazily (see `LazyMapping`)."""
+        if self.parser_cache is None or path.endswith(os.path.extsep + INDEXED_EXT):
+            return DotListConfig(load_config(path))
+
+        key = self.parser_cache.key(path, self._cache_options())
+        entry = self.parser_cache.load(key)
+        if entry is not None:
+            self._argparse_specs, self._converters = entry['specs'], entry['converters']
+            self._interpolator = entry['interpolator']
+            return DotListConfig(entry['data'])
+
+        full_config = DotListConfig(load_config(path))
+        default_conf, argparse_conf, _, schema_conf = self._split_conf(full_config)
+        if argparse_conf.data:
+            self._argparse_specs = ArgparseEngine(argparse_conf).specs
+        self._converters = self._compile_converters(default_conf, schema_conf)
+        self._interpolator = self._compile_interpolator(default_conf)
+        self.parser_cache.store(key, {'data': full_config.data, 'specs': self._argparse_specs,
+                                      'converters': self._converters, 'interpolator': self._interpolator})
+        return full_config
+
+    def _cache_options(self):
+        """The constructor options that change how the config is split and compiled, part of the cache keys"""
+        engine = f'{self.engine.__module__}.{self.engine.__qualname__}'
+        return self.argparse_key, self.subprogram_key, self.schema_key, self.dotlist_sep, engine
+
+    def _subprogram_options(self):
+        """The options of the `Multiplexor` of a lazy subprogram's sidecar config, see `LazySubprogram`"""
+        return {'cache': self.parser_cache or False, 'engine': self.engine, 'dotlist_sep': self.dotlist_sep}
+
+    def _get_argparse_engine(self):
+        """Get the engine of this program's argparse config, its specs are only compiled once"""
+        argparse_engine = self.engine(self.argparse_conf, specs=self._argparse_specs)
+        self._argparse_specs = argparse_engine.specs
+        return argparse_engine
+
+    def _split_conf(self, full_config=None):
         """Split full config into it's parts:
             - the default config
             - the argparse config
             - the subprogram config
+            - the schema config
 
         Returns:
-            the three configs
+            the four configs
         """
-        data = deepcopy(self.full_config.data)
+        data = (self.full_config if full_config is None else full_config).data
         if isinstance(data, dict):
+            # Shallow copy, the configs are never modified in place
+            data = dict(data)
             argparse_conf = data.pop(self.argparse_key, [])
             subprogram_conf = data.pop(self.subprogram_key, [])
+            schema_conf = data.pop(self.schema_key, {})
+        elif isinstance(data, LazyMapping):
+            # Only the sections are decoded, the default config is a view of the rest
+            argparse_conf = materialize(data.get(self.argparse_key, []))
+            subprogram_conf = materialize(data.get(self.subprogram_key, []))
+            schema_conf = materialize(data.get(self.schema_key, {}))
+            data = data.without((self.argparse_key, self.subprogram_key, self.schema_key))
         else:
-            argparse_conf, subprogram_conf = None, None
+            argparse_conf, subprogram_conf, schema_conf = None, None, None
         default_conf = DotListConfig(data)
         argparse_conf = DotListConfig(argparse_conf)
         subprogram_conf = DotListConfig(subprogram_conf)
-        return default_conf, argparse_conf, subprogram_conf
+        schema_conf = DotListConfig(schema_conf)
+        return default_conf, argparse_conf, subprogram_conf, schema_conf
+
+    def _compile_converters(self, default_conf, schema_conf):
+        with profile_phase('compile converters'):
+            return compile_converters(default_conf, schema=schema_conf.data, dotlist_sep=self.dotlist_sep)
 
-    def parse_args(self):
+    @property
+    def dispatch_trie(self):
+        """The tree of the subprograms' commands, compiled once, see `DispatchTrie`"""
+        if self._dispatch_trie is None:
+            self._dispatch_trie = DispatchTrie(self.subprogram_conf.data)
+        return self._dispatch_trie
+
+    def _compile_interpolator(self, default_conf):
+        with profile_phase('compile interpolations'):
+            return Interpolator.from_config(default_conf, dotlist_sep=self.dotlist_sep)
+
+    def _load_interpolator(self):
+        """Build the dependency graph of the default config's interpolations when the config is loaded,
+        so that invalid ones (i.e: cycles) are reported before any parsing, or reuse the one loaded
+        from the parser cache (which isn't pickled with the config it was built from)"""
+        if self._interpolator is None:
+            self._interpolator = self._compile_interpolator(self.default_conf)
+        else:
+            self._interpolator.defaults = self.default_conf
+
+    @property
+    def interpolator(self):
+        """The interpolations of the default config and their dependency graph, see `Interpolator`"""
+        if self._interpolator is None:
+            self._load_interpolator()
+        return self._interpolator
+
+    @property
+    def converters(self):
+        """The converters of the default config's keys and of the schema's, compiled once"""
+        if self._converters is None:
+            self._converters = self._compile_converters(self.default_conf, self.schema_conf)
+        return self._converters
+
+    def parse_args(self, args=None):
         """Generate CLI parser based on config, and parse it's args.
 
         This method either simply creates and executes the main program's
@@ -57,135 +263,517 @@ class Multiplexor:
         subprogram as they are invoked. This sub-parser will inherit from
         the main parser (with the exception of the subprogram argument).
 
+        Args:
+            args: List of arguments to parse, defaults to `sys.argv[1:]`
+
         Returns:
             (tuple): tuple containing:
                 - the parsed arguments (as a namespace)
-                - the subprogram as a module, or None if main program
+                - the subprogram as a module (a `LazySubprogram` in lazy mode), or None if main program
         """
-        if self.subprogram_conf.data:
-            # TODO: Add default args, i.e: the ones not in 'argparse'
+        with profile_phase('parse_args'):
+            args, subprogram, _ = self._parse_args(args)
+        return args, subprogram
 
-            # Get shared args (everything except help)
-            shared_parser = argparse.ArgumentParser(add_help=False)
-            argparse_engine = ArgparseEngine(self.argparse_conf)
-            shared_parser, help_args = argparse_engine.add_argparse_arguments(add_help=False, parser=shared_parser)
+    async def parse_args_async(self, args=None):
+        """Same as `parse_args`, in a worker thread so that the event loop isn't blocked while
+        config files are read and subprograms imported. Concurrent calls, on the same or on
+        different instances, don't share any state other than the (immutable) cached config files."""
+        import asyncio
+        return await asyncio.to_thread(self.parse_args, args)
 
-            # Get exclusive args (only the subprogram arg)
-            exclusive_parser = argparse.ArgumentParser(add_help=False)
-            subprogram_group = exclusive_parser.add_argument_group(self.subprogram_key)
-            subprogram_group.add_argument('program', nargs='?', choices=self.subprogram_conf.data.keys())
+    def _parse_args(self, args=None, parsers=None):
+        """Does the actual work of `parse_args`, and also returns the subprogram's config
+        overrides (or None if main program). If `parsers` is given, the parsers are built once
+        and kept in it, to parse many argvs."""
+        reused, parsers = parsers is not None, {} if parsers is None else parsers
+        if self.subprogram_conf.data:
+            # TODO: Add default args, i.e: the ones not in 'argparse'
 
-            # Get main parser (without help)
-            main_parser = argparse_engine.get_emtpy_parser(add_help=False, parents=[exclusive_parser, shared_parser])
+            if 'main' in parsers:
+                shared_parser, main_parser = parsers['main']
+            else:
+                shared_parser, main_parser = parsers['main'] = self._build_dispatch_parsers()
 
             # Parse only known arguments, capturing unknown ones for downstream processing
-            args, unknown_args = main_parser.parse_known_args()
+            with profile_phase('parse_known_args'):
+                namespace, unknown_args = main_parser.parse_known_args(args)
 
             # If a subprogram is selected, import it (by full path), run it's parser and pass the
-            # main parser as a parent parser, then call it's entry point
-            if args.program:
-                program_path = self.subprogram_conf[args.program].data
-                program_path = os.path.abspath(program_path)
-                subprogram = import_from_full_path(program_path)
-                subparser = get_parser_from_module(subprogram, parents=[shared_parser])
-
-                # Fix name of subparser, remove program from args
-                subparser.prog = main_parser.prog + ' ' + args.program
-                args = argparse.Namespace(**{k: v for k, v in vars(args).items() if k != 'program'})
+            # main parser as a parent parser, then call it's entry point. In lazy mode, the import
+            # is deferred until the entry point is needed.
+            if namespace.program:
+                # Nested commands are walked down to the selected leaf
+                node, unknown_args = self.dispatch_trie.walk(namespace.program, unknown_args, main_parser.prog,
+                                                             parsers=parsers)
+                key = ' '.join(node.command)
+                self._print_help(unknown_args, lambda: self._build_subprogram_parser(node, shared_parser,
+                                                                                     main_parser.prog)[1],
+                                 prog=f'{main_parser.prog} {key}', sources=self._subprogram_sources(node))
+                if key not in parsers:
+                    parsers[key] = self._build_subprogram_parser(node, shared_parser, main_parser.prog)
+                subprogram, subparser = parsers[key]
+                namespace = argparse.Namespace(**{k: v for k, v in vars(namespace).items() if k != 'program'})
 
                 #args = subparser.parse_args(args=unknown_args, namespace=args)
-                args, subprogram_args = subparser.parse_known_args(args = unknown_args, namespace = args)
+                with profile_phase('parse subprogram args'):
+                    namespace, subprogram_args = subparser.parse_known_args(args=unknown_args, namespace=namespace)
                 subprogram_args = self.get_subprogram_args(subprogram_args)
-                subprogram_args = to_nested_dict(subprogram_args)
-                subprogram_args = self.nested_conf(subprogram_args)
-                args.__setattr__('conf', subprogram_args)
-                return args, subprogram
+                with profile_phase('coerce overrides'):
+                    try:
+                        subprogram_args = self.coerce_overrides(subprogram_args)
+                    except CoercionError as e:
+                        subparser.error(str(e))
+                try:
+                    namespace.conf = self._get_subprogram_conf(subprogram_args)
+                except InterpolationError as e:
+                    subparser.error(str(e))
+                return namespace, subprogram, subprogram_args
 
             # Otherwise, add help and re-parse all arguments of main program in order to generate
             # all the correct errors if unknown arguments are present.
             else:
-                main_parser.add_argument("-h", "--help", action="help", help="show this help message and exit")
-                return main_parser.parse_args(), None
+                if 'help' not in parsers:
+                    # The main parser is kept as is if reused, since with help it would catch the subprograms' help
+                    help_parser = self._build_dispatch_parsers()[1] if reused else main_parser
+                    help_parser.add_argument("-h", "--help", action="help", help="show this help message and exit")
+                    parsers['help'] = help_parser
+                with profile_phase('parse main args'):
+                    return parsers['help'].parse_args(args), None, None
         else:
             # No subprograms, proceed normally
-            parser = self._get_main_parser()
-            return parser.parse_args(), None
+            self._print_help(args, self._get_main_parser)
+            if 'main' not in parsers:
+                with profile_phase('build parser'):
+                    parsers['main'] = self._get_main_parser()
+            with profile_phase('parse main args'):
+                return parsers['main'].parse_args(args), None, None
+
+    def _build_dispatch_parsers(self):
+        """Build the parsers of a program with subprograms, the shared parser (the argparse config's
+        arguments, without help) and the main parser (the subprogram argument and the shared ones)"""
+        with profile_phase('build parser'):
+            # Get shared args (everything except help)
+            shared_parser = argparse.ArgumentParser(add_help=False)
+            argparse_engine = self._get_argparse_engine()
+            shared_parser, help_args = argparse_engine.add_argparse_arguments(add_help=False,
+                                                                              parser=shared_parser)
+
+            # Get exclusive args (only the subprogram arg)
+            exclusive_parser = argparse.ArgumentParser(add_help=False)
+            subprogram_group = exclusive_parser.add_argument_group(self.subprogram_key)
+            subprogram_group.add_argument('program', nargs='?', choices=self.dispatch_trie.root.children.keys())
+
+            # Get main parser (without help)
+            main_parser = argparse_engine.get_emtpy_parser(add_help=False,
+                                                           parents=[exclusive_parser, shared_parser])
+        return shared_parser, main_parser
+
+    def _build_subprogram_parser(self, node, shared_parser, prog):
+        """Import a subprogram (by full path, or lazily in lazy mode) and build its parser,
+        with the shared parser as parent"""
+        program_path = os.path.abspath(node.path)
+        if self.lazy:
+            subprogram = LazySubprogram(program_path, registry=self.registry, options=self._subprogram_options())
+            with profile_phase('build subprogram parser'):
+                subparser = subprogram.get_parser(parents=[shared_parser])
+        else:
+            subprogram = import_from_full_path(program_path, registry=self.registry)
+            with profile_phase('build subprogram parser'):
+                subparser = get_parser_from_module(subprogram, parents=[shared_parser], registry=self.registry)
+
+        # Fix name of subparser
+        subparser.prog = prog + ' ' + ' '.join(node.command)
+        return subprogram, subparser
+
+    def _get_subprogram_conf(self, subprogram_args):
+        with profile_phase('nested config'):
+            subprogram_args = to_nested_dict(subprogram_args)
+            return self.nested_conf(subprogram_args)
 
     def execute(self):
         # TODO: this is currently passing the args as a Namespace. We need to
         #  merge this with default params and pass the args as a config object.
-        args, subprogram= self.parse_args()
-        entry_point = get_entrypoint_from_module(subprogram)
-        entry_point(args)
+        with profile_phase('execute'):
+            args, subprogram= self.parse_args()
+            if isinstance(subprogram, LazySubprogram):
+                subprogram = subprogram.load()
+            entry_point = get_entrypoint_from_module(subprogram, registry=self.registry)
+            with profile_phase('entrypoint'):
+                entry_point(args)
+
+    def serve(self, socket_path=None, preload=True):
+        """Serve this program's subprograms from a long-lived, pre-imported process,
+        see `LauncherServer`. Programs are then run with `python -m multiplex client`."""
+        from .daemon import serve
+        serve(self, socket_path=socket_path, preload=preload)
+
+    def sweep(self, args=None, workers=None, cpus=None, output_dir=None, sweep_sep=','):
+        """Execute the selected subprogram (or the main program) over a sweep of options.
+
+        Options given as `--key=value` can be given a list of values, i.e: `--lr=0.1,0.01 --epochs=5,10`,
+        config overrides and declared options alike, and the entry point is run once per element of
+        their cartesian product, on a pool of worker processes. See `expand_sweep_args` and `run_sweep`
+        for more details. A value containing the separator is passed in brackets (i.e: the list
+        `--layers=[64,32],[128,64]`) or with the separator escaped by a backslash (i.e: `--name=a\\,b`).
+
+        Args:
+            args:       List of arguments to parse, defaults to `sys.argv[1:]`
+            workers:    Number of worker processes, defaults to the number of CPUs
+            cpus:       CPUs the workers are pinned to, split evenly between workers
+            output_dir: If given, each run gets its own output directory under it
+            sweep_sep:  Separator between the swept values of an override
+
+        Returns:
+            List of (options, result) tuples, in the order of the sweep, where options maps the key of
+            each `--key=value` option to its value in the run, the overrides converted to their type
+        """
+        from .sweep import expand_sweep_args, run_sweep
+        args = sys.argv[1:] if args is None else args
+        parsers, points, runs, subprogram = {}, [], [], None
+        # Each run is parsed on its own, the parsers being built once
+        for point, run_args in expand_sweep_args(args, sweep_sep=sweep_sep):
+            namespace, subprogram, overrides = self._parse_args(run_args, parsers=parsers)
+            points.append({**point, **(overrides or {})})
+            runs.append(namespace)
+
+        results = run_sweep(subprogram, runs, points=points, workers=workers,
+                            cpus=cpus, output_dir=output_dir, registry=self.registry)
+        return list(zip(points, results))
+
+    def watch(self, args=None, interval=1.0, use_inotify=True, start=True):
+        """Watch the program's config files and keep its config up to date, see `ConfigWatcher`.
+
+        The config file is watched, as well as the nested config files and directories of
+        the overrides. Only the files that changed are parsed again. The command line is
+        parsed once, and its values are applied on top of each new config.
+
+        Args:
+            args:        List of arguments to parse, defaults to `sys.argv[1:]`
+            interval:    Polling interval in seconds, when inotify isn't available
+            use_inotify: Set to False to always poll
+            start:       Whether to start watching in a background thread
+
+        Returns:
+            The watcher, its `config` being the one returned by `get_conf`, or the
+            subprogram's `conf` if a subprogram is selected.
+        """
+        from .watch import ConfigWatcher
+        namespace, _, overrides = self._parse_args(args)
+        paths, directories = [] if self.config_path is None else [self.config_path], []
+        for key in overrides or {}:
+            parts = key.split(self.dotlist_sep)
+            file_name, depth = find_config_group(parts)
+            paths.append(file_name)
+            if depth > 1:
+                directories.append(os.path.abspath(parts[0]))
+
+        def load(changed):
+            if self.config_path in changed:
+                self.reload()
+            if overrides is None:
+                return self.get_conf(args=args)
+            return self._get_subprogram_conf(overrides)
+
+        watcher = ConfigWatcher(load, paths=paths, directories=directories, interval=interval,
+                                use_inotify=use_inotify, dotlist_sep=self.dotlist_sep)
+        return watcher.start() if start else watcher
 
     def get_parser(self, parents=None):
         """This method is intended to get the parser of the final subprogram,
         it raises an error if the config has a `subprogram` config"""
         if self.subprogram_conf.data:
             raise RuntimeError("Can only get parser of leaf program")
-        return self._get_main_parser(self, parents=parents)
+        return self._get_main_parser(parents=parents)
 
     def _get_main_parser(self, parser=None, parents=None):
         if self.argparse_conf.data:
-            argparse_engine = ArgparseEngine(self.argparse_conf)
+            argparse_engine = self._get_argparse_engine()
             parser = argparse_engine.get_parser(parents=parents)
         if parser is None:
             parents = [] if parents is None else parents
-            parser = argparse.ArgumentParser(parents=parents)
+            parser = self.engine.parser_class(parents=parents)
         parser = self.add_default_arguments(parser)
         return parser
 
-    def get_subprogram_args(self,subprogram_args):
+    def get_subprogram_args(self, subprogram_args, sweep_sep=None):
+        """Collect the `--key=value` overrides, as strings (see `coerce_overrides`)"""
         subprogram_args_dict = {}
         for arg in subprogram_args:
-            params = arg.split("=")
-            if(params[0].startswith("--")):
-                subprogram_args_dict.setdefault(params[0][2:], float(params[1]))
+            key, _, value = arg.partition("=")
+            if key.startswith("--"):
+                if sweep_sep is not None:
+                    value = split_sweep_values(value, sweep_sep)
+                subprogram_args_dict.setdefault(key[2:], value)
         return subprogram_args_dict
 
+    def coerce_overrides(self, overrides):
+        """Convert the overrides to the type of the keys they override, in a single pass.
+
+        The type of each key is given by the schema if it's in it, otherwise it is
+        inferred from its default value in the nested config file it overrides, and if
+        that isn't possible either, the value is parsed as a yaml scalar. The converters
+        of each config file are only compiled once.
+
+        Args:
+            overrides: dict mapping dotted keys to a value, or a list of swept values
+
+        Returns:
+            The converted overrides
+
+        Raises:
+            CoercionError: with all the overrides that are invalid
+        """
+        coerced, errors = {}, {}
+        for key, value in overrides.items():
+            converter = self.converters.get(key)
+            if converter is None:
+                parts = key.split(self.dotlist_sep)
+                try:
+                    file_name, depth = find_config_group(parts)
+                except ValueError as e:
+                    errors[key] = str(e)
+                    continue
+                converter = load_config_converters(file_name).get(self.dotlist_sep.join(parts[depth:]))
+            converter = converter or SCALAR_CONVERTERS['literal']
+            try:
+                coerced[key] = [converter(v) for v in value] if isinstance(value, list) else converter(value)
+            except ValueError as e:
+                errors[key] = str(e)
+        if errors:
+            raise CoercionError(errors)
+        return coerced
+
     def nested_conf(self, subprogram_args_dict):
-        nested_conf = {}
-        nested_conf = DotListConfig(nested_conf)
-        for key, value in subprogram_args_dict.items():
-            nested_conf = nested_conf + self.get_nested_config(key, value)
-        return nested_conf
-
-
-    def get_nested_config(self, key, value):
-        file_dir_name = os.path.abspath(key)
-        file_name = file_dir_name + '.yaml'
-        if(os.path.isfile(file_name)):  #Returns true if file
-            m1 = Multiplexor(file_name)
-            final_conf = m1.full_config + DotListConfig(value)
-            return DotListConfig(final_conf)
-        elif(os.path.isdir(file_dir_name)):
-            curr_dir = os.getcwd()
-            os.chdir(file_dir_name)
-            final_conf = self.get_nested_config(list(value.keys())[0], value[list(value.keys())[0]])
-            os.chdir(curr_dir)
-            return DotListConfig(final_conf)
-        else:
-            raise Exception('Invalid argument %s', key)
+        nested_confs = [self.get_nested_config(key, value) for key, value in subprogram_args_dict.items()]
+        return LayeredConfig([{}] + nested_confs)
+
 
+    def get_nested_config(self, key, value, root=None):
+        """Resolve a nested config override, see `resolve_config_group`"""
+        return resolve_config_group(key, value, root=root)
 
     def get_cli_conf(self, parser=None, args=None, namespace=None):
+        return self._get_cli_conf(parser, args, namespace)[1]
+
+    def _get_cli_conf(self, parser, args, namespace):
+        """Parse the command line, returns the parser used and the parsed config"""
+        if parser is None:
+            self._print_help(args, self._get_main_parser)
         parser = self._get_main_parser(parser)
         cli_conf = vars(parser.parse_args(args, namespace))
         cli_conf = to_nested_dict(cli_conf)
-        return DotListConfig(cli_conf)
+        return parser, DotListConfig(cli_conf)
+
+    def get_conf(self, parser=None, args=None, namespace=None, struct=False):
+        """Parse the command line and resolve the program's config.
 
-    def get_conf(self, *args, **kwargs):
-        return (self.default_conf + self.get_cli_conf(*args, **kwargs))
+        Args:
+            parser, args, namespace: The parser, arguments and namespace, see `get_cli_conf`
+            struct: If true, the config is returned as a frozen, slotted object (see `to_struct`),
+                    whose values are read as plain attributes, i.e: in hot loops
+
+        Returns:
+            The config, a `LayeredConfig` of the defaults and the command line, or a `Struct`
+        """
+        parser, cli_conf = self._get_cli_conf(parser, args, namespace)
+        conf = self._interpolate(LayeredConfig([self._get_default_layer(), cli_conf]), cli_conf, parser)
+        return to_struct(conf) if struct else conf
+
+    def _interpolate(self, conf, cli_conf, parser):
+        """Resolve the interpolations of a config, recomputing only the ones downstream of the
+        arguments that differ from the defaults. Invalid ones (i.e: an override introducing a cycle)
+        are errors of the parser, like invalid arguments."""
+        with profile_phase('interpolate'):
+            try:
+                return self.interpolator.interpolate(conf, overrides=cli_conf)
+            except InterpolationError as e:
+                parser.error(str(e))
+
+    def _get_default_layer(self):
+        # Lists from the command line replace the default ones rather than being concatenated to them
+        lists = [key for key, value in self.default_conf.items() if isinstance(value.data, list)]
+        return without_keys(self.default_conf.data, lists, self.dotlist_sep) if lists else self.default_conf
+
+    def resolve_many(self, argvs, workers=None, chunk_size=None):
+        """Resolve many command lines, building the parsers only once.
+
+        Errors don't stop the batch: invalid argvs make the parsers raise a `ParserError`
+        (rather than exit), which is returned in place of their result like any other error.
+
+        Args:
+            argvs:      List of argument lists
+            workers:    If given, the batch is split over this many worker processes, forked
+                        from this one (so they inherit its imports) where supported
+            chunk_size: Number of argvs sent to a worker at once, defaults to spreading the
+                        batch in 4 chunks per worker
+
+        Returns:
+            List with, for each argv, its config as returned by `get_conf` (or, for programs
+            with subprograms, the arguments as returned by `parse_args`), or the exception raised
+        """
+        global _BATCH
+        argvs = [list(argv) for argv in argvs]
+        parsers = _BatchParsers()
+        if not workers or workers <= 1 or len(argvs) <= 1:
+            return self._resolve_batch(argvs, parsers)
+
+        chunk_size = chunk_size or max(1, math.ceil(len(argvs) / (workers * 4)))
+        chunks = [argvs[i:i + chunk_size] for i in range(0, len(argvs), chunk_size)]
+        # Only imported for parallel batches, multiprocessing being slow to import
+        from concurrent.futures import ProcessPoolExecutor
+        from .sweep import _get_mp_context
+        context = _get_mp_context()
+        if context.get_start_method() != 'fork':
+            # Workers couldn't inherit this instance, nor its subprograms' imports
+            return self._resolve_batch(argvs, parsers)
+
+        _BATCH = self, parsers
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=context) as executor:
+                futures = [executor.submit(_resolve_chunk, chunk) for chunk in chunks]
+                results = []
+                for chunk, future in zip(chunks, futures):
+                    try:
+                        results.extend(future.result())
+                    except Exception as e:
+                        results.extend([e] * len(chunk))
+                return results
+        finally:
+            _BATCH = None
+
+    def parse_many(self, argvs):
+        """Parse many command lines, building the parsers only once, see `parse_args`.
+
+        Like `resolve_many`, invalid argvs make the parsers raise a `ParserError` rather than exit,
+        which is returned in place of their result like any other error.
+
+        Args:
+            argvs: List of argument lists
+
+        Returns:
+            List with, for each argv, the (arguments, subprogram) tuple returned by `parse_args`,
+            or the exception raised
+        """
+        parsers, results = _BatchParsers(), []
+        for argv in argvs:
+            try:
+                with profile_phase('parse_args'):
+                    namespace, subprogram, _ = self._parse_args(list(argv), parsers=parsers)
+                results.append((namespace, subprogram))
+            except (Exception, SystemExit) as e:
+                results.append(e)
+        return results
+
+    def _resolve_batch(self, argvs, parsers):
+        default_layer = None if self.subprogram_conf.data else self._get_default_layer()
+        results = []
+        for argv in argvs:
+            try:
+                with profile_phase('resolve'):
+                    namespace, _, _ = self._parse_args(argv, parsers=parsers)
+                    if default_layer is not None:
+                        cli_conf = DotListConfig(to_nested_dict(vars(namespace)))
+                        results.append(self._interpolate(LayeredConfig([default_layer, cli_conf]), cli_conf,
+                                                         parsers['main']))
+                    else:
+                        results.append(namespace)
+            except (Exception, SystemExit) as e:
+                results.append(e)
+        return results
+
+    async def get_conf_async(self, *args, **kwargs):
+        """Same as `get_conf`, in a worker thread, see `parse_args_async`"""
+        import asyncio
+        return await asyncio.to_thread(self.get_conf, *args, **kwargs)
 
     def add_default_arguments(self, parser):
-        group = parser.add_argument_group('default parameters')
-        for arg in self.default_conf.keys():
+        """Add an option per default parameter. When building the parser of a help request
+        (see `HelpRequest`), only the parameters listed in the help are added. Programs without
+        default parameters get no group for them."""
+        keys = list(self.default_conf.keys())
+        if not keys:
+            return parser
+        request = get_help_request()
+        if request is None:
+            group = parser.add_argument_group('default parameters')
+            entries = ((key, None) for key in keys)
+        else:
+            entries = request.select(keys, self.dotlist_sep)
+            listed = sum(1 if count is None else count for _, count in entries)
+            description = (f'{listed} of {len(keys)} parameters, ' if request.pattern is not None else '') + \
+                f'filter with --help=PATTERN (i.e: --help=key{self.dotlist_sep}*) ' \
+                f'or collapse groups with --help-depth=N'
+            group = parser.add_argument_group('default parameters', description)
+        converters = self.converters
+        for arg, count in entries:
             arg_name = f'--{arg.replace(" ", "_")}'
-            value = self.full_config[arg]
-            group.add_argument(arg_name, default=value, dest=arg,
-                               help=f"default is {repr(value.data)}", metavar='')
+            if count is not None:
+                pattern = f'{arg}{self.dotlist_sep}*'
+                group.add_argument(f'--{pattern}', action='store_true', dest=pattern,
+                                   help=f'{count} parameters, list them with --help={pattern}')
+                continue
+            value = self.default_conf[arg].data
+            # argparse formats help strings with %
+            group.add_argument(arg_name, default=value, dest=arg, type=converters.get(arg),
+                               help=f"default is {repr(value)}".replace('%', '%%'), metavar='')
         return parser
 
+    @property
+    def help_cache(self):
+        """Cache of the rendered help texts, next to the parser cache (if enabled)"""
+        if self.parser_cache is None:
+            return None
+        return ParserCache(os.path.join(self.parser_cache.cache_dir, 'help'))
+
+    def _config_sources(self):
+        """Keys of the content of the program's config, see `HelpRequest.cache_key`"""
+        if self.config_path is not None:
+            config_key = ParserCache.key(self.config_path, self._cache_options())
+        else:
+            config_key = hashlib.sha256(repr((self.full_config.data, self._cache_options())).encode()).hexdigest()
+        return (config_key,)
+
+    def _subprogram_sources(self, node):
+        program_path = os.path.abspath(node.path)
+        config_path = find_config(program_path)
+        return self._config_sources() + tuple(ParserCache.key(path) for path in (program_path, config_path)
+                                              if path is not None)
+
+    def _print_help(self, args, build_parser, prog=None, sources=None):
+        """Print the help and exit if the arguments request it (see `find_help_request`).
+
+        The rendered help is cached by the content of the program's config, so repeated
+        requests neither build the parser nor format it. On a miss, the parser is built with
+        only the parameters the help lists. If that parser has no help (i.e: `add_help: False`
+        in the argparse config, which may define its own `-h`), the arguments are left to it.
+
+        Args:
+            args:         The command line arguments, defaults to `sys.argv[1:]`
+            build_parser: Function building the parser, called within the request (see `HelpRequest.activate`)
+            prog:         Name of the program, defaults to that of the main program
+            sources:      Keys of the program's sources, defaults to the config's (see `_config_sources`)
+        """
+        request = find_help_request(sys.argv[1:] if args is None else args)
+        if request is None:
+            return
+        help_cache = self.help_cache
+        entry = key = None
+        if help_cache is not None:
+            key = request.cache_key(self._config_sources() if sources is None else sources,
+                                    prog or os.path.basename(sys.argv[0]))
+            entry = help_cache.load(key)
+        if entry is None:
+            with profile_phase('build help'), request.activate():
+                parser = build_parser()
+                entry = {'help': parser.format_help() if parser.add_help else None}
+            if help_cache is not None:
+                help_cache.store(key, entry)
+        if entry['help'] is None:
+            return
+        sys.stdout.write(entry['help'])
+        sys.exit(0)
+
     def run_command(self, args):
         program_file = args.data.get('programs')
         with open(program_file) as f:
@@ -0,0 +1,142 @@
+import atexit
+import contextlib
+import os
+import sys
+import threading
+import time
+
+__all__ = ['PROFILE_ENV', 'PROFILE_FLAG', 'PROFILE_FORMATS', 'Profiler', 'configure_profiling', 'enable_profiling',
+           'profile_phase']
+
+PROFILE_ENV = 'MULTIPLEX_PROFILE'
+PROFILE_FLAG = '--multiplex-profile'
+PROFILE_FORMATS = ('table', 'collapsed')
+
+# The active profiler, if any. When None, `profile_phase` is a no-op.
+PROFILER = None
+_NULL_PHASE = contextlib.nullcontext()
+
+
+class Profiler:
+    """Records the wall-clock time and allocations of nested phases.
+
+    Allocations are measured as the net number of memory blocks allocated by the
+    interpreter during a phase (see `sys.getallocatedblocks`), which is cheap enough
+    to be always on while profiling.
+
+    Phases are identified by their stack, that is, the names of the phases they are
+    nested in, so the report can be printed as a table or dumped as collapsed stacks,
+    the format used by flame graph tools (i.e: flamegraph.pl, speedscope or inferno).
+    """
+
+    def __init__(self):
+        self.records = {}
+        # Each thread has its own stack of phases, i.e: when resolving configs concurrently
+        self._local = threading.local()
+
+    @property
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        self._stack.append(name)
+        stack = tuple(self._stack)
+        # Register the phase on entry, so that phases are reported in the order they started
+        record = self.records.setdefault(stack, [0, 0.0, 0])
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            allocated = sys.getallocatedblocks() - blocks
+            self._stack.pop()
+            record[0] += 1
+            record[1] += elapsed
+            record[2] += allocated
+
+    def _self_times(self):
+        self_times = {stack: total for stack, (_, total, _) in self.records.items()}
+        for stack, (_, total, _) in self.records.items():
+            if len(stack) > 1 and stack[:-1] in self_times:
+                self_times[stack[:-1]] -= total
+        return self_times
+
+    def format_table(self):
+        self_times = self._self_times()
+        lines = [f'{"phase":<50} {"calls":>6} {"total ms":>10} {"self ms":>10} {"blocks":>10}']
+        for stack, (calls, total, allocated) in self.records.items():
+            name = '  ' * (len(stack) - 1) + stack[-1]
+            lines.append(f'{name:<50} {calls:>6} {total * 1e3:>10.2f} '
+                         f'{self_times[stack] * 1e3:>10.2f} {allocated:>10}')
+        return '\n'.join(lines) + '\n'
+
+    def format_collapsed(self):
+        """Collapsed stacks, one `phase;nested_phase self_time_in_us` line per phase"""
+        self_times = self._self_times()
+        return ''.join(f'{";".join(stack)} {max(0, round(self_times[stack] * 1e6))}\n'
+                       for stack in self.records)
+
+    def report(self, fmt='table', output=None):
+        text = self.format_collapsed() if fmt == 'collapsed' else self.format_table()
+        if output is None:
+            sys.stderr.write(text)
+        else:
+            with open(output, 'w') as f:
+                f.write(text)
+
+
+def profile_phase(name):
+    """Context manager timing a phase with the active profiler, a no-op if profiling is disabled"""
+    if PROFILER is None:
+        return _NULL_PHASE
+    return PROFILER.phase(name)
+
+
+def enable_profiling(fmt='table', output=None):
+    """Start profiling, the report is written when the interpreter exits.
+
+    Args:
+        fmt:    Either `table` for a summary table or `collapsed` for flame graph compatible stacks
+        output: File to write the report to, defaults to stderr
+
+    Returns:
+        The active profiler
+    """
+    global PROFILER
+    if fmt not in PROFILE_FORMATS:
+        raise ValueError(f'Unknown profile format {fmt}, use one of {PROFILE_FORMATS}')
+    if PROFILER is None:
+        PROFILER = Profiler()
+        atexit.register(PROFILER.report, fmt, output)
+    return PROFILER
+
+
+def _parse_profile_setting(setting):
+    """Parse `fmt[:output]`, where the format defaults to a table"""
+    fmt, _, output = setting.partition(':')
+    if fmt in ('', '1', 'true'):
+        fmt = 'table'
+    return fmt, output or None
+
+
+def configure_profiling(argv=None):
+    """Enable profiling if requested by the `MULTIPLEX_PROFILE` environment variable
+    or the `--multiplex-profile` flag, which is removed from `argv` (`sys.argv` by default).
+
+    Both take an optional format and output file, i.e: `--multiplex-profile=collapsed:startup.folded`
+    """
+    argv = sys.argv if argv is None else argv
+    setting = os.environ.get(PROFILE_ENV)
+    for i, arg in enumerate(argv):
+        if arg == PROFILE_FLAG or arg.startswith(PROFILE_FLAG + '='):
+            setting = arg[len(PROFILE_FLAG) + 1:]
+            del argv[i]
+            break
+    if setting is not None and setting not in ('0', 'false'):
+        enable_profiling(*_parse_profile_setting(setting))
+    return PROFILER
@@ -0,0 +1,231 @@
+import argparse
+import functools
+import hashlib
+import inspect
+import os
+import pathlib
+import pickle
+import shutil
+import tempfile
+import warnings
+
+from .cache import default_cache_dir
+from .config import DotListConfig
+from .loaders import _file_hash
+
+__all__ = ['DEFAULT_MAX_SIZE', 'RESULTS_VERSION', 'ResultCache', 'cache_results', 'canonical_hash']
+
+RESULTS_VERSION = 1
+DEFAULT_MAX_SIZE = 1 << 30
+_RESULT_FILE = 'result.pickle'
+_ARTIFACTS_DIR = 'artifacts'
+
+
+def _canonical(value):
+    """Encode a value as a string that only depends on its content, i.e: not on the order of dict keys"""
+    if isinstance(value, DotListConfig):
+        value = value.data
+    if value is None or isinstance(value, (bool, int, float, str, bytes)):
+        return repr(value)
+    if isinstance(value, pathlib.PurePath):
+        return f'Path({str(value)!r})'
+    if isinstance(value, argparse.Namespace):
+        return 'Namespace' + _canonical(vars(value))
+    if isinstance(value, dict):
+        return '{' + ','.join(sorted(f'{_canonical(k)}:{_canonical(v)}' for k, v in value.items())) + '}'
+    if isinstance(value, (list, tuple)):
+        return type(value).__name__ + '[' + ','.join(_canonical(v) for v in value) + ']'
+    if isinstance(value, (set, frozenset)):
+        return 'set{' + ','.join(sorted(_canonical(v) for v in value)) + '}'
+    raise TypeError(f'Cannot hash a value of type {type(value).__name__}')
+
+
+def canonical_hash(value):
+    """Stable hash of a (resolved) config or of parsed arguments, see `_canonical` for the supported types"""
+    return hashlib.sha256(_canonical(value).encode()).hexdigest()
+
+
+def _lookup(obj, key, dotlist_sep='.'):
+    """Get a (dotted) key of parsed arguments or of a config"""
+    for part in key.split(dotlist_sep):
+        if isinstance(obj, DotListConfig):
+            obj = obj.data
+        obj = obj[part] if isinstance(obj, dict) else getattr(obj, part)
+    return obj.data if isinstance(obj, DotListConfig) else obj
+
+
+def _as_mapping(obj):
+    if isinstance(obj, argparse.Namespace):
+        return vars(obj)
+    if isinstance(obj, DotListConfig):
+        return obj.data
+    return obj if isinstance(obj, dict) else {}
+
+
+def _tree_size(path):
+    size = 0
+    for directory, _, files in os.walk(path):
+        for file_name in files:
+            try:
+                size += os.path.getsize(os.path.join(directory, file_name))
+            except OSError:
+                pass
+    return size
+
+
+class ResultCache:
+    """On-disk cache of the results of entry points (or any function), along with the files they write.
+
+    Each entry is a directory holding the pickled return value and a copy of the artifacts,
+    keyed by a hash of the function's arguments and source file (see `cache_results`).
+    Entries are written atomically and unreadable ones are ignored, like `ParserCache`.
+    The least recently used entries are evicted once the cache grows over `max_size` bytes.
+    """
+
+    def __init__(self, cache_dir=None, max_size=DEFAULT_MAX_SIZE):
+        self.cache_dir = os.path.join(default_cache_dir(), 'results') if cache_dir is None \
+            else os.path.expanduser(cache_dir)
+        self.max_size = max_size
+
+    @staticmethod
+    def key(fn, args, kwargs, inputs=()):
+        """Compute the key of a call from the content of the function's source file, its
+        arguments and the content of its input files (see `cache_results`)"""
+        fn = inspect.unwrap(fn)
+        source = inspect.getsourcefile(fn)
+        digest = hashlib.sha256(f'{RESULTS_VERSION}:{fn.__module__}.{fn.__qualname__}'.encode())
+        digest.update(_file_hash(source).encode() if source and os.path.isfile(source) else b'')
+        digest.update(_canonical([list(args), kwargs]).encode())
+        for path in inputs:
+            digest.update(f'{path}:{_file_hash(path) if os.path.isfile(path) else None}'.encode())
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key):
+        """Load a cached result and restore its artifacts, returns (hit, result)"""
+        entry = self.entry_path(key)
+        try:
+            with open(os.path.join(entry, _RESULT_FILE), 'rb') as f:
+                stored = pickle.load(f)
+            for index, path in enumerate(stored['artifacts']):
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                shutil.copy2(os.path.join(entry, _ARTIFACTS_DIR, str(index)), path)
+            # Mark the entry as recently used
+            os.utime(os.path.join(entry, _RESULT_FILE))
+        except (OSError, EOFError, KeyError, TypeError, pickle.UnpicklingError, AttributeError, ImportError):
+            return False, None
+        return True, stored['result']
+
+    def store(self, key, result, artifacts=()):
+        """Store a result and a copy of its artifacts, failing with a warning if they can't be"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_entry = tempfile.mkdtemp(dir=self.cache_dir, suffix='.tmp')
+        except OSError as e:
+            warnings.warn(f'Cannot store result in {self.cache_dir}: {e}')
+            return
+        try:
+            os.mkdir(os.path.join(tmp_entry, _ARTIFACTS_DIR))
+            for index, path in enumerate(artifacts):
+                shutil.copy2(path, os.path.join(tmp_entry, _ARTIFACTS_DIR, str(index)))
+            with open(os.path.join(tmp_entry, _RESULT_FILE), 'wb') as f:
+                pickle.dump({'result': result, 'artifacts': list(artifacts)}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            if _tree_size(tmp_entry) > self.max_size:
+                warnings.warn(f'Result of size over the cache size ({self.max_size} bytes) not stored')
+                return
+            try:
+                os.rename(tmp_entry, self.entry_path(key))
+            except OSError:
+                # Another process stored the same entry first, which is just as good
+                if not os.path.isdir(self.entry_path(key)):
+                    raise
+        except (OSError, pickle.PicklingError, TypeError, AttributeError) as e:
+            warnings.warn(f'Cannot store result in {self.cache_dir}: {e!r}')
+        finally:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache is under `max_size` bytes"""
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.is_dir() and not entry.name.endswith('.tmp'):
+                        try:
+                            used = os.stat(os.path.join(entry.path, _RESULT_FILE)).st_mtime_ns
+                        except OSError:
+                            used = 0
+                        entries.append((used, entry.path, _tree_size(entry.path)))
+        except OSError:
+            return
+        total = sum(size for _, _, size in entries)
+        for _, path, size in sorted(entries):
+            if total <= self.max_size:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+def cache_results(fn=None, *, inputs=(), artifacts=(), cache_dir=None, max_size=DEFAULT_MAX_SIZE):
+    """Decorator caching the return value of an entry point (or of any function) on disk.
+
+    When called again with identical arguments (typically the parsed arguments and the
+    resolved config) and an unchanged source file, the stored result is returned without
+    running the function, and its artifacts are restored. Use it under `register_entrypoint`:
+
+        @register_entrypoint
+        @cache_results(inputs=['model_path'], artifacts=['{output_dir}/model.pt'])
+        def main(args):
+            ...
+
+    Exceptions are not cached, and neither are calls whose arguments can't be hashed
+    (see `canonical_hash`), which run normally with a warning.
+
+    Args:
+        inputs:    (Dotted) keys of the first argument holding the paths of input files, whose
+                   content is part of the key, i.e: a model loaded by an evaluation
+        artifacts: Paths of the files written by the function, stored with its result. They are
+                   formatted with the first argument's values, i.e: `{output_dir}/model.pt`
+        cache_dir: Directory of the cache, defaults to `<cache dir>/results`
+        max_size:  Size of the cache in bytes, over which the least recently used results are evicted
+
+    Returns:
+        The decorated function, its cache is available as its `result_cache` attribute
+    """
+    if fn is None:
+        return functools.partial(cache_results, inputs=inputs, artifacts=artifacts,
+                                 cache_dir=cache_dir, max_size=max_size)
+    result_cache = ResultCache(cache_dir, max_size=max_size)
+
+    @functools.wraps(fn)
+    def cached(*args, **kwargs):
+        first = args[0] if args else None
+        try:
+            input_paths = [_lookup(first, key) for key in inputs]
+            key = result_cache.key(fn, args, kwargs, inputs=[os.fspath(p) for p in input_paths if p is not None])
+        except (TypeError, AttributeError, KeyError) as e:
+            warnings.warn(f'Not caching the result of {fn.__qualname__}: {e}')
+            return fn(*args, **kwargs)
+
+        hit, result = result_cache.load(key)
+        if hit:
+            return result
+        result = fn(*args, **kwargs)
+        artifact_paths = [path.format_map(_as_mapping(first)) for path in artifacts]
+        missing = [path for path in artifact_paths if not os.path.isfile(path)]
+        if missing:
+            warnings.warn(f'Not caching the result of {fn.__qualname__}, missing artifacts: {", ".join(missing)}')
+        else:
+            result_cache.store(key, result, artifact_paths)
+        return result
+
+    cached.result_cache = result_cache
+    return cached
@@ -0,0 +1,110 @@
+import os
+import weakref
+
+from .config import DotListConfig
+from .indexed import INDEXED_EXT, load_indexed_file, write_indexed
+
+__all__ = ['SHARED_MEMORY_DIR', 'SharedConfig', 'share_config']
+
+# POSIX shared memory is a tmpfs mounted here on Linux, files in it are only ever held in memory
+SHARED_MEMORY_DIR = '/dev/shm'
+
+
+def _default_dir():
+    if os.path.isdir(SHARED_MEMORY_DIR) and os.access(SHARED_MEMORY_DIR, os.W_OK):
+        return SHARED_MEMORY_DIR
+    import tempfile
+    return tempfile.gettempdir()
+
+
+def _unlink(path, pid):
+    # Forked children inherit the owner's config, only the owner removes the segment
+    if os.getpid() == pid:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class SharedConfig(DotListConfig):
+    """A read-only config frozen into shared memory, see `share_config`.
+
+    It is pickled as a handle, the path and token of its segment, and unpickling it
+    (i.e: in a DataLoader worker or a spawned process) maps the segment rather than
+    copying the config. Values are decoded on access (see `LazyMapping`), so each
+    process only decodes the keys it reads, and the memory holding the config is shared.
+
+    Args:
+        path:        Path of the segment, an indexed config (see `write_indexed`)
+        token:       Token of the segment's content, checked when attaching
+        dotlist_sep: Separator used for nested keys
+    """
+    # Private, so that they don't shadow the config's keys
+    __slots__ = ('_path', '_token', '_finalizer', '__weakref__')
+
+    def __init__(self, path, token=None, dotlist_sep='.'):
+        try:
+            meta, data = load_indexed_file(path, token=token)
+        except FileNotFoundError:
+            raise FileNotFoundError(f'Shared config {path} was released by its owner') from None
+        super().__init__(data, dotlist_sep=dotlist_sep)
+        self._path = path
+        self._token = meta['token']
+        self._finalizer = None
+
+    def __reduce__(self):
+        return SharedConfig, (self._path, self._token, self.dotlist_sep)
+
+    @property
+    def is_owner(self):
+        """Whether this process created the segment, and releases it"""
+        return self._finalizer is not None and self._finalizer.alive
+
+    def release(self):
+        """Remove the segment, processes that attached to it keep their mapping but no new
+        process can attach. Called when the owner's config is garbage collected, or on exit."""
+        if self._finalizer is not None:
+            self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def share_config(conf, directory=None, dotlist_sep='.'):
+    """Freeze a (resolved) config into a read-only shared memory segment.
+
+    Passing the returned config to child processes, i.e: as part of the arguments captured
+    by a DataLoader's dataset or given to a pool, only pickles a handle to the segment,
+    instead of the whole config for each of them:
+
+        args.conf = share_config(args.conf)
+
+    The segment is released when the returned config is garbage collected in the process
+    that created it, or when the process exits (see `SharedConfig.release`).
+
+    Args:
+        conf:        The config, a `DotListConfig` (i.e: `args.conf`) or a dict
+        directory:   Directory of the segment, defaults to `/dev/shm` or else the temporary directory
+        dotlist_sep: Separator used for nested keys, defaults to the config's
+
+    Returns:
+        The `SharedConfig`
+    """
+    if isinstance(conf, DotListConfig):
+        # Layered configs are merged once here, rather than in every process
+        conf, dotlist_sep = conf.data, conf.dotlist_sep
+    import tempfile
+    fd, path = tempfile.mkstemp(dir=directory or _default_dir(), prefix='multiplex-',
+                                suffix=os.path.extsep + INDEXED_EXT)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write_indexed(conf, f)
+        shared = SharedConfig(path, dotlist_sep=dotlist_sep)
+    except BaseException:
+        os.remove(path)
+        raise
+    shared._finalizer = weakref.finalize(shared, _unlink, path, os.getpid())
+    return shared
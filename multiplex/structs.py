@@ -0,0 +1,127 @@
+import functools
+import keyword
+import re
+
+from .config import DotListConfig
+from .indexed import LazyMapping
+
+__all__ = ['STRUCT_CACHE_SIZE', 'Struct', 'struct_class', 'to_struct']
+
+STRUCT_CACHE_SIZE = 1024
+_NON_IDENTIFIER = re.compile(r'\W')
+
+
+class Struct:
+    """Base class of the frozen classes generated for resolved configs, see `to_struct`.
+
+    Each (nested) key of the config is a slot, so reading it is a plain attribute load
+    rather than a lookup allocating a wrapper like `DotListConfig`'s.
+    """
+    __slots__ = ()
+    # Names of the slots and the config keys they hold, in order
+    _fields = ()
+    _keys = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is frozen, cannot set {name}')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{type(self).__name__} is frozen, cannot delete {name}')
+
+    def _asdict(self):
+        """The config as nested dicts, with its original keys"""
+        return {key: value._asdict() if isinstance(value, Struct) else value
+                for key, value in zip(self._keys, self._values())}
+
+    def _as_config(self, dotlist_sep='.'):
+        """The config as a `DotListConfig`"""
+        return DotListConfig(self._asdict(), dotlist_sep=dotlist_sep)
+
+    def _values(self):
+        return tuple(getattr(self, field) for field in self._fields)
+
+    def __eq__(self, other):
+        if not isinstance(other, Struct):
+            return NotImplemented
+        return self._keys == other._keys and self._values() == other._values()
+
+    __hash__ = None
+
+    def __reduce__(self):
+        # Generated classes can't be pickled by reference, the struct is generated again from its data
+        return to_struct, (self._asdict(),)
+
+    def __repr__(self):
+        fields = ', '.join(f'{field}={value!r}' for field, value in zip(self._fields, self._values()))
+        return f'{type(self).__name__}({fields})'
+
+
+# Attributes of the base class, which the fields must not shadow
+_RESERVED = frozenset(dir(Struct))
+
+
+def _field_name(key):
+    name = _NON_IDENTIFIER.sub('_', key)
+    if not name or name[0].isdigit():
+        name = '_' + name
+    return name + '_' if keyword.iskeyword(name) or name in _RESERVED else name
+
+
+def _class_name(key):
+    return ''.join(part[:1].upper() + part[1:] for part in _NON_IDENTIFIER.split(key) if part) or 'Struct'
+
+
+@functools.lru_cache(maxsize=STRUCT_CACHE_SIZE)
+def struct_class(name, shape):
+    """Generate (once per shape) the class of a config.
+
+    Args:
+        name:  Name of the class
+        shape: Tuple of (key, type) pairs, where the type of a nested config is its struct class
+
+    Returns:
+        A subclass of `Struct` with a slot per key, annotated with the keys' types
+    """
+    keys = tuple(key for key, _ in shape)
+    fields = tuple(_field_name(key) for key in keys)
+    duplicates = sorted({field for field in fields if fields.count(field) > 1})
+    if duplicates:
+        raise ValueError(f'Keys {", ".join(k for k, f in zip(keys, fields) if f in duplicates)} '
+                         f'map to the same attribute')
+    return type(name, (Struct,), {'__slots__': fields, '_fields': fields, '_keys': keys,
+                                  '__annotations__': {field: type_ for field, (_, type_) in zip(fields, shape)}})
+
+
+def _build(data, name):
+    values, shape = [], []
+    for key, value in data.items():
+        if isinstance(value, (dict, LazyMapping)) and all(isinstance(k, str) for k in value):
+            value = _build(value, _class_name(key))
+        values.append(value)
+        shape.append((key, type(value)))
+    struct = object.__new__(struct_class(name, tuple(shape)))
+    for field, value in zip(struct._fields, values):
+        object.__setattr__(struct, field, value)
+    return struct
+
+
+def to_struct(conf, name='Config'):
+    """Convert a resolved config into an instance of a frozen, slotted class tree.
+
+    The classes are generated from the config's keys and the types of its values, and
+    are cached by shape (see `struct_class`), so converting the configs of a sweep only
+    generates them once. Keys that aren't valid identifiers are renamed, i.e: `batch-size`
+    becomes `batch_size` and `in` becomes `in_`, like keys clashing with the attributes of
+    `Struct` (i.e: `_fields` becomes `_fields_`). Convert back with `_asdict` or `_as_config`.
+
+    Args:
+        conf: The config, a `DotListConfig` (i.e: as returned by `get_conf`) or a dict
+        name: Name of the root class
+
+    Returns:
+        The struct, or the config's data as is if it isn't a mapping
+    """
+    data = conf.data if isinstance(conf, DotListConfig) else conf
+    if not isinstance(data, (dict, LazyMapping)):
+        return data
+    return _build(data, name)
@@ -0,0 +1,154 @@
+import itertools
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from .lazy import LazySubprogram
+from .utils import get_entrypoint_from_module, import_from_full_path, split_sweep_values
+
+__all__ = ['expand_sweep', 'expand_sweep_args', 'get_run_name', 'run_sweep']
+
+# Entry point of the sweep being run, set before the worker processes are forked
+# so that they inherit it (along with all of the subprogram's imports).
+_ENTRY_POINT = None
+
+
+def expand_sweep(overrides):
+    """Expand swept overrides into the cartesian product of their values.
+
+    Args:
+        overrides: dict mapping keys to a value, or a list of values to sweep over
+
+    Returns:
+        List of dicts mapping every key to a single value, i.e:
+        {'lr': [0.1, 0.01], 'gamma': 0.7} -> [{'lr': 0.1, 'gamma': 0.7}, {'lr': 0.01, 'gamma': 0.7}]
+    """
+    keys = list(overrides)
+    values = [v if isinstance(v, (list, tuple)) else [v] for v in overrides.values()]
+    return [dict(zip(keys, combination)) for combination in itertools.product(*values)]
+
+
+def expand_sweep_args(args, sweep_sep=','):
+    """Expand a command line sweeping over options into the command lines of its runs.
+
+    Every option given as `--key=value` is swept over its values (see `split_sweep_values`),
+    whether it is declared by the program's parser or is a config override, i.e:
+    `--epochs=5,10 --lr=0.1,0.01` gives 4 command lines. Options given as `--key value` and
+    the arguments after `--` are passed to every run as is.
+
+    Args:
+        args:      The command line arguments, without the program's name
+        sweep_sep: Separator between the swept values of an option
+
+    Returns:
+        List of (point, args) tuples, one per element of the cartesian product of the swept
+        values, where point maps the key of each `--key=value` option to its value in the run
+    """
+    swept = []
+    for index, arg in enumerate(args):
+        if arg == '--':
+            break
+        key, equals, value = arg.partition('=')
+        if key.startswith('--') and equals:
+            swept.append((index, key, split_sweep_values(value, sweep_sep)))
+    runs = []
+    for combination in itertools.product(*(values for _, _, values in swept)):
+        run_args, point = list(args), {}
+        for (index, key, _), value in zip(swept, combination):
+            run_args[index] = f'{key}={value}'
+            point.setdefault(key[2:], value)
+        runs.append((point, run_args))
+    return runs
+
+
+def get_run_name(index, point):
+    """Name of a sweep run, used for its output directory, i.e: `003-lr=0.1,gamma=0.7`"""
+    name = ','.join(f'{k}={v}' for k, v in point.items())
+    return f'{index:03d}-' + re.sub(r'[^\w.=,+-]', '_', name)
+
+
+def _get_mp_context():
+    # Prefer fork so that workers start with the subprogram already imported
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+def _init_worker(program_path, cpu_groups, counter):
+    global _ENTRY_POINT
+    # CPU affinity is only available on some platforms (i.e: Linux), elsewhere workers aren't pinned
+    if cpu_groups and hasattr(os, 'sched_setaffinity'):
+        with counter.get_lock():
+            index = counter.value
+            counter.value += 1
+        os.sched_setaffinity(0, cpu_groups[index % len(cpu_groups)])
+    if _ENTRY_POINT is None:
+        # Not forked, the subprogram needs to be imported again
+        subprogram = None if program_path is None else import_from_full_path(program_path)
+        _ENTRY_POINT = get_entrypoint_from_module(subprogram)
+
+
+def _run(args):
+    if getattr(args, 'output_dir', None) is not None:
+        os.makedirs(args.output_dir, exist_ok=True)
+    return _ENTRY_POINT(args)
+
+
+def run_sweep(subprogram, runs, points=None, workers=None, cpus=None, output_dir=None, registry=None):
+    """Run a subprogram's entry point once per set of arguments, on a process pool.
+
+    The subprogram is imported once in the calling process, and workers are forked
+    from it where supported, so runs don't pay for the interpreter startup, imports
+    or config resolution.
+
+    Args:
+        subprogram:   The subprogram as a module (or `LazySubprogram`), or None for the main program
+        runs:         List of parsed arguments (as namespaces), one per run
+        points:       List of the overrides of each run, used to name their output directories
+        workers:      Number of worker processes, defaults to the number of CPUs
+        cpus:         CPUs the workers are pinned to, split evenly between workers (ignored where
+                      the platform doesn't support CPU affinity)
+        output_dir:   If given, each run gets its own directory under it, passed as `args.output_dir`
+        registry:     Registry the subprogram was imported in, defaults to the active one
+
+    Returns:
+        List of the entry point's return values, or the exception it raised, in the order of `runs`.
+    """
+    global _ENTRY_POINT
+    if workers is None:
+        workers = len(cpus) if cpus else os.cpu_count() or 1
+    cpu_groups = None
+    if cpus:
+        workers = min(workers, len(cpus))
+        cpu_groups = [list(cpus[i::workers]) for i in range(workers)]
+
+    if output_dir is not None:
+        points = [{}] * len(runs) if points is None else points
+        for index, (args, point) in enumerate(zip(runs, points)):
+            args.output_dir = os.path.join(output_dir, get_run_name(index, point))
+
+    program_path = None
+    if subprogram is not None:
+        if isinstance(subprogram, LazySubprogram):
+            subprogram = subprogram.load()
+        program_path = subprogram.__file__
+
+    context = _get_mp_context()
+    if context.get_start_method() == 'fork':
+        _ENTRY_POINT = get_entrypoint_from_module(subprogram, registry=registry)
+
+    try:
+        counter = context.Value('i', 0)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(program_path, cpu_groups, counter)) as executor:
+            futures = [executor.submit(_run, args) for args in runs]
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append(e)
+            return results
+    finally:
+        _ENTRY_POINT = None
@@ -0,0 +1,126 @@
+import contextlib
+import contextvars
+import fnmatch
+import hashlib
+
+from .cache import CACHE_VERSION
+
+__all__ = ['HELP_DEPTH_FLAG', 'HELP_FLAGS', 'HelpRequest', 'find_help_request', 'get_help_request']
+
+HELP_FLAGS = ('-h', '--help')
+HELP_DEPTH_FLAG = '--help-depth'
+
+
+class HelpRequest:
+    """A request for the help of a program, from its command line (see `find_help_request`).
+
+    The help can be restricted to the default parameters matching a glob, i.e: `--help=loss.*`,
+    and the ones nested deeper than a depth collapsed into their group, i.e: `--help-depth=1`
+    lists `--loss.*` once rather than each parameter of `loss`.
+
+    While a request is active (see `activate`), `Multiplexor.add_default_arguments` only adds
+    the selected parameters, so the parser built to render the help is no larger than the help.
+
+    Args:
+        pattern: Optional glob the dotted keys of the parameters are matched against, a key also
+                 matches if the pattern is one of its groups, i.e: `loss` matches `loss.alpha`
+        depth:   Optional depth below which parameters are collapsed into their group, at least 1
+    """
+    __slots__ = ('pattern', 'depth')
+
+    def __init__(self, pattern=None, depth=None):
+        self.pattern = pattern
+        self.depth = depth
+
+    @property
+    def filtered(self):
+        return self.pattern is not None or self.depth is not None
+
+    def matches(self, key, sep='.'):
+        return self.pattern is None or fnmatch.fnmatchcase(key, self.pattern) or key.startswith(self.pattern + sep)
+
+    def select(self, keys, sep='.'):
+        """Select the parameters to list in the help.
+
+        Args:
+            keys: The dotted keys of the parameters, in order
+            sep:  Separator used for nested keys
+
+        Returns:
+            A list of (key, count) pairs, in order of first appearance, where count is None
+            for a parameter, or the number of parameters collapsed into the group `key`
+        """
+        selected, collapsed = [], {}
+        for key in keys:
+            if not self.matches(key, sep):
+                continue
+            parts = key.split(sep)
+            if self.depth is None or len(parts) <= self.depth:
+                selected.append([key, None])
+                continue
+            group = sep.join(parts[:self.depth])
+            if group not in collapsed:
+                collapsed[group] = [group, 0]
+                selected.append(collapsed[group])
+            collapsed[group][1] += 1
+        return [tuple(entry) for entry in selected]
+
+    def cache_key(self, sources, prog):
+        """Compute the cache key of the rendered help, from the keys of the program's sources
+        (i.e: the content hash of its config, see `ParserCache.key`), its name and the terminal's
+        width, which the help is wrapped to"""
+        import shutil
+        digest = hashlib.sha256(f'{CACHE_VERSION}:{prog}:{shutil.get_terminal_size().columns}'.encode())
+        digest.update(repr((self.pattern, self.depth, tuple(sources))).encode())
+        return digest.hexdigest()
+
+    @contextlib.contextmanager
+    def activate(self):
+        """Make this the request of the current thread (or asyncio task) within the block,
+        see `get_help_request`"""
+        token = _ACTIVE_HELP_REQUEST.set(self)
+        try:
+            yield self
+        finally:
+            _ACTIVE_HELP_REQUEST.reset(token)
+
+    def __repr__(self):
+        return f'{type(self).__name__}(pattern={self.pattern!r}, depth={self.depth!r})'
+
+
+_ACTIVE_HELP_REQUEST = contextvars.ContextVar('multiplex_help_request', default=None)
+
+
+def get_help_request():
+    """Get the help request being rendered, or None when building a parser to parse arguments"""
+    return _ACTIVE_HELP_REQUEST.get()
+
+
+def find_help_request(args):
+    """Find a request for help in a command line, before any `--`.
+
+    Recognizes `-h`, `--help`, `--help=PATTERN` and `--help-depth=N` (or `--help-depth N`),
+    which can be combined, i.e: `--help=loss.* --help-depth=2`.
+
+    Args:
+        args: The command line arguments, without the program's name
+
+    Returns:
+        A `HelpRequest`, or None if help isn't requested or the depth isn't a positive integer
+        (the parser then reports the invalid argument)
+    """
+    requested, pattern, depth = False, None, None
+    args = iter(args)
+    for arg in args:
+        if arg == '--':
+            break
+        if arg in HELP_FLAGS:
+            requested = True
+        elif arg.startswith('--help='):
+            requested, pattern = True, arg[len('--help='):]
+        elif arg == HELP_DEPTH_FLAG or arg.startswith(HELP_DEPTH_FLAG + '='):
+            value = arg[len(HELP_DEPTH_FLAG) + 1:] if '=' in arg else next(args, '')
+            if not value.isdigit() or int(value) < 1:
+                return None
+            requested, depth = True, int(value)
+    return HelpRequest(pattern, depth) if requested else None
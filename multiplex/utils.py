@@ -1,15 +1,112 @@
+import contextlib
+import contextvars
 import functools
+import inspect
 import os
+import threading
+import types
 from importlib import util
 
-PARSER_GETTERS = {}
-ENTRY_POINTS = {}
+from .indexed import LazyMapping
+from .profiling import profile_phase
+
+__all__ = ['DEFAULT_REGISTRY', 'ENTRY_POINTS', 'IMPORTED_MODULES', 'PARSER_GETTERS', 'Registry',
+           'get_entrypoint_from_module', 'get_parser_from_module', 'get_registry', 'import_from_full_path',
+           'register_entrypoint', 'register_parser', 'split_sweep_values', 'to_nested_dict', 'without_keys']
+
+
+class Registry:
+    """Parser getters, entry points and imported modules of a set of programs.
+
+    Functions are registered under the path of the file they are defined in, rather than
+    their module's name, so that two `train.py` in different directories don't collide.
+    Each `Multiplexor` has its own registry, which is activated while it imports its
+    subprograms (see `activate`), so that any number of them can be used in the same
+    process, concurrently, without sharing their subprograms.
+
+    Reads are lock-free, only the first import of each module is serialized.
+    """
+
+    def __init__(self):
+        self.parsers = {}
+        self.entry_points = {}
+        self.modules = {}
+        self._import_lock = threading.RLock()
+
+    @contextlib.contextmanager
+    def activate(self):
+        """Make this the registry of the current thread (or asyncio task) within the block,
+        see `get_registry`"""
+        token = _ACTIVE_REGISTRY.set(self)
+        try:
+            yield self
+        finally:
+            _ACTIVE_REGISTRY.reset(token)
+
+    def register(self, table, fn, kind):
+        key = _source_key(inspect.unwrap(fn))
+        if table.get(key, fn) is not fn:
+            raise ValueError(f"Cannot register multiple {kind} per submodule.")
+        table[key] = fn
+
+    def lookup(self, table_name, module):
+        """Look up a module's function in this registry, then in the default one"""
+        key = _source_key(module)
+        fn = getattr(self, table_name).get(key)
+        if fn is None and self is not DEFAULT_REGISTRY:
+            fn = getattr(DEFAULT_REGISTRY, table_name).get(key)
+        return fn
+
+    def import_module(self, full_path, module_name=None, submodules_path=None):
+        """See `import_from_full_path`"""
+        full_path = os.path.abspath(full_path)
+        module = self.modules.get(full_path)
+        if module is not None:
+            return module
+        with self._import_lock:
+            if full_path in self.modules:
+                return self.modules[full_path]
+            if module_name is None:
+                module_name, _ = os.path.splitext(os.path.basename(full_path))
+            if submodules_path is None:
+                submodules_path = os.path.dirname(full_path)
+            spec = util.spec_from_file_location(module_name, full_path,
+                                                submodule_search_locations=submodules_path)
+            module = util.module_from_spec(spec)
+            with profile_phase(f'import {module_name}'), self.activate():
+                spec.loader.exec_module(module)
+            self.modules[full_path] = module
+            return module
+
+
+def _source_key(obj):
+    """Key of a function or module in a registry: the path of its source file, or
+    `__main__` for the main program (i.e: when it is an interactive session)"""
+    if obj is None or isinstance(obj, types.ModuleType) and obj.__name__ == '__main__' \
+            or getattr(obj, '__module__', None) == '__main__':
+        return '__main__'
+    code = getattr(obj, '__code__', None)
+    path = code.co_filename if code is not None else getattr(obj, '__file__', None)
+    return obj.__name__ if path is None else os.path.abspath(path)
+
+
+# Registry of the functions registered outside of any `Multiplexor`, i.e: by the main program
+DEFAULT_REGISTRY = Registry()
+PARSER_GETTERS = DEFAULT_REGISTRY.parsers
+ENTRY_POINTS = DEFAULT_REGISTRY.entry_points
+IMPORTED_MODULES = DEFAULT_REGISTRY.modules
+_ACTIVE_REGISTRY = contextvars.ContextVar('multiplex_registry', default=DEFAULT_REGISTRY)
+
+
+def get_registry():
+    """Get the active registry, that of the `Multiplexor` importing a subprogram, or `DEFAULT_REGISTRY`"""
+    return _ACTIVE_REGISTRY.get()
 
 
 def register_parser(fn):
     """Decorator used to register a module's get_parser
 
-    Simply register the function in `PARSER_GETTERS` and return the function intact.
+    Simply register the function in the active registry (see `get_registry`) and return the function intact.
 
     Args:
         fn: The decorated function. It must return a argparse.ArgumentParser object,
@@ -18,9 +115,8 @@ def register_parser(fn):
     Returns:
         The original function (not changed in any way).
     """
-    if fn.__module__ in PARSER_GETTERS:
-        raise ValueError("Cannot register multiple parsers per submodule.")
-    PARSER_GETTERS[fn.__module__] = fn
+    registry = get_registry()
+    registry.register(registry.parsers, fn, 'parsers')
 
     @functools.wraps(fn)
     def registered(*args, **kwargs):
@@ -29,7 +125,7 @@ def register_parser(fn):
     return registered
 
 
-def get_parser_from_module(subprogram, *args, parents=None, **kwargs):
+def get_parser_from_module(subprogram, *args, parents=None, registry=None, **kwargs):
     """Retrieves the corresponding parser of the subprogram.
     This only works if the subprogram has a properly decorated
     function that will return a parser. See: @register_parser
@@ -38,12 +134,14 @@ def get_parser_from_module(subprogram, *args, parents=None, **kwargs):
         subprogram: The subprogram module
         *args:      Arbitrary arguments
         parents:    List of parent parsers
+        registry:   Registry the subprogram was imported in, defaults to the active one
         **kwargs:   Arbitrary keyword arguments
 
     Returns:
         The subprogram's parser.
     """
-    subparser = PARSER_GETTERS.get(subprogram.__name__)
+    registry = get_registry() if registry is None else registry
+    subparser = registry.lookup('parsers', subprogram)
     if subparser is None:
         raise ValueError(f"No subparser found for module {subprogram.__name__}, "
                          f"consider using the @register_parser decorator.")
@@ -52,9 +150,8 @@ def get_parser_from_module(subprogram, *args, parents=None, **kwargs):
 
 
 def register_entrypoint(fn):
-    if fn.__module__ in ENTRY_POINTS:
-        raise ValueError("Cannot register multiple entry points per submodule.")
-    ENTRY_POINTS[fn.__module__] = fn
+    registry = get_registry()
+    registry.register(registry.entry_points, fn, 'entry points')
 
     @functools.wraps(fn)
     def registered(*args, **kwargs):
@@ -63,25 +160,28 @@ def register_entrypoint(fn):
     return registered
 
 
-def get_entrypoint_from_module(subprogram):
-    name = "__main__" if subprogram is None else subprogram.__name__
-    main = ENTRY_POINTS.get(name)
+def get_entrypoint_from_module(subprogram, registry=None):
+    registry = get_registry() if registry is None else registry
+    main = registry.lookup('entry_points', subprogram)
     if main is None:
+        name = "__main__" if subprogram is None else subprogram.__name__
         raise ValueError(f"No entry point found for module {name}, "
                          f"consider using the @register_entrypoint decorator.")
     return main
 
 
-def import_from_full_path(full_path, module_name=None, submodules_path=None):
-    if module_name is None:
-        module_name, _ = os.path.splitext(os.path.basename(full_path))
-    if submodules_path is None:
-        submodules_path = os.path.dirname(full_path)
-    spec = util.spec_from_file_location(module_name, full_path,
-                                        submodule_search_locations=submodules_path)
-    module = util.module_from_spec(spec)
-    spec.loader.exec_module(module)
-    return module
+def import_from_full_path(full_path, module_name=None, submodules_path=None, registry=None):
+    """Import a module from its path.
+
+    Modules are only executed once per registry, further imports of the same path
+    return the module stored in its `modules`. The functions the module registers
+    go to the same registry.
+
+    Args:
+        registry: Registry to import the module in, defaults to the active one (see `get_registry`)
+    """
+    registry = get_registry() if registry is None else registry
+    return registry.import_module(full_path, module_name=module_name, submodules_path=submodules_path)
 
 
 def to_nested_dict(d, dotlist_sep='.'):
@@ -101,3 +201,56 @@ def to_nested_dict(d, dotlist_sep='.'):
     for key, value in d.items():
         add_element(key, value)
     return new
+
+
+def without_keys(d, keys, dotlist_sep='.'):
+    """Remove dotted keys from a nested dict, without modifying it.
+
+    Only the dicts along the path of each key are copied, the rest is shared with `d`.
+    Lazy mappings (see `LazyMapping`) along the path are copied as dicts, decoding only
+    their own level.
+    """
+    new = dict(d)
+    copies = {id(new)}
+    for key in keys:
+        parts = key.split(dotlist_sep)
+        subdict = new
+        for part in parts[:-1]:
+            child = subdict.get(part)
+            if not isinstance(child, (dict, LazyMapping)):
+                break
+            if id(child) not in copies:
+                child = subdict[part] = dict(child)
+                copies.add(id(child))
+            subdict = child
+        else:
+            subdict.pop(parts[-1], None)
+    return new
+
+
+def split_sweep_values(value, sweep_sep=','):
+    """Split the swept values of an override, i.e: `0.1,0.01` into `['0.1', '0.01']`.
+
+    Separators within brackets are kept, so that lists and interpolations can be swept
+    (i.e: `[64,32],[128]` or `${max(a, b)}`), and a separator escaped by a backslash is
+    kept as is without it (i.e: `a\\,b` is the single value `a,b`).
+    """
+    values, current, depth, i = [], [], 0, 0
+    while i < len(value):
+        if value.startswith('\\' + sweep_sep, i):
+            current.append(sweep_sep)
+            i += len(sweep_sep) + 1
+            continue
+        if depth == 0 and value.startswith(sweep_sep, i):
+            values.append(''.join(current))
+            current = []
+            i += len(sweep_sep)
+            continue
+        if value[i] in '([{':
+            depth += 1
+        elif value[i] in ')]}' and depth:
+            depth -= 1
+        current.append(value[i])
+        i += 1
+    values.append(''.join(current))
+    return values
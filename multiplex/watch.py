@@ -0,0 +1,261 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import traceback
+import warnings
+
+from .config import DotListConfig
+from .indexed import LazyMapping
+from .loaders import LOADERS
+
+__all__ = ['DEBOUNCE_DELAY', 'MISSING', 'ConfigWatcher', 'diff_configs']
+
+
+class _Missing:
+    def __repr__(self):
+        return 'MISSING'
+
+
+# Placeholder for the value of a key which was added or removed
+MISSING = _Missing()
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+_INOTIFY_EVENT = struct.Struct('iIII')
+
+# Events arriving within this delay are handled together, as editors often write a file in several steps
+DEBOUNCE_DELAY = 0.05
+
+
+def _flatten(data, sep, prefix='', flat=None):
+    flat = {} if flat is None else flat
+    if isinstance(data, (dict, LazyMapping)) and data:
+        for k, v in data.items():
+            _flatten(v, sep, prefix + sep + k if prefix else k, flat)
+    else:
+        flat[prefix] = data
+    return flat
+
+
+def diff_configs(old, new, dotlist_sep='.'):
+    """Compute the key-level difference between two configs.
+
+    Returns:
+        dict mapping the dotted keys of the leaves that changed to their (old, new) values,
+        where the value of an added or removed key is `MISSING`
+    """
+    old = _flatten(old.data if isinstance(old, DotListConfig) else old, dotlist_sep)
+    new = _flatten(new.data if isinstance(new, DotListConfig) else new, dotlist_sep)
+    changes = {}
+    for key in dict.fromkeys(list(old) + list(new)):
+        old_value, new_value = old.get(key, MISSING), new.get(key, MISSING)
+        if old_value is MISSING or new_value is MISSING or type(old_value) is not type(new_value) \
+                or old_value != new_value:
+            changes[key] = (old_value, new_value)
+    return changes
+
+
+class _InotifyBackend:
+    """Waits for changes in directories with inotify(7), only available on linux"""
+
+    def __init__(self, directories):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.directories = {}
+        for directory in directories:
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_WATCH_MASK)
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f'inotify_add_watch failed for {directory}')
+            self.directories[wd] = directory
+
+    def wait(self, timeout):
+        """Wait for changes, returns the paths that changed (empty on timeout)"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed = set()
+        while True:
+            try:
+                buffer = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(buffer):
+                wd, _, _, length = _INOTIFY_EVENT.unpack_from(buffer, offset)
+                offset += _INOTIFY_EVENT.size
+                name = buffer[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if wd in self.directories:
+                    changed.add(os.path.join(self.directories[wd], os.fsdecode(name)))
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _PollingBackend:
+    """Waits for changes by comparing the modification times of files and directories"""
+
+    def __init__(self, paths, directories, stopped):
+        self.paths, self.directories, self.stopped = list(paths), list(directories), stopped
+        self.snapshot = self._snapshot()
+
+    def _snapshot(self):
+        snapshot = {}
+        for path in self.paths:
+            snapshot[path] = self._stat(path)
+        for directory in self.directories:
+            for entry in os.scandir(directory) if os.path.isdir(directory) else ():
+                snapshot[entry.path] = self._stat(entry.path)
+        return snapshot
+
+    @staticmethod
+    def _stat(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def wait(self, timeout):
+        self.stopped.wait(timeout)
+        snapshot = self._snapshot()
+        changed = {path for path in snapshot.keys() | self.snapshot.keys()
+                   if snapshot.get(path) != self.snapshot.get(path)}
+        self.snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+class ConfigWatcher:
+    """Keeps a config up to date with the files it is loaded from.
+
+    The files, and the directories of nested configs, are watched with inotify on linux
+    and polled otherwise. When one of them changes, `load` is called with the paths that
+    changed to get the new config, which is diffed against the current one, key by key.
+    The callbacks registered with `on_change` are then called with the new config and
+    the changes, so that a long-running service can apply them without restarting.
+
+    If the config can't be loaded (i.e: while a file is being edited), the current
+    config is kept and a warning is emitted.
+
+    Args:
+        load:        Callable taking the set of paths that changed and returning the new config,
+                     only the changed files should be parsed again (see `load_config_file`)
+        paths:       Config files to watch
+        directories: Directories of nested configs to watch, along with their subdirectories
+        interval:    Polling interval in seconds, when inotify isn't available
+        use_inotify: Set to False to always poll
+        dotlist_sep: Separator used for nested keys
+    """
+
+    def __init__(self, load, paths=(), directories=(), interval=1.0, use_inotify=True, dotlist_sep='.'):
+        self.load = load
+        self.paths = {os.path.abspath(path) for path in paths}
+        self.directories = set()
+        for directory in directories:
+            for root, _, _ in os.walk(os.path.abspath(directory)):
+                self.directories.add(root)
+        self.interval, self.use_inotify, self.dotlist_sep = interval, use_inotify, dotlist_sep
+        self.callbacks = []
+        self.config = load(set())
+        self.error = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def on_change(self, callback, keys=None):
+        """Register a callback, called as `callback(config, changes)` where `changes` maps
+        the dotted keys that changed to their (old, new) values. If `keys` are given, the
+        callback only gets the changes of these keys and the ones nested under them.
+        Returns the callback, so this can be used as a decorator."""
+        self.callbacks.append((callback, None if keys is None else tuple(keys)))
+        return callback
+
+    def _is_watched(self, path):
+        if path in self.paths:
+            return True
+        return os.path.dirname(path) in self.directories and os.path.splitext(path)[1][1:] in LOADERS
+
+    def reload(self, changed=frozenset()):
+        """Load the config again and notify the callbacks of the changes, if any.
+
+        Returns:
+            The changes, see `diff_configs`
+        """
+        with self._lock:
+            try:
+                config = self.load(set(changed))
+            except (Exception, SystemExit) as e:
+                self.error = e
+                warnings.warn(f'Failed to reload the config after changes to {", ".join(sorted(changed))}: {e!r}')
+                return {}
+            self.error = None
+            changes = diff_configs(self.config, config, self.dotlist_sep)
+            self.config = config
+
+        for callback, keys in self.callbacks if changes else ():
+            selected = changes if keys is None else \
+                {k: v for k, v in changes.items() if any(k == key or k.startswith(key + self.dotlist_sep)
+                                                         for key in keys)}
+            if selected:
+                try:
+                    callback(config, selected)
+                except Exception:
+                    traceback.print_exc()
+        return changes
+
+    def _get_backend(self):
+        directories = self.directories | {os.path.dirname(path) for path in self.paths}
+        if self.use_inotify and sys.platform.startswith('linux'):
+            try:
+                return _InotifyBackend(sorted(directories)), None
+            except (OSError, AttributeError):
+                pass
+        return _PollingBackend(self.paths, self.directories, self._stopped), self.interval
+
+    def run(self):
+        """Watch the files until `stop` is called, blocking the current thread"""
+        self._run(*self._get_backend())
+
+    def _run(self, backend, timeout):
+        try:
+            while not self._stopped.is_set():
+                changed = backend.wait(1.0 if timeout is None else timeout)
+                if changed and timeout is None:
+                    changed |= backend.wait(DEBOUNCE_DELAY)
+                changed = {path for path in changed if self._is_watched(path)}
+                if changed and not self._stopped.is_set():
+                    self.reload(changed)
+        finally:
+            backend.close()
+
+    def start(self):
+        """Watch the files in a background thread"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            # The files are watched from now on, changes made before the thread runs aren't missed
+            self._thread = threading.Thread(target=self._run, args=self._get_backend(),
+                                            name='multiplex-config-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
@@ -7,5 +7,8 @@ setup(
     packages=find_packages(),
     install_requires=[
         'configurator[yaml]>=1.3'
-    ]
+    ],
+    entry_points={
+        'console_scripts': ['multiplex=multiplex.__main__:main']
+    }
 )
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+import multiplex.parser
+from multiplex import Multiplexor, ParserCache
+
+CONFIG = """
+argparse:
+  arguments:
+    - name_or_flags: ["--epochs"]
+      type: int
+      default: 10
+lr: 0.1
+name: run-${lr}
+"""
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    path = tmp_path / 'train.yaml'
+    path.write_text(CONFIG)
+    return str(path)
+
+
+def _no_load(path):
+    raise AssertionError(f'{path} was parsed despite being cached')
+
+
+def test_cache_hit(config_path, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / 'cache')
+    cold = Multiplexor(config_path, cache=cache_dir).get_conf(args=['--epochs', '3'])
+    assert len(os.listdir(cache_dir)) == 1
+
+    monkeypatch.setattr(multiplex.parser, 'load_config', _no_load)
+    warm = Multiplexor(config_path, cache=cache_dir).get_conf(args=['--epochs', '3'])
+    assert warm.data == cold.data == {'epochs': 3, 'lr': 0.1, 'name': 'run-0.1'}
+
+
+def test_cache_invalidated_by_edit(config_path, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    assert Multiplexor(config_path, cache=cache_dir).get_conf(args=[])['lr'].data == 0.1
+
+    with open(config_path, 'w') as f:
+        f.write(CONFIG.replace('lr: 0.1', 'lr: 0.5').replace('default: 10', 'default: 20'))
+    conf = Multiplexor(config_path, cache=cache_dir).get_conf(args=[])
+    assert conf.data == {'epochs': 20, 'lr': 0.5, 'name': 'run-0.5'}
+    assert len(os.listdir(cache_dir)) == 2
+
+
+def test_cache_keyed_on_options(config_path, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    Multiplexor(config_path, cache=cache_dir).get_conf(args=[])
+    conf = Multiplexor(config_path, cache=cache_dir, argparse_key='args').get_conf(args=[])
+    # The argparse section is now a plain value, not the parser's arguments
+    assert 'argparse' in conf.data and 'epochs' not in conf.data
+    Multiplexor(config_path, cache=cache_dir, engine='fast').get_conf(args=[])
+    assert len(os.listdir(cache_dir)) == 3
+
+
+def test_corrupted_entry_is_a_miss(config_path, tmp_path):
+    cache = ParserCache(str(tmp_path / 'cache'))
+    Multiplexor(config_path, cache=cache)
+    for name in os.listdir(cache.cache_dir):
+        with open(os.path.join(cache.cache_dir, name), 'wb') as f:
+            f.write(b'not a pickle')
+    assert Multiplexor(config_path, cache=cache).get_conf(args=[])['epochs'].data == 10
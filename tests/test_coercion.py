@@ -0,0 +1,104 @@
+import pathlib
+import pickle
+
+import pytest
+
+from multiplex import (CoercionError, EnumConverter, Multiplexor, SequenceConverter, compile_converters, get_converter,
+                       infer_converter)
+
+CONFIG = """
+schema:
+  mode: [fast, slow]
+  layers: list[int]
+  seed: int
+lr: 0.1
+epochs: 10
+debug: false
+name: run
+seed: null
+layers: []
+mode: fast
+out: ${name}-${lr}
+"""
+
+
+@pytest.mark.parametrize('spec, text, value', [
+    ('int', '3', 3),
+    ('float', '1e-3', 0.001),
+    ('str', '3', '3'),
+    ('bool', 'Yes', True),
+    ('bool', 'off', False),
+    ('path', '~/data', pathlib.Path('~/data').expanduser()),
+    ('literal', '[1, 2]', [1, 2]),
+    ('literal', '${a}', '${a}'),
+    ('list', '1,a', [1, 'a']),
+    ('list[float]', '[1, 2.5]', [1.0, 2.5]),
+    ('tuple[int]', '(1,2)', (1, 2)),
+    ('list[int]', '', []),
+    ([1, 'a'], '1', 1),
+    ([1, 'a'], 'a', 'a'),
+])
+def test_get_converter(spec, text, value):
+    assert get_converter(spec)(text) == value
+
+
+@pytest.mark.parametrize('spec, text', [('int', '3.5'), ('bool', 'maybe'), ('list[int]', '1,x'), ([1, 2], '3')])
+def test_invalid_value(spec, text):
+    with pytest.raises(ValueError, match='invalid'):
+        get_converter(spec)(text)
+
+
+@pytest.mark.parametrize('spec', ['integer', 'int[str]', 3])
+def test_invalid_spec(spec):
+    with pytest.raises(ValueError):
+        get_converter(spec)
+
+
+def test_infer_converter():
+    assert infer_converter(True)('no') is False
+    assert infer_converter(3)('4') == 4
+    assert infer_converter(0.5)('1') == 1.0
+    assert infer_converter('${a}')('${b}') == '${b}'
+    assert infer_converter(None)('3') == 3
+    assert infer_converter([1, 2])('3,4') == [3, 4]
+    assert infer_converter([[1]]).item_converter.__name__ == 'literal'
+    assert infer_converter({'a': 1}) is None
+
+
+def test_compile_converters():
+    converters = compile_converters({'a': {'b': 1, 'c': [0.5]}, 'd': 'x'}, schema={'a': {'b': 'float'}, 'e': [1, 2]})
+    assert converters['a.b'].__name__ == 'float'
+    assert isinstance(converters['a.c'], SequenceConverter) and converters['a.c']('1') == [1.0]
+    assert converters['d'].__name__ == 'str'
+    assert isinstance(converters['e'], EnumConverter)
+
+
+def test_converters_pickled():
+    converters = compile_converters({'a': [1], 'b': True}, schema={'c': ['x', 'y']})
+    restored = pickle.loads(pickle.dumps(converters))
+    assert restored['a']('2,3') == [2, 3] and restored['b']('false') is False and restored['c']('y') == 'y'
+
+
+def test_cli_arguments_coerced():
+    conf = Multiplexor(CONFIG, cache=False).get_conf(args=['--lr', '1', '--epochs', '3', '--debug', 'true',
+                                                           '--name', '5', '--seed', '7', '--layers', '8,4'])
+    assert conf.data == {'lr': 1.0, 'epochs': 3, 'debug': True, 'name': '5', 'seed': 7, 'layers': [8, 4],
+                         'mode': 'fast', 'out': '5-1.0'}
+    assert type(conf['lr'].data) is float
+
+
+@pytest.mark.parametrize('args, error', [
+    (['--epochs', 'x'], "invalid int value: 'x'"),
+    (['--mode', 'medium'], "invalid enum value: 'medium'"),
+])
+def test_invalid_cli_arguments(capsys, args, error):
+    with pytest.raises(SystemExit) as info:
+        Multiplexor(CONFIG, cache=False).get_conf(args=args)
+    assert info.value.code == 2
+    assert error in capsys.readouterr().err
+
+
+def test_coercion_error_pickled():
+    error = pickle.loads(pickle.dumps(CoercionError({'lr': 'invalid float value', 'epochs': 'invalid int value'})))
+    assert error.errors == {'lr': 'invalid float value', 'epochs': 'invalid int value'}
+    assert str(error).startswith('invalid overrides:\n  lr: invalid float value')
@@ -0,0 +1,84 @@
+import shutil
+import subprocess
+
+import pytest
+
+from multiplex import Multiplexor, collect_completions, find_config_groups, generate_completion, write_completion
+
+PROGRAM = '''import argparse
+from multiplex import register_entrypoint, register_parser
+
+
+@register_parser
+def get_parser(parents):
+    parser = argparse.ArgumentParser(parents=parents)
+    parser.add_argument("--epochs", type=int, default=1)
+    return parser
+
+
+@register_entrypoint
+def main(args):
+    return args
+'''
+
+OVERRIDES = ['-h', '--help', '--epochs', '--seed=', '--learn.optim.lr=', '--learn.optim.momentum=']
+
+
+@pytest.fixture
+def program(tmp_path):
+    (tmp_path / 'train.py').write_text(PROGRAM)
+    (tmp_path / 'eval.py').write_text(PROGRAM)
+    (tmp_path / 'learn').mkdir()
+    (tmp_path / 'learn' / 'optim.yaml').write_text('lr: 0.1\nmomentum: 0.9\n"lr; rm -rf": 1\n')
+    (tmp_path / 'main.yaml').write_text('subprograms:\n  model:\n    train: train.py\n    eval: eval.py\nseed: 1\n')
+    return Multiplexor(str(tmp_path / 'main.yaml'), cache=False)
+
+
+def test_find_config_groups(tmp_path):
+    for path in ['main.yaml', 'learn/optim.yaml', 'learn/sched/step.yaml', '.git/config.yaml', '__pycache__/a.yaml',
+                 'learn/notes.txt']:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text('a: 1\n')
+    groups = find_config_groups(str(tmp_path), exclude=[str(tmp_path / 'main.yaml')])
+    assert groups == {'learn.optim': str(tmp_path / 'learn' / 'optim.yaml'),
+                      'learn.sched.step': str(tmp_path / 'learn' / 'sched' / 'step.yaml')}
+
+
+def test_collect_completions(program):
+    main_options, commands = collect_completions(program)
+    assert main_options == ['-h', '--help']
+    assert commands == {'model': ['train', 'eval'], 'model train': OVERRIDES, 'model eval': OVERRIDES}
+
+
+def test_collect_completions_without_subprograms():
+    assert collect_completions(Multiplexor('seed: 1\nlr: 0.1\n', cache=False)) == (['-h', '--help', '--seed', '--lr'],
+                                                                                     {})
+
+
+@pytest.mark.parametrize('shell', ['bash', 'zsh', 'fish'])
+def test_generate_completion(program, shell):
+    script = generate_completion(program, shell=shell)
+    lines = script.splitlines()
+    header = lines[1:3] if shell == 'zsh' else lines[:2]
+    assert header[0] == f'# {shell} completion of main.py, generated by `python -m multiplex completion`'
+    assert header[1].startswith('# multiplex-hash: ')
+    assert 'learn.optim.momentum' in script and 'rm -rf' not in script
+    if shell == 'zsh':
+        assert lines[0].startswith('#compdef')
+    if shutil.which(shell) is not None:
+        subprocess.run([shell, '-n'], input=script, text=True, check=True)
+
+
+def test_unknown_shell(program):
+    with pytest.raises(ValueError, match='Unknown shell'):
+        generate_completion(program, shell='tcsh')
+
+
+def test_only_regenerated_when_configs_change(program, tmp_path):
+    output = str(tmp_path / 'completion' / 'main.bash')
+    assert write_completion(program, output=output) == (output, True)
+    assert write_completion(program, output=output) == (output, False)
+    (tmp_path / 'learn' / 'optim.yaml').write_text('lr: 0.1\nwarmup: 10\n')
+    assert write_completion(program, output=output) == (output, True)
+    with open(output) as f:
+        assert '--learn.optim.warmup=' in f.read()
@@ -0,0 +1,118 @@
+import pickle
+
+import pytest
+
+from multiplex import DotListConfig, LayeredConfig, resolve_config_group
+
+
+def test_dotted_lookups():
+    conf = DotListConfig({'a': {'b': {'c': 1}}, 'd': [1, 2]})
+    assert conf['a.b.c'].data == 1
+    assert conf['a.b'].data == {'c': 1}
+    assert conf['a']['b'].data is conf['a.b'].data
+    assert conf['a.b'] is conf['a.b']
+    assert conf.get('a.x') is None
+    assert sorted(conf.keys()) == ['a.b.c', 'd']
+
+
+def test_reassigning_data_invalidates():
+    conf = DotListConfig({'a': {'b': 1}})
+    assert conf['a.b'].data == 1
+    conf.merge({'a': {'b': 2, 'c': 3}})
+    assert conf['a.b'].data == 2
+    assert sorted(conf.keys()) == ['a.b', 'a.c']
+
+
+def test_setting_a_key_invalidates_parent_and_children():
+    conf = DotListConfig({'a': {'b': 1}})
+    child = conf['a']
+    assert conf['a.b'].data == child['b'].data == 1
+
+    child['b'] = 2
+    assert conf['a.b'].data == child['b'].data == 2
+    conf['a.c'] = 3
+    assert child['c'].data == 3
+    assert conf.keys() == ['a.b', 'a.c']
+
+
+def test_invalidate_after_in_place_change():
+    conf = DotListConfig({'a': {'b': 1}})
+    child = conf['a']
+    assert conf['a.b'].data == 1
+    conf.data['a']['b'] = 2
+    child.invalidate()
+    assert conf['a.b'].data == 2
+
+
+def test_child_pickled_without_parent():
+    conf = DotListConfig({'a': {'b': 1}, 'large': list(range(1000))})
+    child = pickle.loads(pickle.dumps(conf['a']))
+    assert child.data == {'b': 1}
+    assert child['b'].data == 1
+
+
+DEFAULTS = {'model': {'depth': 2, 'layers': [8, 4], 'name': 'net'}, 'lr': 0.1}
+LAYERS = [
+    {'model': {'depth': 3}},
+    {'model': {'layers': [2]}, 'seed': 1},
+    {'model': {'name': 'resnet', 'extra': {'a': 1}}, 'lr': 0.5},
+    {'model': 'replaced'},
+]
+
+
+@pytest.mark.parametrize('count', range(1, len(LAYERS) + 1))
+def test_layered_precedence_matches_add(count):
+    layers = [DEFAULTS] + LAYERS[:count]
+    added = DotListConfig(layers[0])
+    for layer in layers[1:]:
+        added = added + DotListConfig(layer)
+
+    layered = LayeredConfig(layers)
+    assert layered.data == added.data
+    assert sorted(LayeredConfig(layers).keys()) == sorted(added.keys())
+
+
+def test_layered_lookups_match_add():
+    layers = [DEFAULTS] + LAYERS[:3]
+    added = DotListConfig(layers[0])
+    for layer in layers[1:]:
+        added = added + DotListConfig(layer)
+
+    layered = LayeredConfig(layers)
+    for key in added.keys():
+        assert layered[key].data == added[key].data, key
+    assert layered['model'].data == added['model'].data
+
+
+def test_layered_is_copy_on_write():
+    defaults = {'model': {'depth': 2, 'layers': [8]}}
+    layered = LayeredConfig([defaults, {'model': {'layers': [4]}}])
+    layered['model.depth'] = 5
+    assert layered['model.depth'].data == 5
+    assert layered['model.layers'].data == [8, 4]
+    assert defaults == {'model': {'depth': 2, 'layers': [8]}}
+
+
+def test_writes_through_children_leave_layers_unchanged():
+    defaults = {'model': {'depth': 2, 'layers': [8]}}
+    layered = LayeredConfig([defaults, {'lr': 1}])
+    model = layered['model']
+    model['depth'] = 5
+    assert model['depth'].data == 5
+    assert layered['model.depth'].data == 5
+    assert defaults == {'model': {'depth': 2, 'layers': [8]}}
+
+    single = LayeredConfig([defaults])
+    single['model']['depth'] = 6
+    assert single.data == {'model': {'depth': 6, 'layers': [8]}}
+    assert defaults == {'model': {'depth': 2, 'layers': [8]}}
+
+
+def test_writes_leave_config_groups_unchanged(tmp_path):
+    (tmp_path / 'loss.yaml').write_text('threads: 1\nmse:\n  alpha: 0.5\n')
+    conf = resolve_config_group('loss', {'threads': 2}, root=str(tmp_path))
+    conf['mse']['alpha'] = 999
+    conf.merge({'mse': {'beta': 1}})
+    assert conf['mse'].data == {'alpha': 999, 'beta': 1}
+    conf = resolve_config_group('loss', {'threads': 3}, root=str(tmp_path))
+    assert conf.data == {'threads': 3, 'mse': {'alpha': 0.5}}
@@ -0,0 +1,76 @@
+import os
+import stat
+import subprocess
+import sys
+import time
+
+import pytest
+
+import multiplex.daemon
+from multiplex import default_socket_path, run_client
+
+PROGRAM = '''import argparse
+import os
+import sys
+from multiplex import register_entrypoint, register_parser
+
+
+@register_parser
+def get_parser(parents):
+    parser = argparse.ArgumentParser(parents=parents)
+    parser.add_argument("--epochs", type=int, default=1)
+    return parser
+
+
+@register_entrypoint
+def main(args):
+    print(f"epochs={args.epochs} cwd={os.getcwd()} env={os.environ.get('RUN_NAME')}")
+    sys.exit(args.epochs)
+'''
+
+SERVE = 'import sys; from multiplex import Multiplexor; Multiplexor(sys.argv[1], cache=False).serve(sys.argv[2])'
+
+
+@pytest.fixture
+def server(tmp_path):
+    (tmp_path / 'train.py').write_text(PROGRAM)
+    (tmp_path / 'main.yaml').write_text(f'subprograms:\n  train: {tmp_path / "train.py"}\n')
+    socket_path = str(tmp_path / 'launcher.sock')
+    process = subprocess.Popen([sys.executable, '-c', SERVE, str(tmp_path / 'main.yaml'), socket_path])
+    try:
+        deadline = time.monotonic() + 10
+        while not os.path.exists(socket_path):
+            assert process.poll() is None and time.monotonic() < deadline, 'the server did not start'
+            time.sleep(0.05)
+        yield socket_path
+    finally:
+        process.terminate()
+        process.wait(10)
+
+
+def test_run_through_server(server, tmp_path, monkeypatch, capfd):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('RUN_NAME', 'first')
+    assert run_client(['train', '--epochs', '3'], socket_path=server) == 3
+    assert capfd.readouterr().out == f'epochs=3 cwd={tmp_path} env=first\n'
+    assert not os.stat(server).st_mode & 0o077
+
+
+def test_client_checks_the_server_user(server, monkeypatch, capfd):
+    monkeypatch.setattr(multiplex.daemon, '_peer_uid', lambda sock: os.getuid() + 1)
+    with pytest.raises(ConnectionRefusedError):
+        run_client(['train'], socket_path=server)
+    assert capfd.readouterr().out == ''
+
+
+def test_default_socket_path_is_private(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmp_path))
+    path = default_socket_path()
+    directory = os.path.dirname(path)
+    assert directory == str(tmp_path / f'multiplex-{os.getuid()}')
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+    assert default_socket_path() == path
+
+    os.chmod(directory, 0o755)
+    with pytest.raises(PermissionError):
+        default_socket_path()
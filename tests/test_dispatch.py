@@ -0,0 +1,73 @@
+import pytest
+
+from multiplex import DispatchTrie, Multiplexor
+
+SUBPROGRAMS = {
+    'test': 'test.py',
+    'model': {
+        'train': {'local': 'model/train.py', 'distributed': 'model/distributed.py'},
+        'eval': 'model/eval.py',
+    },
+}
+
+PROGRAM = '''import argparse
+from multiplex import register_entrypoint, register_parser
+
+
+@register_parser
+def get_parser(parents):
+    parser = argparse.ArgumentParser(parents=parents)
+    parser.add_argument("--epochs", type=int, default=1)
+    return parser
+
+
+@register_entrypoint
+def main(args):
+    return args
+'''
+
+
+def test_compile():
+    trie = DispatchTrie(SUBPROGRAMS)
+    assert trie.leaves() == {('test',): 'test.py', ('model', 'train', 'local'): 'model/train.py',
+                             ('model', 'train', 'distributed'): 'model/distributed.py',
+                             ('model', 'eval'): 'model/eval.py'}
+    assert list(trie.iter_commands()) == [('test',), ('model',), ('model', 'train'), ('model', 'train', 'local'),
+                                          ('model', 'train', 'distributed'), ('model', 'eval')]
+    assert trie.get(('model', 'train')).children.keys() == {'local', 'distributed'}
+    assert trie.get(('model', 'eval')).is_leaf
+    with pytest.raises(KeyError):
+        trie.get(('test', 'more'))
+
+
+@pytest.mark.parametrize('subprograms', [{'test': 1}, {'model': {}}, {'model': {'train': None}}])
+def test_invalid(subprograms):
+    with pytest.raises(ValueError, match='Invalid subprogram'):
+        DispatchTrie(subprograms)
+
+
+def test_walk():
+    trie, parsers = DispatchTrie(SUBPROGRAMS), {}
+    node, args = trie.walk('model', ['train', 'local', '--epochs', '3'], 'prog', parsers=parsers)
+    assert node.path == 'model/train.py' and args == ['--epochs', '3']
+    assert sorted(parsers) == ['group model', 'group model train']
+    node, args = trie.walk('test', ['-h'], 'prog')
+    assert node.path == 'test.py' and args == ['-h']
+
+
+def test_walk_invalid_command(capsys):
+    with pytest.raises(SystemExit) as info:
+        DispatchTrie(SUBPROGRAMS).walk('model', ['train', 'remote'], 'prog')
+    assert info.value.code == 2
+    assert "invalid choice: 'remote'" in capsys.readouterr().err
+
+
+def test_only_selected_leaf_imported(tmp_path):
+    (tmp_path / 'local.py').write_text(PROGRAM)
+    (tmp_path / 'broken.py').write_text('raise RuntimeError("imported")\n')
+    (tmp_path / 'main.yaml').write_text(f'subprograms:\n  model:\n    train:\n      local: {tmp_path / "local.py"}\n'
+                                        f'      broken: {tmp_path / "broken.py"}\n')
+    args, subprogram = Multiplexor(str(tmp_path / 'main.yaml'), cache=False).parse_args(
+        ['model', 'train', 'local', '--epochs', '3'])
+    assert args.epochs == 3
+    assert subprogram.__file__ == str(tmp_path / 'local.py')
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from multiplex import Multiplexor
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'examples')
+
+ARGVS = {
+    'calculator.yaml': [
+        ['add', '1', '2'],
+        ['mod', '-3.5', '2'],
+        ['div', '1', '2'],
+        ['add', '1'],
+        ['add', 'x', '2'],
+    ],
+    'mnist/train.yaml': [
+        [],
+        ['--epochs', '3', '--batch-size=32'],
+        ['--save-model', '--log-interval', '5'],
+        ['--throughput.enabled', 'true', '--throughput.num_workers', '2', '--throughput.compile', 'script'],
+        ['--throughput.compile', 'jit'],
+        ['--epochs', 'x'],
+        ['--unknown'],
+    ],
+    'sample/train.yaml': [
+        [],
+        ['-s', '-1', '-e', '5', '-v'],
+        ['--load=model.pth', '--model', 'resnet'],
+        ['-s', '2'],
+        ['-e'],
+    ],
+    'sample/sample_ML_config.yaml': [
+        [],
+        ['log.txt', '-v'],
+        ['-s', '1', '--cpu.threads', '4', '--cpu.banner', 'hello'],
+        ['a', 'b'],
+    ],
+}
+
+
+def _resolve(path, engine, argv):
+    try:
+        return Multiplexor(path, engine=engine, cache=False).get_conf(args=argv).data
+    except SystemExit as e:
+        return SystemExit, e.code
+
+
+@pytest.mark.parametrize('name,argv', [(name, argv) for name, argvs in ARGVS.items() for argv in argvs])
+def test_fast_parser_matches_argparse(name, argv, capsys):
+    path = os.path.join(EXAMPLES, name)
+    expected = _resolve(path, 'argparse', argv)
+    expected_output = capsys.readouterr()
+    assert _resolve(path, 'fast', argv) == expected
+    assert capsys.readouterr() == expected_output
+
+
+@pytest.mark.parametrize('name', sorted(ARGVS))
+def test_fast_parser_help_matches_argparse(name, capsys):
+    path = os.path.join(EXAMPLES, name)
+    assert _resolve(path, 'argparse', ['-h']) == (SystemExit, 0)
+    expected = capsys.readouterr().out
+    assert _resolve(path, 'fast', ['-h']) == (SystemExit, 0)
+    assert capsys.readouterr().out == expected
@@ -0,0 +1,29 @@
+import importlib
+import subprocess
+import sys
+
+import pytest
+
+import multiplex
+
+HEAVY_MODULES = ('asyncio', 'concurrent.futures', 'multiprocessing', 'socket', 'sqlite3', 'tempfile', 'yaml')
+
+
+def test_import_is_light():
+    code = f'import sys, multiplex; print(" ".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))'
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    assert output.split() == []
+
+
+@pytest.mark.parametrize('module', sorted(multiplex._LAZY_EXPORTS))
+def test_lazy_exports(module):
+    names = importlib.import_module(f'multiplex.{module}').__all__
+    assert tuple(names) == multiplex._LAZY_EXPORTS[module]
+    for name in names:
+        assert getattr(multiplex, name) is getattr(importlib.import_module(f'multiplex.{module}'), name)
+        assert name in dir(multiplex)
+
+
+def test_unknown_attribute():
+    with pytest.raises(AttributeError):
+        multiplex.does_not_exist
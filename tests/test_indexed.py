@@ -0,0 +1,74 @@
+import pickle
+
+import pytest
+import yaml
+
+import multiplex.indexed
+from multiplex import DotListConfig, LazyMapping, Multiplexor, compile_config, load_config, materialize
+
+DATA = {'lr': 0.1, 'model': {'depth': 2, 'layers': [8, 4], 'in': None}, 'vocab': {f'w{i}': i for i in range(100)}}
+
+
+@pytest.fixture
+def indexed(tmp_path):
+    path = tmp_path / 'conf.yaml'
+    path.write_text(yaml.safe_dump(DATA))
+    return compile_config(str(path), indexed=True)
+
+
+@pytest.fixture
+def decoded(monkeypatch):
+    """Offsets of the values decoded, mappings excluded"""
+    offsets = []
+    original = multiplex.indexed.decode
+
+    def decode(buffer, kind, offset, length, source=None):
+        if kind == multiplex.indexed.VALUE:
+            offsets.append(offset)
+        return original(buffer, kind, offset, length, source=source)
+
+    monkeypatch.setattr(multiplex.indexed, 'decode', decode)
+    return offsets
+
+
+def test_lookups(indexed, decoded):
+    data = load_config(indexed)
+    assert isinstance(data, LazyMapping)
+    assert data['model']['depth'] == 2
+    assert data.lookup(['vocab', 'w42']) == 42
+    assert len(decoded) == 2
+    assert 'lr' in data and 'missing' not in data
+    with pytest.raises(KeyError):
+        data['missing']
+    assert sorted(data) == ['lr', 'model', 'vocab']
+    assert len(data['vocab']) == 100
+    assert materialize(data) == DATA
+
+
+def test_without(indexed):
+    data = load_config(indexed)
+    view = data.without(['vocab'])
+    assert sorted(view) == ['lr', 'model'] and len(view) == 2
+    assert 'vocab' not in view
+    assert view['model'] is data['model']
+
+
+def test_pickled_as_a_reference(indexed):
+    data = load_config(indexed)['model']
+    assert len(pickle.dumps(data)) < 200
+    assert materialize(pickle.loads(pickle.dumps(data))) == DATA['model']
+
+
+def test_config_is_read_only(indexed):
+    conf = DotListConfig(load_config(indexed))
+    assert conf['model.layers'].data == [8, 4]
+    with pytest.raises(TypeError, match='read-only'):
+        conf['lr'] = 1
+
+
+def test_program_loads_without_decoding(indexed, decoded):
+    multiplexor = Multiplexor(indexed, cache=False)
+    assert decoded == []
+    conf = multiplexor.get_conf(args=['--model.depth', '3', '--vocab.w1', '5'])
+    assert conf['model.depth'].data == 3
+    assert conf['vocab.w1'].data == 5 and conf['vocab.w2'].data == 2
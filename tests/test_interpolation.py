@@ -0,0 +1,107 @@
+import pickle
+
+import pytest
+
+import multiplex.indexed
+from multiplex import InterpolationError, Interpolator, Multiplexor, compile_config, interpolate
+
+CONFIG = """
+root: /data
+run: exp
+log_dir: ${root}/${run}
+conv:
+  out: 16
+fc:
+  in: ${conv.out * 4}
+  out: ${fc.in // 2}
+escaped: $${root}
+"""
+TEMPLATES = {'log_dir': '${root}/${run}', 'fc.in': '${conv.out * 4}', 'fc.out': '${fc.in // 2}', 'escaped': '$${root}'}
+
+
+def _texts(interpolator):
+    return {key: template.text for key, template in interpolator.templates.items()}
+
+
+def test_resolve():
+    conf = interpolate({'a': 2, 'b': '${a * 3}', 'c': 'x-${b}', 'd': {'e': '${c}'}})
+    assert conf.data == {'a': 2, 'b': 6, 'c': 'x-6', 'd': {'e': 'x-6'}}
+
+
+@pytest.mark.parametrize('config', [
+    {'a': '${a}'},
+    {'a': '${b}', 'b': '${a}'},
+    {'a': '${b}', 'b': {'c': '${d}'}, 'd': '${b.c}'},
+])
+def test_cycle(config):
+    with pytest.raises(InterpolationError, match='cycle'):
+        Interpolator.from_config(config)
+
+
+def test_missing_reference():
+    with pytest.raises(InterpolationError) as info:
+        interpolate({'a': '${nope}', 'b': '${a}'})
+    assert 'a' in info.value.errors
+
+
+def test_cycle_in_config_fails_on_load(tmp_path):
+    path = tmp_path / 'cycle.yaml'
+    path.write_text('a: ${b}\nb: ${a}\n')
+    with pytest.raises(InterpolationError, match='cycle'):
+        Multiplexor(str(path), cache=False)
+
+
+def test_overrides_only_recompute_downstream(tmp_path):
+    path = tmp_path / 'conf.yaml'
+    path.write_text(CONFIG)
+    conf = Multiplexor(str(path), cache=False).get_conf(args=['--conv.out', '8', '--run', 'b'])
+    assert conf.data == {'root': '/data', 'run': 'b', 'log_dir': '/data/b', 'conv': {'out': 8},
+                         'fc': {'in': 32, 'out': 16}, 'escaped': '${root}'}
+
+
+@pytest.mark.parametrize('override', ['${log_dir}', '${missing}'])
+def test_invalid_override_is_a_parser_error(tmp_path, capsys, override):
+    path = tmp_path / 'conf.yaml'
+    path.write_text(CONFIG)
+    with pytest.raises(SystemExit) as info:
+        Multiplexor(str(path), cache=False).get_conf(args=['--root', override])
+    assert info.value.code == 2
+    assert 'invalid interpolations' in capsys.readouterr().err
+
+
+def test_cached_graph(tmp_path):
+    path = tmp_path / 'conf.yaml'
+    path.write_text(CONFIG)
+    cache_dir = str(tmp_path / 'cache')
+    cold = Multiplexor(str(path), cache=cache_dir)
+    warm = Multiplexor(str(path), cache=cache_dir)
+    assert _texts(warm.interpolator) == _texts(cold.interpolator) == TEMPLATES
+    assert warm.get_conf(args=['--run', 'c']).data == cold.get_conf(args=['--run', 'c']).data
+
+
+def test_pickled_without_defaults():
+    interpolator = Interpolator.from_config({'a': 1, 'b': '${a + 1}', 'large': list(range(1000))})
+    restored = pickle.loads(pickle.dumps(interpolator))
+    assert restored.defaults is None
+    assert _texts(restored) == _texts(interpolator)
+    restored.defaults = interpolator.defaults
+    assert restored.interpolate(interpolator.defaults).data['b'] == 2
+
+
+def test_indexed_config_only_decodes_templates(tmp_path, monkeypatch):
+    path = tmp_path / 'conf.yaml'
+    path.write_text(CONFIG + ''.join(f'vocab{i}: word{i}\n' for i in range(100)))
+    compiled = compile_config(str(path), indexed=True)
+    decoded = []
+
+    def decode(buffer, kind, offset, length, source=None):
+        if kind == multiplex.indexed.VALUE:
+            decoded.append(offset)
+        return original(buffer, kind, offset, length, source=source)
+
+    original = multiplex.indexed.decode
+    monkeypatch.setattr(multiplex.indexed, 'decode', decode)
+    multiplexor = Multiplexor(compiled, cache=False)
+    assert len(decoded) == 4
+    assert _texts(multiplexor.interpolator) == TEMPLATES
+    assert multiplexor.get_conf(args=['--run', 'b'])['log_dir'].data == '/data/b'
@@ -0,0 +1,83 @@
+import subprocess
+import sys
+import time
+
+import pytest
+
+from multiplex import JobQueue, Multiplexor, ParserError, Worker
+
+PROGRAM = '''import argparse
+from multiplex import register_entrypoint, register_parser
+
+
+@register_parser
+def get_parser(parents):
+    parser = argparse.ArgumentParser(parents=parents)
+    parser.add_argument("--epochs", type=int, default=1)
+    return parser
+
+
+@register_entrypoint
+def main(args):
+    if args.epochs < 0:
+        raise ValueError("negative epochs")
+    return args.epochs * 2
+'''
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    (tmp_path / 'train.py').write_text(PROGRAM)
+    (tmp_path / 'main.yaml').write_text(f'subprograms:\n  train: {tmp_path / "train.py"}\n')
+    return str(tmp_path / 'main.yaml')
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / 'jobs.db'), lease=0.5)
+
+
+def test_submit_and_run(config_path, queue):
+    multiplexor = Multiplexor(config_path, cache=False)
+    ids = queue.submit(multiplexor, [['train', '--epochs', '3'], ['train'], ['train', '--epochs', '-1']])
+    assert queue.counts() == {'pending': 3}
+
+    assert Worker(queue, name='worker').run(drain=True) == 3
+    jobs = [queue.get(job_id) for job_id in ids]
+    assert [job.status for job in jobs] == ['done', 'done', 'failed']
+    assert [job.get_result() for job in jobs[:2]] == [6, 2]
+    assert 'negative epochs' in jobs[2].error
+    assert all(job.worker == 'worker' and job.duration >= 0 for job in jobs)
+
+
+def test_invalid_submit_enqueues_nothing(config_path, queue):
+    multiplexor = Multiplexor(config_path, cache=False)
+    with pytest.raises(ParserError, match='invalid int value'):
+        queue.submit(multiplexor, [['train'], ['train', '--epochs', 'x']])
+    assert queue.jobs() == []
+
+
+def test_expired_lease_is_claimed_again(config_path, queue):
+    [job_id] = queue.submit(Multiplexor(config_path, cache=False), [['train']], max_attempts=2)
+    assert queue.claim('dead').id == job_id
+    assert queue.claim('other') is None
+
+    time.sleep(0.6)
+    job = queue.claim('other')
+    assert (job.id, job.attempts) == (job_id, 2)
+    # The first worker lost its job, its result is ignored
+    assert not queue.finish(job_id, 'dead', result=1)
+
+    time.sleep(0.6)
+    assert queue.claim('third') is None
+    assert queue.get(job_id).status == 'failed'
+
+
+def test_submit_command(config_path, tmp_path):
+    command = [sys.executable, '-m', 'multiplex', 'submit', str(tmp_path / 'jobs.db'), config_path, 'train']
+    invalid = subprocess.run(command + ['--epochs', 'x'], capture_output=True, text=True)
+    assert invalid.returncode == 2
+    assert 'invalid int value' in invalid.stderr and 'Traceback' not in invalid.stderr
+
+    subprocess.run(command + ['--epochs', '2'], capture_output=True, check=True)
+    assert [job.status for job in JobQueue(str(tmp_path / 'jobs.db')).jobs()] == ['pending']
@@ -0,0 +1,109 @@
+import os
+
+from multiplex import FastParser, LazySubprogram, Multiplexor, discover_module, extract_parser_getter
+
+# Importing the module leaves a trace, to check whether it was imported
+TRACE = '''import os
+open(os.path.join(os.path.dirname(__file__), "imported"), "w").close()
+'''
+
+LIGHT = TRACE + '''import argparse
+from multiplex import register_entrypoint, register_parser
+
+
+@register_parser
+def get_parser(parents):
+    parser = argparse.ArgumentParser(parents=parents)
+    parser.add_argument("--epochs", type=int, default=1)
+    return parser
+
+
+@register_entrypoint
+def main(args):
+    return args
+'''
+
+# The parser depends on a module that can't be imported statically
+HEAVY = TRACE + '''import argparse
+import helper
+from multiplex import register_entrypoint, register_parser
+
+
+@register_parser
+def get_parser(parents):
+    parser = argparse.ArgumentParser(parents=parents)
+    parser.add_argument(helper.OPTION, type=int, default=1)
+    return parser
+
+
+@register_entrypoint
+def main(args):
+    return args
+'''
+
+# No registered parser, it is generated from the sidecar config
+NO_PARSER = TRACE + '''from multiplex import register_entrypoint
+
+
+@register_entrypoint
+def main(args):
+    return args
+'''
+
+
+def _write_program(directory, source, sidecar=None):
+    directory.mkdir()
+    (directory / 'train.py').write_text(source)
+    (directory / 'helper.py').write_text('OPTION = "--steps"\n')
+    if sidecar is not None:
+        (directory / 'train.yaml').write_text(sidecar)
+    (directory / 'main.yaml').write_text(f'subprograms:\n  train: {directory / "train.py"}\n')
+    return str(directory / 'main.yaml')
+
+
+def _imported(directory):
+    return os.path.exists(directory / 'imported')
+
+
+def test_static_parser(tmp_path):
+    multiplexor = Multiplexor(_write_program(tmp_path / 'program', LIGHT), cache=False, lazy=True)
+    args, subprogram = multiplexor.parse_args(['train', '--epochs', '3'])
+    assert args.epochs == 3
+    assert isinstance(subprogram, LazySubprogram)
+    assert not _imported(tmp_path / 'program')
+
+
+def test_registered_parser_takes_precedence_over_sidecar(tmp_path, monkeypatch):
+    directory = tmp_path / 'program'
+    monkeypatch.syspath_prepend(str(directory))
+    multiplexor = Multiplexor(_write_program(directory, HEAVY, sidecar='lr: 0.1\n'), cache=False, lazy=True)
+    assert extract_parser_getter(str(directory / 'train.py')) is None
+    args, _ = multiplexor.parse_args(['train', '--steps', '3'])
+    assert args.steps == 3 and not hasattr(args, 'lr')
+    assert _imported(directory)
+
+
+def test_sidecar_parser_with_parent_options(tmp_path):
+    directory = tmp_path / 'program'
+    main = _write_program(directory, NO_PARSER, sidecar='model:\n  depth: 2\n')
+    cache_dir = tmp_path / 'cache'
+    multiplexor = Multiplexor(main, cache=str(cache_dir), lazy=True, engine='fast')
+    args, subprogram = multiplexor.parse_args(['train', '--model.depth', '4'])
+    assert vars(args)['model.depth'] == 4
+    assert isinstance(subprogram.get_parser(parents=[]), FastParser)
+    # The program's config and the sidecar config
+    assert len(os.listdir(cache_dir)) == 2
+    assert not _imported(directory)
+
+
+def test_discovery_follows_modifications(tmp_path):
+    path = tmp_path / 'train.py'
+    path.write_text(NO_PARSER)
+    _, registered = discover_module(str(path))
+    assert registered['parser'] is None and registered['entrypoint'] is not None
+    assert discover_module(str(path))[1] is registered
+
+    path.write_text(LIGHT)
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+    assert discover_module(str(path))[1]['parser'] is not None
+    assert discover_module(str(tmp_path / 'missing.py')) == (None, None)
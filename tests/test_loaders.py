@@ -0,0 +1,83 @@
+import os
+import tempfile
+import warnings
+
+import pytest
+
+import multiplex.loaders
+from multiplex import Multiplexor, compile_config, find_config, load_compiled, load_config, materialize
+
+
+@pytest.fixture
+def program(tmp_path):
+    (tmp_path / 'train.py').write_text('')
+    (tmp_path / 'train.yaml').write_text('lr: 0.1\nmodel:\n  depth: 2\n')
+    return str(tmp_path / 'train.py')
+
+
+def _no_load(path):
+    raise AssertionError(f'{path} was loaded despite being compiled')
+
+
+def _read_only(*args, **kwargs):
+    raise PermissionError('read-only directory')
+
+
+def test_find_config(program, tmp_path):
+    assert find_config(program) == str(tmp_path / 'train.yaml')
+    assert find_config(str(tmp_path / 'train.yaml')) == str(tmp_path / 'train.yaml')
+    assert find_config(str(tmp_path / 'other.py')) is None
+
+
+def test_compiled_config_is_preferred(program, tmp_path):
+    compiled = compile_config(str(tmp_path / 'train.yaml'))
+    assert compiled == str(tmp_path / 'train.mpx')
+    assert find_config(program) == compiled
+    assert load_compiled(compiled) == load_config(str(tmp_path / 'train.yaml')) == {'lr': 0.1, 'model': {'depth': 2}}
+
+
+def test_find_config_by_priority(tmp_path):
+    program = str(tmp_path / 'train.py')
+    (tmp_path / 'train.json').write_text('{}')
+    assert find_config(program) == str(tmp_path / 'train.json')
+    (tmp_path / 'train.yaml').mkdir()
+    assert find_config(program) == str(tmp_path / 'train.json')
+    (tmp_path / 'train.mpxi').write_text('')
+    (tmp_path / 'train-other.mpx').write_text('')
+    assert find_config(program) == str(tmp_path / 'train.mpxi')
+    assert find_config(str(tmp_path / 'missing' / 'train.py')) is None
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_outdated_compiled_config_is_recompiled(program, tmp_path, monkeypatch, indexed):
+    compiled = compile_config(str(tmp_path / 'train.yaml'), indexed=indexed)
+    (tmp_path / 'train.yaml').write_text('lr: 0.5\n')
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        assert materialize(load_config(compiled)) == {'lr': 0.5}
+
+    # The source isn't loaded again
+    monkeypatch.setitem(multiplex.loaders.LOADERS, 'yaml', _no_load)
+    assert materialize(load_config(compiled)) == {'lr': 0.5}
+
+
+def test_outdated_compiled_config_that_cannot_be_rewritten(program, tmp_path, monkeypatch):
+    compiled = compile_config(str(tmp_path / 'train.yaml'))
+    (tmp_path / 'train.yaml').write_text('lr: 0.5\n')
+    monkeypatch.setattr(tempfile, 'mkstemp', _read_only)
+    with pytest.warns(UserWarning, match='out of date'):
+        assert load_config(compiled) == {'lr': 0.5}
+
+
+def test_inline_yaml_with_config_extension():
+    conf = Multiplexor('file: conf.yaml', cache=False).get_conf(args=[])
+    assert conf.data == {'file': 'conf.yaml'}
+    with pytest.raises(FileNotFoundError):
+        Multiplexor('missing.yaml', cache=False)
+
+
+def test_program_without_config(tmp_path):
+    (tmp_path / 'train.py').write_text('')
+    with pytest.raises(FileNotFoundError):
+        Multiplexor(str(tmp_path / 'train.py'), cache=False)
+    assert not os.path.exists(tmp_path / 'train.mpx')
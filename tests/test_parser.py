@@ -0,0 +1,122 @@
+import asyncio
+import pickle
+
+import pytest
+
+from multiplex import InterpolationError, Multiplexor, ParserError
+
+PROGRAM = '''import argparse
+from multiplex import register_entrypoint, register_parser
+
+
+@register_parser
+def get_parser(parents):
+    parser = argparse.ArgumentParser(parents=parents)
+    parser.add_argument("--{option}", type=int, default=1)
+    return parser
+
+
+@register_entrypoint
+def main(args):
+    return args
+'''
+
+
+def _write_program(directory, option):
+    """A program with a `train` subprogram, whose parser has a single `option`"""
+    directory.mkdir()
+    (directory / 'train.py').write_text(PROGRAM.format(option=option))
+    (directory / 'main.yaml').write_text(f'subprograms:\n  train: {directory / "train.py"}\n')
+    return str(directory / 'main.yaml')
+
+
+def test_registries_are_scoped(tmp_path):
+    first = Multiplexor(_write_program(tmp_path / 'first', 'epochs'), cache=False)
+    second = Multiplexor(_write_program(tmp_path / 'second', 'steps'), cache=False)
+    args, subprogram = first.parse_args(['train', '--epochs', '2'])
+    assert args.epochs == 2 and not hasattr(args, 'steps')
+    args, other = second.parse_args(['train', '--steps', '3'])
+    assert args.steps == 3 and not hasattr(args, 'epochs')
+    assert subprogram is not other
+
+
+def test_async(tmp_path):
+    multiplexor = Multiplexor(_write_program(tmp_path / 'program', 'epochs'), cache=False)
+    leaf = Multiplexor('lr: 0.1\n', cache=False)
+
+    async def resolve():
+        return await asyncio.gather(multiplexor.parse_args_async(['train', '--epochs', '4']),
+                                    leaf.get_conf_async(args=['--lr', '0.5']))
+
+    (args, _), conf = asyncio.run(resolve())
+    assert args.epochs == 4
+    assert conf.data == {'lr': 0.5}
+
+
+CONFIG = """
+argparse:
+  arguments:
+    - name_or_flags: ["--epochs"]
+      type: int
+      default: 10
+lr: 0.1
+name: run-${lr}
+"""
+
+
+@pytest.fixture
+def multiplexor(tmp_path):
+    path = tmp_path / 'train.yaml'
+    path.write_text(CONFIG)
+    return Multiplexor(str(path), cache=False)
+
+
+ARGVS = [
+    ['--epochs', '3'],
+    ['--epochs', 'x'],
+    ['--lr', '0.5'],
+    ['--unknown'],
+    ['--name', '${missing}'],
+    [],
+]
+
+
+def _check_results(results):
+    assert [result.data if not isinstance(result, BaseException) else type(result) for result in results] == [
+        {'epochs': 3, 'lr': 0.1, 'name': 'run-0.1'},
+        ParserError,
+        {'epochs': 10, 'lr': 0.5, 'name': 'run-0.5'},
+        ParserError,
+        ParserError,
+        {'epochs': 10, 'lr': 0.1, 'name': 'run-0.1'},
+    ]
+    assert 'invalid int value' in results[1].message
+    assert 'unrecognized arguments: --unknown' in results[3].message
+    assert 'missing reference' in results[4].message
+
+
+def test_resolve_many_aggregates_errors(multiplexor):
+    _check_results(multiplexor.resolve_many(ARGVS))
+
+
+def test_resolve_many_workers(multiplexor):
+    _check_results(multiplexor.resolve_many(ARGVS, workers=2, chunk_size=2))
+
+
+def test_parser_error_pickles():
+    error = pickle.loads(pickle.dumps(ParserError('prog', 'argument --a: invalid')))
+    assert (error.prog, error.message) == ('prog', 'argument --a: invalid')
+
+
+def test_parse_many(tmp_path):
+    multiplexor = Multiplexor(_write_program(tmp_path / 'program', 'epochs'), cache=False)
+    results = multiplexor.parse_many([['train', '--epochs', '2'], ['train', '--epochs', 'x'], ['other']])
+    namespace, subprogram = results[0]
+    assert namespace.epochs == 2 and subprogram.__name__ == 'train'
+    assert isinstance(results[1], ParserError) and 'invalid int value' in results[1].message
+    assert isinstance(results[2], ParserError)
+
+
+def test_cycle_in_inline_config():
+    with pytest.raises(InterpolationError):
+        Multiplexor('a: ${b}\nb: ${a}\n', cache=False)
@@ -0,0 +1,100 @@
+import atexit
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import multiplex.profiling
+from multiplex import Profiler, configure_profiling, profile_phase
+
+PROGRAM = '''from multiplex import Multiplexor
+
+conf = Multiplexor("lr: 0.1\\n", cache=False).get_conf()
+print(conf["lr"].data)
+'''
+
+
+@pytest.fixture
+def reports(monkeypatch):
+    """The reports registered to be written at exit, profiling being disabled again afterwards"""
+    registered, register = [], atexit.register
+
+    def register_report(fn, *args):
+        if isinstance(getattr(fn, '__self__', None), Profiler):
+            registered.append((fn, args))
+        else:
+            register(fn, *args)
+
+    monkeypatch.setattr(multiplex.profiling, 'PROFILER', None)
+    monkeypatch.setattr(atexit, 'register', register_report)
+    return registered
+
+
+def test_nested_phases():
+    profiler = Profiler()
+    for _ in range(2):
+        with profiler.phase('load'):
+            with profiler.phase('parse'):
+                pass
+    with profiler.phase('resolve'):
+        pass
+    assert list(profiler.records) == [('load',), ('load', 'parse'), ('resolve',)]
+    assert profiler.records[('load',)][0] == 2
+    self_times = profiler._self_times()
+    assert self_times[('load',)] == pytest.approx(profiler.records[('load',)][1] - profiler.records[('load', 'parse')][1])
+    assert [line.rsplit(' ', 1)[0] for line in profiler.format_collapsed().splitlines()] == ['load', 'load;parse',
+                                                                                            'resolve']
+    table = profiler.format_table().splitlines()
+    assert table[0].split() == ['phase', 'calls', 'total', 'ms', 'self', 'ms', 'blocks']
+    assert table[2].startswith('  parse')
+
+
+def test_phases_per_thread():
+    profiler = Profiler()
+
+    def run():
+        with profiler.phase('thread'):
+            pass
+
+    with profiler.phase('main'):
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+    assert set(profiler.records) == {('main',), ('thread',)}
+
+
+def test_disabled(reports, monkeypatch):
+    monkeypatch.delenv('MULTIPLEX_PROFILE', raising=False)
+    assert profile_phase('load') is profile_phase('parse')
+    assert configure_profiling(['prog', '--lr', '1']) is None
+    assert reports == []
+
+
+def test_configured_by_flag(reports, tmp_path, monkeypatch):
+    monkeypatch.delenv('MULTIPLEX_PROFILE', raising=False)
+    argv = ['prog', f'--multiplex-profile=collapsed:{tmp_path / "out.folded"}', '--lr', '1']
+    profiler = configure_profiling(argv)
+    assert argv == ['prog', '--lr', '1']
+    assert reports == [(profiler.report, ('collapsed', str(tmp_path / 'out.folded')))]
+    with profile_phase('load'):
+        pass
+    profiler.report('collapsed', str(tmp_path / 'out.folded'))
+    assert (tmp_path / 'out.folded').read_text().startswith('load ')
+
+
+def test_configured_by_environment(reports, monkeypatch):
+    monkeypatch.setenv('MULTIPLEX_PROFILE', '1')
+    assert configure_profiling(['prog']) is not None
+    assert reports[0][1] == ('table', None)
+    with pytest.raises(ValueError, match='Unknown profile format'):
+        multiplex.profiling.enable_profiling('svg')
+
+
+def test_report_at_exit(tmp_path):
+    (tmp_path / 'train.py').write_text(PROGRAM)
+    result = subprocess.run([sys.executable, str(tmp_path / 'train.py'), '--multiplex-profile'], capture_output=True,
+                            text=True, check=True)
+    assert result.stdout == '0.1\n'
+    phases = [line[:50].strip() for line in result.stderr.splitlines()[1:]]
+    assert 'compile converters' in phases and 'interpolate' in phases
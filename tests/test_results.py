@@ -0,0 +1,106 @@
+import argparse
+import os
+
+import pytest
+
+from multiplex import DotListConfig, ResultCache, cache_results, canonical_hash
+
+
+def _counted(cache_dir, **kwargs):
+    calls = []
+
+    @cache_results(cache_dir=cache_dir, **kwargs)
+    def main(args):
+        calls.append(args)
+        if getattr(args, 'output_dir', None):
+            with open(os.path.join(args.output_dir, 'model.txt'), 'w') as f:
+                f.write(f'lr={args.lr}')
+        return {'loss': args.lr * 2}
+
+    return main, calls
+
+
+def test_canonical_hash():
+    assert canonical_hash({'a': 1, 'b': [1, 2]}) == canonical_hash(DotListConfig({'b': [1, 2], 'a': 1}))
+    assert canonical_hash({'a': 1}) != canonical_hash({'a': 1.0})
+    assert canonical_hash([1, 2]) != canonical_hash((1, 2))
+    with pytest.raises(TypeError):
+        canonical_hash(object())
+
+
+def test_cache_hit(tmp_path):
+    main, calls = _counted(str(tmp_path / 'cache'))
+    assert main(argparse.Namespace(lr=0.5)) == {'loss': 1.0}
+    assert main(argparse.Namespace(lr=0.5)) == {'loss': 1.0}
+    assert main(argparse.Namespace(lr=0.25)) == {'loss': 0.5}
+    assert len(calls) == 2
+
+
+def test_artifacts_restored(tmp_path):
+    main, calls = _counted(str(tmp_path / 'cache'), artifacts=['{output_dir}/model.txt'])
+    output_dir = tmp_path / 'run'
+    output_dir.mkdir()
+    args = argparse.Namespace(lr=0.5, output_dir=str(output_dir))
+    main(args)
+    os.remove(output_dir / 'model.txt')
+    assert main(args) == {'loss': 1.0}
+    assert len(calls) == 1
+    assert (output_dir / 'model.txt').read_text() == 'lr=0.5'
+
+
+def test_inputs_are_part_of_the_key(tmp_path):
+    model = tmp_path / 'model.txt'
+    model.write_text('a')
+    main, calls = _counted(str(tmp_path / 'cache'), inputs=['model'])
+    args = argparse.Namespace(lr=0.5, model=str(model))
+    main(args)
+    main(args)
+    model.write_text('b')
+    main(args)
+    assert len(calls) == 2
+
+
+def test_unhashable_arguments_are_not_cached(tmp_path):
+    main, calls = _counted(str(tmp_path / 'cache'))
+    args = argparse.Namespace(lr=0.5, callback=object())
+    with pytest.warns(UserWarning, match='Not caching'):
+        main(args)
+    with pytest.warns(UserWarning, match='Not caching'):
+        main(args)
+    assert len(calls) == 2
+
+
+def test_exceptions_are_not_cached(tmp_path):
+    calls = []
+
+    @cache_results(cache_dir=str(tmp_path / 'cache'))
+    def fail(value):
+        calls.append(value)
+        raise ValueError(value)
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            fail(1)
+    assert len(calls) == 2
+
+
+def test_corrupted_entry_is_a_miss(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    cache.store('key', 1)
+    assert cache.load('key') == (True, 1)
+    with open(os.path.join(cache.entry_path('key'), 'result.pickle'), 'wb') as f:
+        f.write(b'not a pickle')
+    assert cache.load('key') == (False, None)
+
+
+def test_least_recently_used_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'), max_size=2500)
+    for key in ('a', 'b'):
+        cache.store(key, b'x' * 1000)
+    os.utime(os.path.join(cache.entry_path('a'), 'result.pickle'), ns=(0, 0))
+    cache.load('a')
+    cache.store('c', b'x' * 1000)
+    assert sorted(os.listdir(cache.cache_dir)) == ['a', 'c']
+    with pytest.warns(UserWarning, match='over the cache size'):
+        cache.store('d', b'x' * 3000)
+    assert not os.path.exists(cache.entry_path('d'))
@@ -0,0 +1,65 @@
+import gc
+import multiprocessing
+import os
+import pickle
+
+import pytest
+
+from multiplex import DotListConfig, SharedConfig, share_config
+
+DATA = {'lr': 0.1, 'model': {'depth': 2, 'layers': [8, 4]}, 'table': list(range(10000))}
+
+
+def _read(conf, key):
+    return conf[key].data, isinstance(conf, SharedConfig)
+
+
+def test_shared(tmp_path):
+    shared = share_config(DotListConfig(DATA), directory=str(tmp_path))
+    assert shared.is_owner
+    assert shared['model.depth'].data == 2
+    assert shared['table'].data[-1] == 9999
+    with pytest.raises(TypeError, match='read-only'):
+        shared['lr'] = 1
+
+
+def test_pickled_as_a_handle(tmp_path):
+    shared = share_config(DATA, directory=str(tmp_path))
+    handle = pickle.dumps(shared)
+    assert len(handle) < 500 < len(pickle.dumps(DATA))
+    attached = pickle.loads(handle)
+    assert not attached.is_owner
+    assert attached['model.layers'].data == [8, 4]
+
+
+def test_child_processes(tmp_path):
+    shared = share_config(DATA, directory=str(tmp_path))
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(2) as pool:
+        assert pool.starmap(_read, [(shared, 'lr'), (shared, 'model.depth')]) == [(0.1, True), (2, True)]
+
+
+def test_released(tmp_path):
+    shared = share_config(DATA, directory=str(tmp_path))
+    handle = pickle.dumps(shared)
+    attached = pickle.loads(handle)
+    with shared:
+        pass
+    assert os.listdir(tmp_path) == []
+    # Attached configs keep their mapping, but no new process can attach
+    assert attached['lr'].data == 0.1
+    with pytest.raises(FileNotFoundError, match='released'):
+        pickle.loads(handle)
+
+
+def test_released_when_collected(tmp_path):
+    share_config(DATA, directory=str(tmp_path))
+    gc.collect()
+    assert os.listdir(tmp_path) == []
+
+
+def test_replaced_segment(tmp_path):
+    shared = share_config(DATA, directory=str(tmp_path))
+    path, token = shared._path, shared._token
+    with pytest.raises(ValueError, match='changed'):
+        SharedConfig(path, token=b'\0' * len(token))
@@ -0,0 +1,53 @@
+import pickle
+
+import pytest
+
+from multiplex import DotListConfig, Struct, to_struct
+
+DATA = {'lr': 0.1, 'batch-size': 32, 'model': {'in': 3, 'layers': [8, 4]}}
+
+
+def test_attributes():
+    struct = to_struct(DotListConfig(DATA))
+    assert struct.lr == 0.1
+    assert struct.batch_size == 32
+    assert struct.model.in_ == 3
+    assert struct.model.layers == [8, 4]
+    assert isinstance(struct.model, Struct)
+    assert struct._asdict() == DATA
+    assert struct._as_config().data == DATA
+    assert to_struct(3) == 3
+
+
+def test_frozen():
+    struct = to_struct(DATA)
+    with pytest.raises(AttributeError):
+        struct.lr = 1
+    with pytest.raises(AttributeError):
+        del struct.model
+
+
+def test_classes_cached_by_shape():
+    first, second = to_struct(DATA), to_struct({**DATA, 'lr': 0.5})
+    assert type(first) is type(second)
+    assert first != second
+    assert type(to_struct({**DATA, 'lr': 1})) is not type(first)
+
+
+def test_pickled():
+    struct = to_struct(DATA)
+    assert pickle.loads(pickle.dumps(struct)) == struct
+
+
+@pytest.mark.parametrize('key', ['_fields', '_keys', '_values', '_asdict', '__eq__', '__class__'])
+def test_keys_clashing_with_struct_attributes(key):
+    struct = to_struct({key: 1, 'lr': 0.1})
+    assert getattr(struct, key + '_') == 1
+    assert struct._asdict() == {key: 1, 'lr': 0.1}
+    assert struct == to_struct({key: 1, 'lr': 0.1})
+    assert repr(struct) == f'Config({key}_=1, lr=0.1)'
+
+
+def test_keys_mapping_to_the_same_attribute():
+    with pytest.raises(ValueError, match='same attribute'):
+        to_struct({'batch-size': 1, 'batch_size': 2})
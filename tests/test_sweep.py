@@ -0,0 +1,93 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from multiplex import Multiplexor, expand_sweep, expand_sweep_args, get_run_name
+
+PROGRAM = '''import argparse
+from multiplex import register_entrypoint, register_parser
+
+
+@register_parser
+def get_parser(parents):
+    parser = argparse.ArgumentParser(parents=parents)
+    parser.add_argument("--epochs", type=int, default=1)
+    return parser
+
+
+@register_entrypoint
+def main(args):
+    return args.epochs, args.conf.data, args.output_dir
+'''
+
+MAIN_PROGRAM = '''import json
+import sys
+from multiplex import Multiplexor, register_entrypoint
+
+
+@register_entrypoint
+def main(args):
+    return args.epochs * 2
+
+
+if __name__ == "__main__":
+    results = Multiplexor(__file__, cache=False).sweep(workers=2)
+    print(json.dumps(results))
+'''
+
+MAIN_CONFIG = '''argparse:
+  arguments:
+    - name_or_flags: ["--epochs"]
+      type: int
+      default: 1
+'''
+
+
+def test_expand_sweep():
+    assert expand_sweep({'lr': [0.1, 0.01], 'gamma': 0.7}) == [{'lr': 0.1, 'gamma': 0.7}, {'lr': 0.01, 'gamma': 0.7}]
+    assert get_run_name(3, {'lr': 0.1, 'name': 'a/b'}) == '003-lr=0.1,name=a_b'
+
+
+def test_expand_sweep_args():
+    runs = expand_sweep_args(['train', '--epochs=1,2', '--seed', '3', '--layers=[8,4],[2]', '--name=a\\,b', '--',
+                              '--x=1,2'])
+    assert [point for point, _ in runs] == [{'epochs': '1', 'layers': '[8,4]', 'name': 'a,b'},
+                                            {'epochs': '1', 'layers': '[2]', 'name': 'a,b'},
+                                            {'epochs': '2', 'layers': '[8,4]', 'name': 'a,b'},
+                                            {'epochs': '2', 'layers': '[2]', 'name': 'a,b'}]
+    assert runs[1][1] == ['train', '--epochs=1', '--seed', '3', '--layers=[2]', '--name=a,b', '--', '--x=1,2']
+    assert expand_sweep_args(['train']) == [({}, ['train'])]
+
+
+def test_sweep_declared_options_and_overrides(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'train.py').write_text(PROGRAM)
+    (tmp_path / 'optim.yaml').write_text('lr: 0.1\n')
+    (tmp_path / 'main.yaml').write_text(f'subprograms:\n  train: {tmp_path / "train.py"}\n')
+    multiplexor = Multiplexor(str(tmp_path / 'main.yaml'), cache=False)
+    output_dir = str(tmp_path / 'runs')
+    results = multiplexor.sweep(['train', '--epochs=1,2', '--optim.lr=0.5,0.25'], workers=2, output_dir=output_dir)
+    assert [point for point, _ in results] == [{'epochs': '1', 'optim.lr': 0.5}, {'epochs': '1', 'optim.lr': 0.25},
+                                               {'epochs': '2', 'optim.lr': 0.5}, {'epochs': '2', 'optim.lr': 0.25}]
+    assert [result[:2] for _, result in results] == [(1, {'lr': 0.5}), (1, {'lr': 0.25}),
+                                                     (2, {'lr': 0.5}), (2, {'lr': 0.25})]
+    assert results[3][1][2] == os.path.join(output_dir, '003-epochs=2,optim.lr=0.25')
+    assert len(os.listdir(output_dir)) == 4
+
+
+def test_sweep_invalid_value(tmp_path):
+    (tmp_path / 'train.py').write_text(PROGRAM)
+    (tmp_path / 'main.yaml').write_text(f'subprograms:\n  train: {tmp_path / "train.py"}\n')
+    with pytest.raises(SystemExit):
+        Multiplexor(str(tmp_path / 'main.yaml'), cache=False).sweep(['train', '--epochs=1,x'], workers=1)
+
+
+def test_sweep_main_program(tmp_path):
+    (tmp_path / 'main.py').write_text(MAIN_PROGRAM)
+    (tmp_path / 'main.yaml').write_text(MAIN_CONFIG)
+    output = subprocess.run([sys.executable, str(tmp_path / 'main.py'), '--epochs=1,2,3'], capture_output=True,
+                            text=True, check=True).stdout
+    assert json.loads(output) == [[{'epochs': '1'}, 2], [{'epochs': '2'}, 4], [{'epochs': '3'}, 6]]
@@ -0,0 +1,77 @@
+import pytest
+
+from multiplex import HelpRequest, Multiplexor, find_help_request
+
+CONFIG = """
+lr: 0.1
+loss:
+  alpha: 1
+  beta: 2
+  focal:
+    gamma: 3
+model:
+  depth: 2
+"""
+
+ARGPARSE_ONLY = """
+argparse:
+  arguments:
+    - name_or_flags: value
+      type: float
+"""
+
+
+def _help(config, *args):
+    with pytest.raises(SystemExit) as info:
+        Multiplexor(config, cache=False).get_conf(args=list(args))
+    assert info.value.code == 0
+
+
+@pytest.mark.parametrize('args, expected', [
+    (['-h'], HelpRequest()),
+    (['--epochs', '1', '--help=loss.*'], HelpRequest('loss.*')),
+    (['--help-depth', '2', '--help'], HelpRequest(depth=2)),
+    (['--help=loss', '--help-depth=1'], HelpRequest('loss', 1)),
+    (['--', '--help'], None),
+    (['--lr', '1'], None),
+    (['--help-depth=0'], None),
+])
+def test_find_help_request(args, expected):
+    request = find_help_request(args)
+    assert repr(request) == repr(expected)
+
+
+def test_select():
+    keys = ['lr', 'loss.alpha', 'loss.beta', 'loss.focal.gamma', 'model.depth']
+    assert HelpRequest('loss').select(keys) == [('loss.alpha', None), ('loss.beta', None), ('loss.focal.gamma', None)]
+    assert HelpRequest('*.depth').select(keys) == [('model.depth', None)]
+    assert HelpRequest(depth=1).select(keys) == [('lr', None), ('loss', 3), ('model', 1)]
+    assert HelpRequest('loss', 2).select(keys) == [('loss.alpha', None), ('loss.beta', None), ('loss.focal', 1)]
+
+
+def test_filtered_help(capsys):
+    _help(CONFIG, '--help=loss.*')
+    out = capsys.readouterr().out
+    assert '--loss.alpha' in out and '--loss.focal.gamma' in out
+    assert '--lr' not in out and '--model.depth' not in out
+    assert '3 of 5 parameters' in out
+
+
+def test_collapsed_help(capsys):
+    _help(CONFIG, '--help-depth=1')
+    out = capsys.readouterr().out
+    assert '--loss.*' in out and '3 parameters, list them with --help=loss.*' in out
+    assert '--loss.alpha' not in out
+
+
+def test_full_help(capsys):
+    _help(CONFIG, '-h')
+    out = capsys.readouterr().out
+    assert all(f'--{key}' in out for key in ('lr', 'loss.alpha', 'loss.focal.gamma', 'model.depth'))
+
+
+def test_no_default_parameters(capsys):
+    _help(ARGPARSE_ONLY, '-h')
+    out = capsys.readouterr().out
+    assert 'value' in out
+    assert 'default parameters' not in out and '--help=PATTERN' not in out
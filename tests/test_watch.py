@@ -0,0 +1,66 @@
+import os
+import queue
+
+import pytest
+
+from multiplex import MISSING, ConfigWatcher, Multiplexor, diff_configs
+
+
+def test_diff_configs():
+    old = {'a': {'b': 1, 'c': [1]}, 'd': 1, 'e': 'x'}
+    new = {'a': {'b': 2, 'c': [1]}, 'd': 1.0, 'f': True}
+    assert diff_configs(old, new) == {'a.b': (1, 2), 'd': (1, 1.0), 'e': ('x', MISSING), 'f': (MISSING, True)}
+
+
+def _write(path, text):
+    # Bump the modification time, in case the file system's resolution is coarse
+    mtime = os.stat(path).st_mtime_ns + 10 ** 9 if os.path.exists(path) else None
+    with open(path, 'w') as f:
+        f.write(text)
+    if mtime is not None:
+        os.utime(path, ns=(mtime, mtime))
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    path = str(tmp_path / 'conf.yaml')
+    _write(path, 'lr: 0.1\nmodel:\n  depth: 2\n  name: net\n')
+    return path
+
+
+def test_polling_watcher(config_path):
+    multiplexor = Multiplexor(config_path, cache=False)
+    watcher = multiplexor.watch(args=['--model.name', 'cli'], interval=0.01, use_inotify=False)
+    changes, model_changes = queue.Queue(), queue.Queue()
+    watcher.on_change(lambda config, diff: changes.put(diff))
+    watcher.on_change(lambda config, diff: model_changes.put(diff), keys=['model'])
+    try:
+        assert watcher.config.data == {'lr': 0.1, 'model': {'depth': 2, 'name': 'cli'}}
+
+        _write(config_path, 'lr: 0.2\nmodel:\n  depth: 3\n  name: net\n  width: 8\n')
+        assert changes.get(timeout=5) == {'lr': (0.1, 0.2), 'model.depth': (2, 3), 'model.width': (MISSING, 8)}
+        assert model_changes.get(timeout=5) == {'model.depth': (2, 3), 'model.width': (MISSING, 8)}
+        # The command line still takes precedence
+        assert watcher.config.data == {'lr': 0.2, 'model': {'depth': 3, 'name': 'cli', 'width': 8}}
+
+        _write(config_path, 'lr: 0.3\nmodel:\n  depth: 3\n  name: net\n  width: 8\n')
+        assert changes.get(timeout=5) == {'lr': (0.2, 0.3)}
+        assert model_changes.empty()
+    finally:
+        watcher.stop(timeout=5)
+
+
+def test_invalid_config_is_kept(config_path):
+    loads = []
+
+    def load(changed):
+        loads.append(changed)
+        if len(loads) > 1:
+            raise ValueError('invalid config')
+        return {'lr': 0.1}
+
+    watcher = ConfigWatcher(load, paths=[config_path], use_inotify=False)
+    with pytest.warns(UserWarning, match='Failed to reload'):
+        assert watcher.reload({config_path}) == {}
+    assert watcher.config == {'lr': 0.1}
+    assert isinstance(watcher.error, ValueError)